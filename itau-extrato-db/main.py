@@ -1,21 +1,149 @@
+import re
 import sys
-from src.db import init_db, get_conn
-from src.ingest import ingest_itau_pdf
+import time
+from pathlib import Path
+from src.db import init_db, get_conn, schema_version, checkpoint, wal_size
+from src.ingest import ingest_itau_pdf, ingest_dir
+from src.settings import DATA_RAW_DIR
+from src import parse_cache
+from src.reclassify import reclassify
+from src.rules import compile_rule
 
 def cmd_initdb():
+    applied = init_db()
+    with get_conn() as conn:
+        version = schema_version(conn)
+    if applied:
+        print(f"OK: migrações aplicadas: {', '.join(map(str, applied))} (schema v{version}).")
+    else:
+        print(f"OK: banco já está em dia (schema v{version}).")
+
+def cmd_ingest(pdf_path: str, workers: int | None = None, full: bool = False):
+    rep = ingest_itau_pdf(pdf_path, workers=workers, skip_covered=not full)
+    if rep.ja_importado:
+        print(f"OK: {pdf_path} já foi ingerido (mesmo conteúdo); use --full para reprocessar.")
+        return
+    print(f"OK: arquivo ingerido -> {pdf_path} "
+          f"({rep.linhas} linhas, {rep.inseridas} inseridas, {rep.duplicadas} duplicadas, "
+          f"{rep.paginas_puladas} páginas já importadas puladas)")
+    print(f"    parse {rep.t_parse:.3f}s{' (cache)' if rep.cache else ''}, "
+          f"normalização {rep.t_normalize:.3f}s, gravação {rep.t_write:.3f}s, total {rep.segundos:.3f}s")
+
+def cmd_ingest_dir(folder: str, workers: int | None = None, full: bool = False):
+    def progress(rep, done, total):
+        if rep.ja_importado:
+            print(f"[{done}/{total}] {Path(rep.arquivo).name}: já ingerido (mesmo conteúdo), pulado")
+            return
+        print(f"[{done}/{total}] {Path(rep.arquivo).name}: {rep.linhas} linhas, "
+              f"{rep.inseridas} inseridas, {rep.duplicadas} duplicadas, "
+              f"{rep.paginas_puladas} páginas puladas ({rep.segundos:.2f}s"
+              f"{', cache' if rep.cache else ''})")
+
+    t0 = time.perf_counter()
+    reports = ingest_dir(folder, workers=workers, on_file=progress, skip_covered=not full)
+    elapsed = time.perf_counter() - t0
+    if not reports:
+        print(f"Nenhum PDF encontrado em {folder}")
+        return
+
+    linhas = sum(r.linhas for r in reports)
+    inseridas = sum(r.inseridas for r in reports)
+    print(f"OK: {len(reports)} arquivos, {linhas} linhas "
+          f"({inseridas} inseridas, {linhas - inseridas} duplicadas) em {elapsed:.2f}s")
+    print(f"    {len(reports) / elapsed:.1f} arquivos/s, {linhas / elapsed:.0f} linhas/s")
+
+def cmd_cache(args: list[str]):
+    action = args[0] if args else "info"
+    if action == "info":
+        st = parse_cache.stats()
+        print(f"Cache de parsing: {st['dir']}")
+        print(f"  entradas: {st['entradas']} ({st['entradas_versao_atual']} da versão {st['parser_version']} do parser)")
+        print(f"  tamanho:  {st['bytes'] / 1048576:.2f} MB de {st['limite_bytes'] / 1048576:.0f} MB")
+    elif action == "prune":
+        max_bytes = int(float(args[1]) * 1048576) if len(args) > 1 else None
+        print(f"OK: {parse_cache.prune(max_bytes)} entradas removidas.")
+    elif action == "clear":
+        print(f"OK: {parse_cache.clear()} entradas removidas.")
+    else:
+        print(f"Ação desconhecida: {action}")
+        sys.exit(1)
+
+def cmd_explain(verbose: bool = False):
+    """Confere o EXPLAIN QUERY PLAN das consultas de relatório (src/queries.py)."""
+    from src.queries import check_plans
+
     init_db()
-    print("OK: estrutura do banco criada/atualizada.")
+    with get_conn() as conn:
+        results = check_plans(conn)
+    failed = 0
+    for name, plan, scans in results:
+        print(f"{'FALHA' if scans else 'ok':<6}{name}")
+        for detail in (plan if verbose or scans else []):
+            mark = "  <-- varredura completa" if detail in scans else ""
+            print(f"        {detail}{mark}")
+        failed += bool(scans)
+    print(f"{len(results)} consultas conferidas, {failed} com varredura completa.")
+    if failed:
+        sys.exit(1)
+
+def cmd_checkpoint(mode: str = "TRUNCATE"):
+    before = wal_size()
+    with get_conn() as conn:
+        busy, log, done = checkpoint(conn, mode)
+    if log == -1:
+        print("Banco não está em modo WAL; nada a fazer.")
+        return
+    print(f"OK: wal_checkpoint({mode.upper()}) -> {done}/{log} páginas copiadas"
+          f"{' (leitores ativos, checkpoint parcial)' if busy else ''}; "
+          f"-wal: {before / 1048576:.2f} MB -> {wal_size() / 1048576:.2f} MB")
+
+def cmd_rules():
+    init_db()
+    with get_conn() as conn:
+        cur = conn.execute(
+            """
+            SELECT id, prioridade, modo, padrao, categoria, detalhe, ativo
+            FROM classification_rules
+            ORDER BY prioridade, id
+            """
+        )
+        for rid, prio, modo, padrao, cat, det, ativo in cur.fetchall():
+            flag = "" if ativo else "  (inativa)"
+            try:
+                compile_rule(padrao, modo)
+            except re.error as e:
+                flag += f"  (regex inválida, ignorada: {e})"
+            print(f"#{rid:<4} prio {prio:<5} {modo:<6} {padrao!r} -> {cat} [detalhe: {det}]{flag}")
+
+def cmd_reclassify():
+    init_db()
+    with get_conn() as conn:
+        rep = reclassify(conn)
+    print(f"OK: {rep.linhas} linhas reclassificadas, {rep.alteradas} alteradas em {rep.segundos:.2f}s")
+    for cat, n in rep.por_categoria.most_common():
+        print(f"  {cat}: {n}")
+
+def cmd_rebuild_summary():
+    from src.summary import rebuild
+
+    init_db()
+    t0 = time.perf_counter()
+    with get_conn() as conn:
+        n = rebuild(conn)
+    print(f"OK: saldo_por_dia, daily_summary e monthly_rollup refeitos com {n} dias em {time.perf_counter() - t0:.2f}s")
 
-def cmd_ingest(pdf_path: str):
-    ingest_itau_pdf(pdf_path)
-    print(f"OK: arquivo ingerido -> {pdf_path}")
+def _opt_int(name: str) -> int | None:
+    if name in sys.argv:
+        i = sys.argv.index(name)
+        return int(sys.argv[i + 1])
+    return None
 
 def cmd_saldos():
     with get_conn() as conn:
-        # versão compatível com a view alternativa sugerida em models.sql
+        # tabela saldo_por_dia (sql/migrations/0008_saldo_por_dia.sql)
         sql = """
         SELECT data, saldo
-        FROM v_saldo_por_dia
+        FROM saldo_por_dia
         ORDER BY data;
         """
         cur = conn.execute(sql)
@@ -27,7 +155,15 @@ def main():
     if len(sys.argv) < 2:
         print("Uso:")
         print("  python main.py initdb")
-        print("  python main.py ingest <caminho_pdf>")
+        print("  python main.py ingest <caminho_pdf> [--workers N] [--full]")
+        print("  python main.py ingest-dir [pasta] [--workers N] [--full]   (padrão: data/raw)")
+        print("      --full: não pula páginas de períodos já importados")
+        print("  python main.py checkpoint [PASSIVE|FULL|RESTART|TRUNCATE]   (padrão: TRUNCATE)")
+        print("  python main.py rules                           (lista classification_rules)")
+        print("  python main.py reclassify                      (reaplica as regras às transações)")
+        print("  python main.py rebuild-summary                 (refaz saldo_por_dia e os resumos)")
+        print("  python main.py cache [info|prune [MB]|clear]")
+        print("  python main.py explain [-v]                    (confere os planos das consultas)")
         print("  python main.py saldos")
         sys.exit(1)
 
@@ -38,7 +174,22 @@ def main():
         if len(sys.argv) < 3:
             print("Faltou o caminho do PDF.")
             sys.exit(1)
-        cmd_ingest(sys.argv[2])
+        cmd_ingest(sys.argv[2], _opt_int("--workers"), "--full" in sys.argv)
+    elif cmd == "ingest-dir":
+        folder = sys.argv[2] if len(sys.argv) > 2 and not sys.argv[2].startswith("--") else str(DATA_RAW_DIR)
+        cmd_ingest_dir(folder, _opt_int("--workers"), "--full" in sys.argv)
+    elif cmd == "explain":
+        cmd_explain("-v" in sys.argv)
+    elif cmd == "checkpoint":
+        cmd_checkpoint(sys.argv[2] if len(sys.argv) > 2 else "TRUNCATE")
+    elif cmd == "reclassify":
+        cmd_reclassify()
+    elif cmd == "rebuild-summary":
+        cmd_rebuild_summary()
+    elif cmd == "rules":
+        cmd_rules()
+    elif cmd == "cache":
+        cmd_cache(sys.argv[2:])
     elif cmd == "saldos":
         cmd_saldos()
     else:
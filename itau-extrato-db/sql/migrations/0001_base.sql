@@ -1,4 +1,4 @@
-PRAGMA foreign_keys = ON;
+-- 0001: schema original (transactions, daily_balances, investment_balances + views)
 
 -- Tabela principal de movimentações do extrato
 CREATE TABLE IF NOT EXISTS transactions (
@@ -65,4 +65,4 @@ SELECT
   SUM(CASE WHEN categoria = 'aplicacao_investimento' THEN -valor ELSE 0 END) AS valor_aplicado,
   SUM(CASE WHEN categoria = 'resgate_investimento'   THEN -valor ELSE 0 END) AS valor_resgatado
 FROM base
-GROUP BY aplicacao;
\ No newline at end of file
+GROUP BY aplicacao;
@@ -0,0 +1,18 @@
+-- 0002: livro de importações
+
+----------------------------------------------------------------------
+-- Livro de importações: intervalo de datas coberto por cada PDF ingerido
+-- (usado para pular páginas de períodos já importados)
+----------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS imports (
+  id              INTEGER PRIMARY KEY AUTOINCREMENT,
+  arquivo         TEXT NOT NULL,          -- caminho do PDF
+  sha256          TEXT NOT NULL,          -- hash do conteúdo
+  data_ini        TEXT,                   -- primeira data do arquivo (ISO)
+  data_fim        TEXT,                   -- última data do arquivo (ISO)
+  paginas         INTEGER,
+  paginas_puladas INTEGER,                -- páginas já cobertas por importações anteriores
+  linhas          INTEGER,                -- linhas processadas
+  inseridas       INTEGER,                -- linhas novas em transactions
+  importado_em    TEXT NOT NULL DEFAULT (datetime('now'))
+);
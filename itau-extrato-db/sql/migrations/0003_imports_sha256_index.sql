@@ -0,0 +1,3 @@
+-- 0003: busca de importações pelo hash do conteúdo (uploads repetidos)
+
+CREATE INDEX IF NOT EXISTS ix_imports_sha256 ON imports (sha256);
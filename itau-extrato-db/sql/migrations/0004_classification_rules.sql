@@ -0,0 +1,51 @@
+-- 0004: regras de classificação em tabela (compiladas por src/rules.py)
+
+----------------------------------------------------------------------
+-- Metadados da aplicação (contadores de versão etc.)
+----------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS app_meta (
+  chave TEXT PRIMARY KEY,
+  valor INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO app_meta (chave, valor) VALUES ('rules_version', 0);
+
+----------------------------------------------------------------------
+-- Regras de classificação de lançamentos
+--   modo = 'contem': padrao é um trecho procurado em lancamentos_norm
+--   modo = 'regex' : padrao é uma expressão regular (Python) sobre lancamentos_norm
+--   detalhe = 'apos'  : detalhe_categoria = texto após o padrão
+--             'grupo' : detalhe_categoria = grupo nomeado (?P<detalhe>...) da regex
+--             'nenhum': sem detalhe
+-- Vence a regra de menor prioridade (empate: menor id).
+----------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS classification_rules (
+  id         INTEGER PRIMARY KEY AUTOINCREMENT,
+  padrao     TEXT NOT NULL,
+  modo       TEXT NOT NULL DEFAULT 'contem' CHECK (modo IN ('contem', 'regex')),
+  prioridade INTEGER NOT NULL DEFAULT 100,
+  categoria  TEXT NOT NULL,
+  detalhe    TEXT NOT NULL DEFAULT 'apos' CHECK (detalhe IN ('apos', 'grupo', 'nenhum')),
+  ativo      INTEGER NOT NULL DEFAULT 1
+);
+
+-- Qualquer alteração nas regras muda rules_version (o matcher em memória é recompilado)
+CREATE TRIGGER IF NOT EXISTS trg_rules_ins AFTER INSERT ON classification_rules
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'rules_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rules_upd AFTER UPDATE ON classification_rules
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'rules_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rules_del AFTER DELETE ON classification_rules
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'rules_version';
+END;
+
+-- Regras que antes estavam fixas no código
+INSERT INTO classification_rules (padrao, modo, prioridade, categoria, detalhe) VALUES
+  ('RESGATE',   'contem', 10, 'resgate_investimento',   'apos'),
+  ('APLICACAO', 'contem', 20, 'aplicacao_investimento', 'apos');
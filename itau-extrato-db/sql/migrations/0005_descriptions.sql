@@ -0,0 +1,92 @@
+-- 0005: dicionário de descrições (cada texto gravado uma vez)
+--
+-- transactions vira uma VIEW de compatibilidade sobre transactions_base +
+-- descriptions: consultas antigas (e a sandbox SQL) continuam funcionando.
+-- Escritas vão direto em transactions_base (ver src/descriptions.py).
+
+----------------------------------------------------------------------
+-- Descrições distintas: original + normalizada
+----------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS descriptions (
+  id               INTEGER PRIMARY KEY,
+  lancamentos      TEXT NOT NULL UNIQUE,   -- descrição original
+  lancamentos_norm TEXT NOT NULL           -- descrição normalizada
+);
+
+CREATE INDEX IF NOT EXISTS idx_descriptions_norm ON descriptions (lancamentos_norm);
+
+INSERT INTO descriptions (lancamentos, lancamentos_norm)
+SELECT lancamentos, MIN(lancamentos_norm)
+FROM transactions
+GROUP BY lancamentos
+ORDER BY MIN(id);
+
+----------------------------------------------------------------------
+-- Movimentações referenciando a descrição por id
+----------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS transactions_base (
+  id               INTEGER PRIMARY KEY AUTOINCREMENT,
+  data             TEXT NOT NULL,          -- ISO YYYY-MM-DD
+  descricao_id     INTEGER NOT NULL REFERENCES descriptions (id),
+  valor            REAL NOT NULL,          -- + crédito, - débito
+  saldo_dia        REAL,                   -- snapshot de saldo do dia (se houver na linha)
+  tipo_mov         TEXT,                   -- 'credito' | 'debito'
+  categoria        TEXT,                   -- ex.: resgate_investimento, aplicacao_investimento
+  detalhe_categoria TEXT,                  -- extra da descrição, se aplicável
+  pagina           INTEGER,                -- nº página no PDF
+  linha            INTEGER,                -- nº linha na página
+  hash_unico       TEXT NOT NULL UNIQUE    -- deduplicação
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_base_descricao ON transactions_base (descricao_id);
+
+-- ids preservados (sqlite_sequence acompanha o maior id copiado)
+INSERT INTO transactions_base
+  (id, data, descricao_id, valor, saldo_dia, tipo_mov, categoria, detalhe_categoria, pagina, linha, hash_unico)
+SELECT t.id, t.data, d.id, t.valor, t.saldo_dia, t.tipo_mov, t.categoria, t.detalhe_categoria,
+       t.pagina, t.linha, t.hash_unico
+FROM transactions t
+JOIN descriptions d ON d.lancamentos = t.lancamentos
+ORDER BY t.id;
+
+DROP VIEW IF EXISTS v_saldo_por_dia;
+DROP VIEW IF EXISTS v_aplicacoes_totais;
+DROP TABLE transactions;
+
+----------------------------------------------------------------------
+-- Compatibilidade: mesmas colunas da tabela antiga
+----------------------------------------------------------------------
+CREATE VIEW transactions AS
+SELECT
+  t.id, t.data, d.lancamentos, d.lancamentos_norm, t.valor, t.saldo_dia,
+  t.tipo_mov, t.categoria, t.detalhe_categoria, t.pagina, t.linha, t.hash_unico
+FROM transactions_base t
+JOIN descriptions d ON d.id = t.descricao_id;
+
+-- Views que não usam a descrição leem transactions_base direto (sem JOIN)
+CREATE VIEW v_saldo_por_dia AS
+SELECT d AS data, MAX(saldo) AS saldo
+FROM (
+  SELECT date(data) AS d, saldo_dia AS saldo FROM daily_balances
+  UNION ALL
+  SELECT date(data) AS d, saldo_dia AS saldo
+  FROM transactions_base
+  WHERE saldo_dia IS NOT NULL
+) x
+GROUP BY d;
+
+CREATE VIEW v_aplicacoes_totais AS
+WITH base AS (
+  SELECT
+    COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE') AS aplicacao,
+    categoria,
+    valor
+  FROM transactions_base
+  WHERE categoria IN ('aplicacao_investimento', 'resgate_investimento')
+)
+SELECT
+  aplicacao,
+  SUM(CASE WHEN categoria = 'aplicacao_investimento' THEN -valor ELSE 0 END) AS valor_aplicado,
+  SUM(CASE WHEN categoria = 'resgate_investimento'   THEN -valor ELSE 0 END) AS valor_resgatado
+FROM base
+GROUP BY aplicacao;
@@ -0,0 +1,53 @@
+-- 0006: datas ISO garantidas + índices para as consultas de src/queries.py
+--
+-- As consultas passam a comparar `data` diretamente (sem date(data)), o que
+-- só é equivalente se toda data gravada já estiver em YYYY-MM-DD.
+
+----------------------------------------------------------------------
+-- Normaliza datas fora do formato (ex.: '2025-09-01 00:00:00')
+----------------------------------------------------------------------
+UPDATE transactions_base
+SET data = date(data)
+WHERE date(data) IS NOT NULL AND data <> date(data);
+
+UPDATE OR REPLACE daily_balances
+SET data = date(data)
+WHERE date(data) IS NOT NULL AND data <> date(data);
+
+UPDATE OR REPLACE investment_balances
+SET data = date(data)
+WHERE date(data) IS NOT NULL AND data <> date(data);
+
+----------------------------------------------------------------------
+-- Índices
+----------------------------------------------------------------------
+-- /periodos, /periodos/detalhe, /saldos-mes, /saldo-do-dia (por data)
+CREATE INDEX IF NOT EXISTS idx_tx_data ON transactions_base (data);
+
+-- /investimentos e /saldo-do-dia filtrado por categoria
+CREATE INDEX IF NOT EXISTS idx_tx_categoria_data ON transactions_base (categoria, data);
+
+-- saldos informados nas linhas (v_saldo_por_dia): poucas linhas, índice parcial
+CREATE INDEX IF NOT EXISTS idx_tx_saldo_dia ON transactions_base (data, saldo_dia)
+WHERE saldo_dia IS NOT NULL;
+
+----------------------------------------------------------------------
+-- Saldos informados sem date(): filtros por data chegam aos índices.
+-- O SQLite só empurra o WHERE para dentro de um nível de subconsulta, então
+-- as consultas filtram v_saldos_informados (UNION ALL puro) e agregam depois;
+-- v_saldo_por_dia continua com o formato de sempre.
+----------------------------------------------------------------------
+DROP VIEW IF EXISTS v_saldo_por_dia;
+DROP VIEW IF EXISTS v_saldos_informados;
+
+CREATE VIEW v_saldos_informados AS
+SELECT data, saldo_dia AS saldo FROM daily_balances
+UNION ALL
+SELECT data, saldo_dia AS saldo
+FROM transactions_base
+WHERE saldo_dia IS NOT NULL;
+
+CREATE VIEW v_saldo_por_dia AS
+SELECT data, MAX(saldo) AS saldo
+FROM v_saldos_informados
+GROUP BY data;
@@ -0,0 +1,23 @@
+-- 0007: resumo diário pré-calculado para /periodos
+--
+-- Uma linha por dia com lançamentos. A ingestão recalcula só os dias que
+-- tocou (src/summary.py); `python main.py rebuild-summary` refaz tudo.
+
+CREATE TABLE IF NOT EXISTS daily_summary (
+  dia      TEXT PRIMARY KEY,     -- ISO YYYY-MM-DD
+  debitos  REAL NOT NULL,        -- soma de -valor dos lançamentos negativos
+  creditos REAL NOT NULL,        -- soma dos lançamentos positivos
+  n_tx     INTEGER NOT NULL,     -- nº de linhas em transactions_base no dia
+  saldo    REAL                  -- saldo informado (v_saldo_por_dia), se houver
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO daily_summary (dia, debitos, creditos, n_tx, saldo)
+SELECT
+  t.data,
+  SUM(CASE WHEN t.valor < 0 THEN -t.valor ELSE 0 END),
+  SUM(CASE WHEN t.valor > 0 THEN  t.valor ELSE 0 END),
+  COUNT(*),
+  s.saldo
+FROM transactions_base t
+LEFT JOIN v_saldo_por_dia s ON s.data = t.data
+GROUP BY t.data;
@@ -0,0 +1,125 @@
+-- 0008: saldo por dia materializado (substitui o UNION de v_saldo_por_dia)
+--
+-- saldo_por_dia guarda, por dia, o maior saldo informado em daily_balances
+-- ou nas linhas de transactions_base com saldo_dia (mesma regra da view
+-- antiga). Triggers recalculam o dia afetado a cada escrita nas duas
+-- tabelas; v_saldo_por_dia vira uma view simples sobre a tabela.
+-- A PK (data) atende "último saldo em ou antes de X":
+--   WHERE data <= ? ORDER BY data DESC LIMIT 1
+
+CREATE TABLE IF NOT EXISTS saldo_por_dia (
+  data  TEXT PRIMARY KEY,   -- ISO YYYY-MM-DD
+  saldo REAL NOT NULL
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO saldo_por_dia (data, saldo)
+SELECT data, saldo FROM v_saldo_por_dia WHERE saldo IS NOT NULL;
+
+DROP VIEW IF EXISTS v_saldo_por_dia;
+DROP VIEW IF EXISTS v_saldos_informados;
+
+CREATE VIEW v_saldo_por_dia AS
+SELECT data, saldo FROM saldo_por_dia;
+
+----------------------------------------------------------------------
+-- Manutenção: cada trigger recalcula o(s) dia(s) tocado(s)
+----------------------------------------------------------------------
+CREATE TRIGGER IF NOT EXISTS trg_daily_balances_ins AFTER INSERT ON daily_balances
+BEGIN
+  DELETE FROM saldo_por_dia WHERE data = NEW.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT NEW.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = NEW.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = NEW.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_balances_upd AFTER UPDATE ON daily_balances
+BEGIN
+  DELETE FROM saldo_por_dia WHERE data = OLD.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT OLD.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = OLD.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = OLD.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+  DELETE FROM saldo_por_dia WHERE data = NEW.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT NEW.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = NEW.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = NEW.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_balances_del AFTER DELETE ON daily_balances
+BEGIN
+  DELETE FROM saldo_por_dia WHERE data = OLD.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT OLD.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = OLD.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = OLD.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+END;
+
+-- Em transactions_base só as (poucas) linhas com saldo_dia disparam
+CREATE TRIGGER IF NOT EXISTS trg_tx_saldo_ins AFTER INSERT ON transactions_base
+WHEN NEW.saldo_dia IS NOT NULL
+BEGIN
+  DELETE FROM saldo_por_dia WHERE data = NEW.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT NEW.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = NEW.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = NEW.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_saldo_upd AFTER UPDATE OF data, saldo_dia ON transactions_base
+WHEN OLD.saldo_dia IS NOT NULL OR NEW.saldo_dia IS NOT NULL
+BEGIN
+  DELETE FROM saldo_por_dia WHERE data = OLD.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT OLD.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = OLD.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = OLD.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+  DELETE FROM saldo_por_dia WHERE data = NEW.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT NEW.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = NEW.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = NEW.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_saldo_del AFTER DELETE ON transactions_base
+WHEN OLD.saldo_dia IS NOT NULL
+BEGIN
+  DELETE FROM saldo_por_dia WHERE data = OLD.data;
+  INSERT INTO saldo_por_dia (data, saldo)
+  SELECT OLD.data, s FROM (
+    SELECT MAX(saldo) AS s FROM (
+      SELECT saldo_dia AS saldo FROM daily_balances WHERE data = OLD.data
+      UNION ALL
+      SELECT saldo_dia FROM transactions_base WHERE data = OLD.data AND saldo_dia IS NOT NULL
+    )
+  ) WHERE s IS NOT NULL;
+END;
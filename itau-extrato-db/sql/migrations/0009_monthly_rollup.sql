@@ -0,0 +1,32 @@
+-- 0009: cubo mês × categoria × aplicação × tipo_mov
+--
+-- Mantido por src/summary.py: a ingestão e a reclassificação recalculam
+-- os meses que tocaram. aplicacao só é preenchida para as categorias de
+-- investimento (mesma expressão de /investimentos); nas demais fica ''.
+-- Chaves sem valor usam '' (PK de tabela WITHOUT ROWID não aceita NULL).
+
+CREATE TABLE IF NOT EXISTS monthly_rollup (
+  mes       TEXT NOT NULL,     -- YYYY-MM
+  categoria TEXT NOT NULL,     -- '' = sem categoria
+  aplicacao TEXT NOT NULL,     -- '' fora das categorias de investimento
+  tipo_mov  TEXT NOT NULL,     -- 'credito' | 'debito'
+  total     REAL NOT NULL,     -- soma de valor (com sinal)
+  n_tx      INTEGER NOT NULL,
+  PRIMARY KEY (mes, categoria, aplicacao, tipo_mov)
+) WITHOUT ROWID;
+
+-- /investimentos: totais por aplicação sem filtro de período
+CREATE INDEX IF NOT EXISTS idx_rollup_categoria ON monthly_rollup (categoria, aplicacao);
+
+INSERT INTO monthly_rollup (mes, categoria, aplicacao, tipo_mov, total, n_tx)
+SELECT
+  substr(data, 1, 7),
+  COALESCE(categoria, ''),
+  CASE WHEN categoria IN ('aplicacao_investimento', 'resgate_investimento')
+       THEN COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE')
+       ELSE '' END,
+  COALESCE(tipo_mov, ''),
+  SUM(valor),
+  COUNT(*)
+FROM transactions_base
+GROUP BY 1, 2, 3, 4;
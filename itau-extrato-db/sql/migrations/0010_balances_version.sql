@@ -0,0 +1,18 @@
+-- 0010: versão de investment_balances (invalida o índice em memória de src/asof.py)
+
+INSERT OR IGNORE INTO app_meta (chave, valor) VALUES ('balances_version', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_balances_ins AFTER INSERT ON investment_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'balances_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_balances_upd AFTER UPDATE ON investment_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'balances_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_balances_del AFTER DELETE ON investment_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'balances_version';
+END;
@@ -0,0 +1,18 @@
+-- 0011: versão das linhas já gravadas em transactions_base
+--
+-- Inserções não mudam o contador (caches em memória só acrescentam as linhas
+-- novas, id > último id visto); alterar ou apagar linhas existentes
+-- (ex.: reclassificação) muda, e o cache de src/analytics.py recarrega tudo.
+
+INSERT OR IGNORE INTO app_meta (chave, valor) VALUES ('tx_version', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_version_upd
+AFTER UPDATE OF data, valor, categoria, detalhe_categoria, tipo_mov ON transactions_base
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'tx_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_version_del AFTER DELETE ON transactions_base
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'tx_version';
+END;
@@ -0,0 +1,100 @@
+-- 0012: versão global dos dados (ETag das páginas, ver src/dataversion.py)
+--
+-- data_version sobe a cada linha gravada em qualquer tabela-base, seja qual
+-- for o caminho (ingestão, add/remove-saldo, reclassificação, regras, CLI).
+-- As tabelas derivadas (daily_summary, monthly_rollup, saldo_por_dia) só
+-- mudam junto com as tabelas-base. db_id distingue bancos diferentes: depois
+-- do wipe o contador recomeça, mas o id é outro.
+
+INSERT OR IGNORE INTO app_meta (chave, valor) VALUES ('data_version', 0);
+INSERT OR IGNORE INTO app_meta (chave, valor) VALUES ('db_id', abs(random()));
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_transactions_base_ins AFTER INSERT ON transactions_base
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_transactions_base_upd AFTER UPDATE ON transactions_base
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_transactions_base_del AFTER DELETE ON transactions_base
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_descriptions_ins AFTER INSERT ON descriptions
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_descriptions_upd AFTER UPDATE ON descriptions
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_descriptions_del AFTER DELETE ON descriptions
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_daily_balances_ins AFTER INSERT ON daily_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_daily_balances_upd AFTER UPDATE ON daily_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_daily_balances_del AFTER DELETE ON daily_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_investment_balances_ins AFTER INSERT ON investment_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_investment_balances_upd AFTER UPDATE ON investment_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_investment_balances_del AFTER DELETE ON investment_balances
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_imports_ins AFTER INSERT ON imports
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_imports_upd AFTER UPDATE ON imports
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_imports_del AFTER DELETE ON imports
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_classification_rules_ins AFTER INSERT ON classification_rules
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_classification_rules_upd AFTER UPDATE ON classification_rules
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dv_classification_rules_del AFTER DELETE ON classification_rules
+BEGIN
+  UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version';
+END;
@@ -0,0 +1,27 @@
+-- 0013: data_version sobe uma vez por transação de escrita, não por linha
+--
+-- Os triggers de 0012 faziam um UPDATE em app_meta a cada linha gravada
+-- (~16% do tempo de uma ingestão grande, e o contador andava 100 mil numa
+-- importação só). Agora quem grava chama dataversion.bump(conn) logo antes
+-- do COMMIT: ingestão (_ChunkedCommit), add/remove-saldo, reclassificação e
+-- rebuild dos resumos. Edição feita fora do app (sqlite3 na mão) não muda o
+-- contador: depois dela, rode main.py rebuild-summary.
+
+DROP TRIGGER IF EXISTS trg_dv_transactions_base_ins;
+DROP TRIGGER IF EXISTS trg_dv_transactions_base_upd;
+DROP TRIGGER IF EXISTS trg_dv_transactions_base_del;
+DROP TRIGGER IF EXISTS trg_dv_descriptions_ins;
+DROP TRIGGER IF EXISTS trg_dv_descriptions_upd;
+DROP TRIGGER IF EXISTS trg_dv_descriptions_del;
+DROP TRIGGER IF EXISTS trg_dv_daily_balances_ins;
+DROP TRIGGER IF EXISTS trg_dv_daily_balances_upd;
+DROP TRIGGER IF EXISTS trg_dv_daily_balances_del;
+DROP TRIGGER IF EXISTS trg_dv_investment_balances_ins;
+DROP TRIGGER IF EXISTS trg_dv_investment_balances_upd;
+DROP TRIGGER IF EXISTS trg_dv_investment_balances_del;
+DROP TRIGGER IF EXISTS trg_dv_imports_ins;
+DROP TRIGGER IF EXISTS trg_dv_imports_upd;
+DROP TRIGGER IF EXISTS trg_dv_imports_del;
+DROP TRIGGER IF EXISTS trg_dv_classification_rules_ins;
+DROP TRIGGER IF EXISTS trg_dv_classification_rules_upd;
+DROP TRIGGER IF EXISTS trg_dv_classification_rules_del;
@@ -0,0 +1,254 @@
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .settings import DB_PATH
+from .queries import APLICACAO_EXPR, INVEST_CATEGORIAS
+
+# ---------------------------
+# Cache analítico em memória (colunas NumPy)
+# ---------------------------
+# transactions_base vira colunas tipadas:
+#   dia (int32, dias desde 1970-01-01), centavos (int64),
+#   categoria e aplicação (int16, códigos de dicionário)
+# + saldo_por_dia (dia, saldo). Os gráficos somam com bincount/masks em vez
+# de agregar no SQLite e converter linha a linha.
+#
+# Frescor: uma conexão própria guarda o PRAGMA data_version, que muda
+# sempre que OUTRA conexão faz COMMIT no banco. Enquanto não muda, nenhuma
+# consulta é feita. Quando muda:
+#   - app_meta.tx_version igual: só chegaram linhas novas (ingestão) ->
+#     acrescenta id > último id visto
+#   - tx_version diferente (reclassificação, exclusão): recarrega tudo
+# saldo_por_dia (poucas linhas) é relido a cada mudança.
+#
+# Cada consulta sincroniza e lê sob o mesmo lock: nunca enxerga colunas de
+# tamanhos diferentes no meio de um append.
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+SQL_ROWS = f"""
+    SELECT
+      id,
+      data,
+      CAST(ROUND(valor * 100) AS INTEGER),
+      COALESCE(categoria, ''),
+      CASE WHEN categoria IN {INVEST_CATEGORIAS} THEN {APLICACAO_EXPR} ELSE '' END
+    FROM transactions_base
+    WHERE id > ?
+    ORDER BY id
+"""
+
+
+def _dias(datas) -> np.ndarray:
+    """ISO -> int32 (dias desde 1970-01-01)."""
+    return (np.array(datas, dtype="datetime64[D]") - _EPOCH).astype(np.int32)
+
+
+def _iso(dias: np.ndarray) -> List[str]:
+    return np.datetime_as_string(dias.astype("timedelta64[D]") + _EPOCH).tolist()
+
+
+def _dia(iso: str) -> int:
+    return int((np.datetime64(iso, "D") - _EPOCH).astype(np.int32))
+
+
+class _Codes:
+    """Dicionário texto <-> código int16 (código 0 = '')."""
+
+    def __init__(self):
+        self.nomes: List[str] = [""]
+        self.codigo: Dict[str, int] = {"": 0}
+
+    def encode(self, valores) -> np.ndarray:
+        out = np.empty(len(valores), dtype=np.int16)
+        for i, v in enumerate(valores):
+            c = self.codigo.get(v)
+            if c is None:
+                c = self.codigo[v] = len(self.nomes)
+                self.nomes.append(v)
+            out[i] = c
+        return out
+
+
+class AnalyticsCache:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reset()
+
+    def _reset(self):
+        self.data_version = None
+        self.tx_version = None
+        self.ultimo_id = 0
+        self.dia = np.empty(0, dtype=np.int32)
+        self.centavos = np.empty(0, dtype=np.int64)
+        self.categoria = np.empty(0, dtype=np.int16)
+        self.aplicacao = np.empty(0, dtype=np.int16)
+        self.categorias = _Codes()
+        self.aplicacoes = _Codes()
+        self.saldo_dia = np.empty(0, dtype=np.int32)
+        self.saldo = np.empty(0, dtype=np.float64)
+
+    def close(self):
+        """Descarta tudo (ex.: o banco foi apagado e recriado)."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._reset()
+
+    # --- sincronização ---
+
+    def _append(self, conn):
+        rows = conn.execute(SQL_ROWS, (self.ultimo_id,)).fetchall()
+        if not rows:
+            return
+        ids, datas, centavos, cats, apps = zip(*rows)
+        self.dia = np.concatenate([self.dia, _dias(datas)])
+        self.centavos = np.concatenate([self.centavos, np.array(centavos, dtype=np.int64)])
+        self.categoria = np.concatenate([self.categoria, self.categorias.encode(cats)])
+        self.aplicacao = np.concatenate([self.aplicacao, self.aplicacoes.encode(apps)])
+        self.ultimo_id = ids[-1]
+
+    def refresh(self) -> "AnalyticsCache":
+        """Deixa o cache em dia com o banco (barato quando nada mudou)."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn = self._conn
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self.data_version:
+                return self
+            # leitura consistente: tudo no mesmo snapshot
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT valor FROM app_meta WHERE chave = 'tx_version'").fetchone()
+                tx_version = row[0] if row else None
+                if tx_version != self.tx_version:
+                    self._reset()
+                self._append(conn)
+                saldos = conn.execute("SELECT data, saldo FROM saldo_por_dia ORDER BY data").fetchall()
+                self.saldo_dia = _dias([d for d, _ in saldos])
+                self.saldo = np.array([s for _, s in saldos], dtype=np.float64)
+                self.tx_version = tx_version
+                self.data_version = version
+            finally:
+                conn.execute("COMMIT")
+            return self
+
+    # --- consultas ---
+
+    def _saldo_em(self, dias: np.ndarray) -> List[Optional[float]]:
+        """Saldo informado exatamente em cada dia (None se não houver)."""
+        k = np.searchsorted(self.saldo_dia, dias)
+        k = np.minimum(k, max(len(self.saldo_dia) - 1, 0))
+        achou = (self.saldo_dia[k] == dias) if len(self.saldo_dia) else np.zeros(len(dias), bool)
+        return [float(self.saldo[i]) if ok else None for i, ok in zip(k.tolist(), achou.tolist())]
+
+    def periodo_diario(self, dt_ini: str, dt_fim: str) -> Tuple[List[str], List[float], List[float], list]:
+        """/periodos: (dias, débitos, créditos, saldo do dia) dos dias com lançamentos."""
+        with self._lock:
+            self.refresh()
+            return self._periodo_diario(dt_ini, dt_fim)
+
+    def _periodo_diario(self, dt_ini, dt_fim):
+        d0, d1 = _dia(dt_ini), _dia(dt_fim)
+        m = (self.dia >= d0) & (self.dia <= d1)
+        pos = self.dia[m] - d0
+        v = self.centavos[m]
+        n = d1 - d0 + 1
+        cont = np.bincount(pos, minlength=n)
+        deb = np.bincount(pos, weights=np.where(v < 0, -v, 0), minlength=n)
+        cred = np.bincount(pos, weights=np.where(v > 0, v, 0), minlength=n)
+        idx = np.flatnonzero(cont)
+        dias = idx + d0
+        return _iso(dias), (deb[idx] / 100).tolist(), (cred[idx] / 100).tolist(), self._saldo_em(dias)
+
+    def mensal(self, dt_ini: str, dt_fim: str) -> Tuple[List[str], List[float], List[float], list]:
+        """
+        /saldos-mes: (YYYY-MM-01, débitos, créditos, saldo) por mês; saldo do
+        dia 1 ou, se não houver, o último do mês anterior.
+        """
+        with self._lock:
+            self.refresh()
+            return self._mensal(dt_ini, dt_fim)
+
+    def _mensal(self, dt_ini, dt_fim):
+        d0, d1 = _dia(dt_ini), _dia(dt_fim)
+        m = (self.dia >= d0) & (self.dia <= d1)
+        meses = (self.dia[m].astype("timedelta64[D]") + _EPOCH).astype("datetime64[M]").astype(np.int64)
+        v = self.centavos[m]
+        if not len(meses):
+            return [], [], [], []
+        base = meses.min()
+        pos = meses - base
+        cont = np.bincount(pos)
+        deb = np.bincount(pos, weights=np.where(v < 0, -v, 0))
+        cred = np.bincount(pos, weights=np.where(v > 0, v, 0))
+        idx = np.flatnonzero(cont)
+        primeiro = (idx + base).astype("datetime64[M]").astype("datetime64[D]")
+        dia1 = (primeiro - _EPOCH).astype(np.int32)
+        ant = ((primeiro.astype("datetime64[M]") - 1).astype("datetime64[D]") - _EPOCH).astype(np.int32)
+        # último saldo em ou antes do dia 1, desde que não anterior ao mês anterior
+        k = np.searchsorted(self.saldo_dia, dia1, side="right") - 1
+        saldos = [
+            float(self.saldo[j]) if j >= 0 and self.saldo_dia[j] >= a else None
+            for j, a in zip(k.tolist(), ant.tolist())
+        ]
+        return np.datetime_as_string(primeiro).tolist(), (deb[idx] / 100).tolist(), (cred[idx] / 100).tolist(), saldos
+
+    def investimentos_totais(self, start: Optional[str], end: Optional[str], app_filter: Optional[str]) -> List[dict]:
+        """
+        /investimentos: [{aplicacao, valor_aplicado, valor_resgatado}] por
+        aplicação. start/end vazios ou já validados (utils.valid_iso_dates).
+        """
+        with self._lock:
+            self.refresh()
+            return self._investimentos_totais(start, end, app_filter)
+
+    def _investimentos_totais(self, start, end, app_filter):
+        cod_aplic = self.categorias.codigo.get("aplicacao_investimento", -1)
+        cod_resg = self.categorias.codigo.get("resgate_investimento", -1)
+        m = (self.categoria == cod_aplic) | (self.categoria == cod_resg)
+        if start:
+            m &= self.dia >= _dia(start)
+        if end:
+            m &= self.dia <= _dia(end)
+        if app_filter:
+            m &= self.aplicacao == self.aplicacoes.codigo.get(app_filter, -1)
+        app = self.aplicacao[m]
+        cat = self.categoria[m]
+        v = self.centavos[m]
+        n = len(self.aplicacoes.nomes)
+        cont = np.bincount(app, minlength=n)
+        aplicado = np.bincount(app, weights=np.where(cat == cod_aplic, -v, 0), minlength=n) / 100
+        resgatado = np.bincount(app, weights=np.where(cat == cod_resg, -v, 0), minlength=n) / 100
+        out = [
+            {
+                "aplicacao": self.aplicacoes.nomes[i],
+                "valor_aplicado": float(aplicado[i]),
+                "valor_resgatado": float(resgatado[i]),
+            }
+            for i in np.flatnonzero(cont).tolist()
+        ]
+        return sorted(out, key=lambda r: r["aplicacao"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            self.refresh()
+            return {
+                "linhas": int(len(self.dia)),
+                "ultimo_id": self.ultimo_id,
+                "data_version": self.data_version,
+                "tx_version": self.tx_version,
+                "categorias": len(self.categorias.nomes) - 1,
+                "aplicacoes": len(self.aplicacoes.nomes) - 1,
+                "bytes": int(self.dia.nbytes + self.centavos.nbytes + self.categoria.nbytes + self.aplicacao.nbytes),
+            }
+
+
+cache = AnalyticsCache()
@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ---------------------------
+# Saldo "em ou antes de" por aplicação (tabela investment_balances)
+# ---------------------------
+# Saldo da aplicação A no dia D = último saldo lançado com data <= D
+# (replicado para a frente até o próximo lançamento).
+#   - consulta pontual: busca direta na PK (aplicacao, data)
+#   - em lote (muitas aplicações × muitas datas): BalanceIndex, arrays
+#     ordenados por aplicação em memória + bisect. O índice é recarregado
+#     quando app_meta.balances_version muda (triggers da migração 0010,
+#     disparados por add-saldo/remove-saldo).
+
+AsOf = Tuple[str, float]   # (data do lançamento usado, saldo)
+
+SQL_ASOF = """
+    SELECT data, saldo
+    FROM investment_balances
+    WHERE aplicacao = ?
+      AND data <= date(?)
+    ORDER BY data DESC
+    LIMIT 1
+"""
+
+# último saldo de cada aplicação em ou antes da data
+SQL_ASOF_ALL = """
+    WITH ult AS (
+      SELECT aplicacao, MAX(data) AS dref
+      FROM investment_balances
+      WHERE data <= date(?)
+      GROUP BY aplicacao
+    )
+    SELECT ib.aplicacao, ib.data, ib.saldo
+    FROM investment_balances ib
+    JOIN ult u
+      ON u.aplicacao = ib.aplicacao AND ib.data = u.dref;
+"""
+
+
+def asof(conn, aplicacao: str, data: str) -> Optional[AsOf]:
+    """Saldo de `aplicacao` em `data` (carregado para a frente); None se não há."""
+    row = conn.execute(SQL_ASOF, (aplicacao, data)).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def asof_all(conn, data: str) -> Dict[str, AsOf]:
+    """{aplicacao: (data, saldo)} com o último saldo de cada uma em ou antes de `data`."""
+    return {a: (d, s) for a, d, s in conn.execute(SQL_ASOF_ALL, (data,))}
+
+
+class BalanceIndex:
+    """Lançamentos de investment_balances ordenados por data, por aplicação."""
+
+    def __init__(self, rows: Iterable[Tuple[str, str, float]]):
+        # rows: (aplicacao, data, saldo) ordenadas por aplicacao, data
+        self.datas: Dict[str, List[str]] = {}
+        self.saldos: Dict[str, List[float]] = {}
+        for aplicacao, data, saldo in rows:
+            self.datas.setdefault(aplicacao, []).append(data)
+            self.saldos.setdefault(aplicacao, []).append(saldo)
+
+    @property
+    def aplicacoes(self) -> List[str]:
+        return sorted(self.datas)
+
+    def asof(self, aplicacao: str, data: str) -> Optional[AsOf]:
+        datas = self.datas.get(aplicacao)
+        if not datas:
+            return None
+        i = bisect_right(datas, data)
+        return (datas[i - 1], self.saldos[aplicacao][i - 1]) if i else None
+
+    def asof_many(
+        self, aplicacoes: Optional[Sequence[str]], datas: Sequence[str]
+    ) -> Dict[str, List[Optional[AsOf]]]:
+        """
+        {aplicacao: [saldo em cada data]}. `datas` em ordem crescente (ISO):
+        uma passada por aplicação, sem bisect por ponto.
+        """
+        out = {}
+        for aplicacao in (self.aplicacoes if aplicacoes is None else aplicacoes):
+            ds = self.datas.get(aplicacao, [])
+            ss = self.saldos.get(aplicacao, [])
+            serie = []
+            i = 0
+            for d in datas:
+                while i < len(ds) and ds[i] <= d:
+                    i += 1
+                serie.append((ds[i - 1], ss[i - 1]) if i else None)
+            out[aplicacao] = serie
+        return out
+
+
+_index: Optional[BalanceIndex] = None
+_index_version: Optional[int] = None
+_index_lock = threading.Lock()
+
+
+def load_index(conn) -> BalanceIndex:
+    """
+    BalanceIndex em dia com o banco. Custa uma leitura de app_meta quando
+    nada mudou; recarrega a tabela (pequena) só quando balances_version muda.
+    """
+    global _index, _index_version
+    row = conn.execute("SELECT valor FROM app_meta WHERE chave = 'balances_version'").fetchone()
+    version = row[0] if row else None
+    if _index is not None and version == _index_version:
+        return _index
+    with _index_lock:
+        if _index is None or version != _index_version:
+            rows = conn.execute(
+                "SELECT aplicacao, data, saldo FROM investment_balances ORDER BY aplicacao, data"
+            ).fetchall()
+            _index = BalanceIndex(rows)
+            _index_version = version
+    return _index
+
+
+def invalidate():
+    """Descarta o índice (ex.: o banco foi apagado e recriado)."""
+    global _index, _index_version
+    with _index_lock:
+        _index = None
+        _index_version = None
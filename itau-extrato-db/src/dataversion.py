@@ -0,0 +1,76 @@
+import hashlib
+import sqlite3
+import threading
+from datetime import date
+from typing import Iterable, Optional, Tuple
+
+from .settings import DB_PATH
+
+# ---------------------------
+# Versão global dos dados + ETags
+# ---------------------------
+# app_meta guarda 'db_id' e 'data_version' (migrações 0012/0013). Quem grava
+# numa tabela-base chama bump(conn) uma vez por transação, logo antes do
+# COMMIT (ver _ChunkedCommit em src/ingest.py). Para não ler app_meta a cada
+# request, uma conexão fixa
+# acompanha o PRAGMA data_version, que só muda quando outra conexão faz
+# COMMIT: enquanto ele não muda, o par (db_id, data_version) em memória vale.
+#
+# ETag = hash de (db_id, data_version, data de hoje, caminho, parâmetros
+# normalizados). Só entra o que está no banco (mais a data, porque várias
+# páginas usam "hoje" como padrão): outros workers e o processo depois de um
+# restart calculam a mesma ETag e o 304 continua valendo.
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_pragma: Optional[int] = None
+_atual: Tuple[int, int] = (0, 0)
+
+
+def current() -> Tuple[int, int]:
+    """(db_id, data_version) do banco atual."""
+    global _conn, _pragma, _atual
+    with _lock:
+        if _conn is None:
+            _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        pv = _conn.execute("PRAGMA data_version").fetchone()[0]
+        if pv != _pragma:
+            meta = dict(_conn.execute(
+                "SELECT chave, valor FROM app_meta WHERE chave IN ('db_id', 'data_version')"
+            ).fetchall())
+            _atual = (meta.get("db_id", 0), meta.get("data_version", 0))
+            _pragma = pv
+        return _atual
+
+
+def bump(conn):
+    """Nova versão dos dados; roda na transação de escrita, antes do COMMIT."""
+    conn.execute("UPDATE app_meta SET valor = valor + 1 WHERE chave = 'data_version'")
+
+
+def invalidate():
+    """Fecha a conexão de versão (ex.: o arquivo do banco foi recriado)."""
+    global _conn, _pragma
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn, _pragma = None, None
+
+
+def etag(path: str, params: Iterable[Tuple[str, str]]) -> str:
+    """ETag forte da página: mesma versão dos dados + mesmos parâmetros."""
+    db_id, versao = current()
+    # normaliza: ordem das chaves não importa, vazio = ausente; valores
+    # repetidos mantêm a ordem (checkbox + hidden: vale o último)
+    norm = sorted(((k, v) for k, v in params if v != ""), key=lambda kv: kv[0])
+    chave = repr((db_id, versao, date.today().isoformat(), path, norm))
+    return '"' + hashlib.sha1(chave.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def not_modified(if_none_match: Optional[str], tag: str) -> bool:
+    """If-None-Match casa com a ETag atual? (comparação fraca, como manda o HTTP)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == tag for t in if_none_match.split(","))
@@ -1,56 +1,326 @@
+import queue
+import re
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from .settings import DB_PATH, MODELS_SQL
+
+from .settings import (
+    DB_PATH, MIGRATIONS_DIR, DB_POOL_SIZE, DB_STATEMENT_CACHE, DB_CACHE_SIZE_KB,
+    DB_WAL, WAL_AUTOCHECKPOINT_PAGES, WAL_CHECKPOINT_MAX_MB,
+)
 
 def get_conn() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH)
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute(f"PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT_PAGES};")
     return conn
 
-def init_db():
-    with open(MODELS_SQL, "r", encoding="utf-8") as f:
-        ddl = f.read()
+def connect_readonly(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    """
+    Conexão avulsa só de leitura (URI mode=ro: o próprio SQLite recusa
+    escrita). Para quem segura a conexão por mais que um request do pool,
+    como geradores de StreamingResponse.
+    """
+    conn = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};")
+    return conn
+
+def db_files(db_path: Path = DB_PATH) -> list[Path]:
+    """O banco e seus arquivos auxiliares do WAL."""
+    return [db_path, db_path.with_name(db_path.name + "-wal"), db_path.with_name(db_path.name + "-shm")]
+
+# ---------------------------
+# WAL / checkpoints
+# ---------------------------
+
+def wal_size(db_path: Path = DB_PATH) -> int:
+    wal = db_files(db_path)[1]
+    return wal.stat().st_size if wal.exists() else 0
+
+def checkpoint(conn, mode: str = "PASSIVE") -> tuple[int, int, int]:
+    """
+    PRAGMA wal_checkpoint(mode). Retorna (busy, páginas_no_log, páginas_copiadas).
+    Fora do modo WAL o SQLite devolve (0, -1, -1).
+    """
+    mode = mode.upper()
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"modo de checkpoint inválido: {mode}")
+    return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone())
+
+def checkpoint_after_ingest(conn) -> tuple[int, int, int]:
+    """PASSIVE normalmente; TRUNCATE quando o -wal passou de WAL_CHECKPOINT_MAX_MB."""
+    big = wal_size() > WAL_CHECKPOINT_MAX_MB * 1024 * 1024
+    return checkpoint(conn, "TRUNCATE" if big else "PASSIVE")
+
+# ---------------------------
+# Pool de conexões (web app)
+# ---------------------------
+
+class ConnectionPool:
+    """
+    Conexões abertas e configuradas (pragmas) uma única vez e reaproveitadas
+    entre requests. read_only=True liga PRAGMA query_only (rotas GET).
+
+    Nada fica preso à thread: as dependências geradoras do FastAPI rodam a
+    entrada, a rota e a saída em threads diferentes do threadpool, então
+    quem pega uma conexão a devolve pelo próprio objeto (release(conn)),
+    de qualquer thread. As ociosas ficam numa fila LIFO (a mais recente,
+    com o cache de páginas quente, sai primeiro).
+    max_size limita quantas conexões existem ao mesmo tempo; quem passa do
+    limite espera uma ser devolvida (o tempo de espera entra nas estatísticas).
+    """
+
+    def __init__(self, db_path: Path = DB_PATH, read_only: bool = False, max_size: int = DB_POOL_SIZE):
+        self.db_path = db_path
+        self.read_only = read_only
+        self.max_size = max_size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._generation_of: dict = {}   # conexão aberta -> geração
+        self._in_use: set = set()
+        self._generation = 0      # close_all() invalida as conexões da geração anterior
+        self.opens = 0
+        self.hits = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE
+        )
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};")
+        conn.execute(f"PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT_PAGES};")
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._generation_of.pop(conn, None)
+        conn.close()
+
+    def acquire(self) -> sqlite3.Connection:
+        # um slot por conexão em uso (as ociosas da fila não ocupam slot)
+        if not self._slots.acquire(blocking=False):
+            t0 = time.perf_counter()
+            self._slots.acquire()
+            with self._lock:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - t0
+
+        conn = None
+        while conn is None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                stale = self._generation_of.get(conn) != self._generation
+            if stale:
+                self._discard(conn)
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                self._slots.release()
+                raise
+            with self._lock:
+                self.opens += 1
+                self._generation_of[conn] = self._generation
+                self._in_use.add(conn)
+        else:
+            with self._lock:
+                self.hits += 1
+                self._in_use.add(conn)
+        return conn
+
+    def release(self, conn: sqlite3.Connection, error: bool = False):
+        """Devolve `conn` (de qualquer thread): COMMIT, ou ROLLBACK se error."""
+        with self._lock:
+            if conn not in self._in_use:
+                raise RuntimeError("conexão não pertence a este pool ou já foi devolvida")
+            self._in_use.discard(conn)
+            stale = self._generation_of.get(conn) != self._generation
+        try:
+            if conn.in_transaction:
+                conn.rollback() if error else conn.commit()
+        except Exception:
+            stale = True   # estado incerto: não volta para a fila
+            raise
+        finally:
+            if stale:
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Como `with sqlite3.connect(...)`: COMMIT no sucesso, ROLLBACK no erro."""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, error=True)
+            raise
+        self.release(conn)
+
+    def close_all(self):
+        """Fecha as conexões ociosas; as em uso fecham ao serem devolvidas."""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "read_only": self.read_only,
+                "max_size": self.max_size,
+                "abertas": len(self._generation_of),
+                "em_uso": len(self._in_use),
+                "opens": self.opens,
+                "hits": self.hits,
+                "waits": self.waits,
+                "wait_ms": round(self.wait_time * 1000, 3),
+            }
+
+read_pool = ConnectionPool(read_only=True)
+write_pool = ConnectionPool()
+
+def close_pools():
+    read_pool.close_all()
+    write_pool.close_all()
+
+# ---------------------------
+# Migrações (PRAGMA user_version)
+# ---------------------------
+# sql/migrations/NNNN_descricao.sql, aplicadas em ordem. Cada arquivo roda
+# numa transação BEGIN IMMEDIATE junto com o PRAGMA user_version = NNNN; o
+# user_version é relido já com o lock de escrita, então dois processos
+# (lifespan do webapp + main.py initdb) nunca aplicam a mesma migração. Com o
+# banco em dia, init_db() só lê o user_version e não executa DDL nenhuma.
+
+_MIGRATION_RE = re.compile(r"^(\d{4})_.+\.sql$")
+
+def list_migrations() -> list[tuple[int, Path]]:
+    found = []
+    for p in MIGRATIONS_DIR.glob("*.sql"):
+        m = _MIGRATION_RE.match(p.name)
+        if m:
+            found.append((int(m.group(1)), p))
+    return sorted(found)
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+def _statements(ddl: str):
+    """
+    Comandos do script, um a um (executescript faria COMMIT antes de rodar e
+    soltaria o lock). ';' dentro de string, comentário ou trigger não corta:
+    complete_statement só fecha o comando no ';' de verdade.
+    """
+    buf = ""
+    for parte in ddl.split(";"):
+        buf += parte + ";"
+        if sqlite3.complete_statement(buf):
+            yield buf
+            buf = ""
+
+def migrate(conn) -> list[int]:
+    """Aplica as migrações pendentes. Retorna as versões aplicadas."""
+    applied = []
+    pending = [(v, p) for v, p in list_migrations() if v > schema_version(conn)]
+    for version, path in pending:
+        ddl = path.read_text(encoding="utf-8")
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            if schema_version(conn) >= version:
+                conn.execute("COMMIT;")   # outro processo aplicou enquanto esperávamos
+                continue
+            for stmt in _statements(ddl):
+                conn.execute(stmt)
+            conn.execute(f"PRAGMA user_version = {version};")
+            conn.execute("COMMIT;")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+            raise
+        applied.append(version)
+    return applied
+
+def init_db() -> list[int]:
     with get_conn() as conn:
-        conn.executescript(ddl)
+        applied = migrate(conn)
+        if DB_WAL:
+            # journal_mode é persistente no arquivo; repetir é barato e não é DDL
+            conn.execute("PRAGMA journal_mode = WAL;")
+        return applied
+
 
+# ---------------------------
+# Escrita em lote (ingestão)
+# ---------------------------
 
-def insert_transaction(conn, row: dict):
+# Pragmas de sessão para cargas grandes: menos fsync, cache de páginas maior
+# (valor negativo = KiB) e temporários em memória. Valem só para esta conexão.
+BULK_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -65536;",
+    "PRAGMA temp_store = MEMORY;",
+)
+
+# Grava em transactions_base (a view transactions não aceita INSERT);
+# descricao_id vem de descriptions.DescriptionCache
+SQL_INSERT_TRANSACTION = """
+    INSERT OR IGNORE INTO transactions_base
+    (data, descricao_id, valor, saldo_dia, tipo_mov,
+     categoria, detalhe_categoria, pagina, linha, hash_unico)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_UPSERT_DAILY_BALANCE = """
+    INSERT INTO daily_balances (data, saldo_dia)
+    VALUES (?, ?)
+    ON CONFLICT(data) DO UPDATE SET saldo_dia=excluded.saldo_dia
+"""
+
+def configure_bulk_session(conn):
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+
+def insert_transactions_bulk(conn, rows: list) -> int:
     """
-    row esperado:
-      data, lancamentos, lancamentos_norm, valor, saldo_dia,
-      tipo_mov, categoria, detalhe_categoria, pagina, linha, hash_unico
+    rows: tuplas na ordem das colunas de SQL_INSERT_TRANSACTION.
+    Retorna quantas foram de fato inseridas (as demais já existiam).
     """
-    conn.execute(
-        """
-        INSERT OR IGNORE INTO transactions
-        (data, lancamentos, lancamentos_norm, valor, saldo_dia, tipo_mov,
-         categoria, detalhe_categoria, pagina, linha, hash_unico)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            row["data"], row["lancamentos"], row["lancamentos_norm"],
-            row["valor"], row.get("saldo_dia"),
-            row.get("tipo_mov"), row.get("categoria"), row.get("detalhe_categoria"),
-            row.get("pagina"), row.get("linha"), row["hash_unico"]
-        ),
-    )
+    if not rows:
+        return 0
+    cur = conn.executemany(SQL_INSERT_TRANSACTION, rows)
+    return cur.rowcount
 
-def upsert_daily_balance(conn, data_iso: str, saldo_dia: float):
-    conn.execute(
-        """
-        INSERT INTO daily_balances (data, saldo_dia)
-        VALUES (?, ?)
-        ON CONFLICT(data) DO UPDATE SET saldo_dia=excluded.saldo_dia
-        """,
-        (data_iso, saldo_dia),
-    )
+def upsert_daily_balances_bulk(conn, rows: list):
+    """rows: tuplas (data_iso, saldo_dia)."""
+    if rows:
+        conn.executemany(SQL_UPSERT_DAILY_BALANCE, rows)
 
 # NOVO: saldo diário por aplicação (investimento)
 def upsert_investment_balance(conn, aplicacao: str, data_iso: str, saldo: float):
+    # data sempre ISO (as consultas comparam a coluna sem date())
     conn.execute(
         """
         INSERT INTO investment_balances (aplicacao, data, saldo)
-        VALUES (?, ?, ?)
+        VALUES (?1, COALESCE(date(?2), ?2), ?3)
         ON CONFLICT(aplicacao, data) DO UPDATE SET saldo=excluded.saldo
         """,
         (aplicacao, data_iso, saldo),
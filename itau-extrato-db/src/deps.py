@@ -0,0 +1,53 @@
+import weakref
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import Depends
+
+from . import db
+
+# ---------------------------
+# Dependências FastAPI do pool de conexões (webapp.py)
+# ---------------------------
+# O pool (src/db.py) não sabe nada de web: a CLI usa get_conn e não carrega
+# FastAPI/anyio. Aqui ficam as dependências db_read/db_write e o portão das
+# rotas: cada request reserva a vez no pool esperando no event loop, antes
+# de ocupar uma thread do threadpool. Quem esperava em acquire() ocupava uma
+# thread; com o pool cheio, essas threads deixavam sem thread justamente as
+# rotas que seguram conexões (e que as devolveriam), e tudo travava.
+
+# pool -> anyio.Semaphore(max_size), criado no event loop na primeira vez
+_gates: "weakref.WeakKeyDictionary[db.ConnectionPool, anyio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def pool_slot(pool: db.ConnectionPool):
+    """Reserva a vez de uma rota em `pool`, esperando no event loop."""
+    gate = _gates.get(pool)
+    if gate is None:
+        gate = _gates[pool] = anyio.Semaphore(pool.max_size)
+    async with gate:
+        yield
+
+
+# db.read_pool/db.write_pool lidos a cada request (os testes trocam os pools)
+async def _read_slot():
+    async with pool_slot(db.read_pool):
+        yield
+
+
+async def _write_slot():
+    async with pool_slot(db.write_pool):
+        yield
+
+
+def db_read(_slot=Depends(_read_slot)):
+    """Dependência FastAPI: conexão somente leitura do pool (rotas GET)."""
+    with db.read_pool.connection() as conn:
+        yield conn
+
+
+def db_write(_slot=Depends(_write_slot)):
+    """Dependência FastAPI: conexão de escrita do pool."""
+    with db.write_pool.connection() as conn:
+        yield conn
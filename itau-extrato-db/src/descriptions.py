@@ -0,0 +1,41 @@
+from typing import Dict, Optional, Tuple
+
+from .utils import norm_text
+
+# ---------------------------
+# Dicionário de descrições (tabela descriptions)
+# ---------------------------
+# Cada texto de lançamento é gravado uma vez e as transações guardam só o
+# descricao_id. O cache vive durante uma ingestão: descrições repetidas
+# (a maioria) resolvem id e forma normalizada sem tocar no banco, e
+# norm_text roda uma vez por descrição distinta.
+
+
+class DescriptionCache:
+    """lancamentos -> (descricao_id, lancamentos_norm), preenchido sob demanda."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._ids: Dict[str, Tuple[int, str]] = {}
+
+    def intern(self, lancamentos: str, lanc_norm: Optional[str] = None) -> Tuple[int, str]:
+        """Id da descrição (criada se ainda não existe) e sua forma normalizada."""
+        hit = self._ids.get(lancamentos)
+        if hit is not None:
+            return hit
+        row = self.conn.execute(
+            "SELECT id, lancamentos_norm FROM descriptions WHERE lancamentos = ?",
+            (lancamentos,),
+        ).fetchone()
+        if row is None:
+            lanc_norm = lanc_norm if lanc_norm is not None else norm_text(lancamentos)
+            cur = self.conn.execute(
+                "INSERT INTO descriptions (lancamentos, lancamentos_norm) VALUES (?, ?)",
+                (lancamentos, lanc_norm),
+            )
+            row = (cur.lastrowid, lanc_norm)
+        hit = self._ids[lancamentos] = (row[0], row[1])
+        return hit
+
+    def __len__(self) -> int:
+        return len(self._ids)
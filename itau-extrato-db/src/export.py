@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterator
+
+from .db import connect_readonly
+from .settings import EXPORT_FETCH_ROWS
+
+# ---------------------------
+# Exportação em streaming (/export/transactions, /export/saldos)
+# ---------------------------
+# O gerador abre a própria conexão (mode=ro) e lê o cursor com fetchmany:
+# cada bloco de linhas é codificado, enviado e descartado, então a memória
+# não cresce com o tamanho da exportação. Com gzip, um compressor zlib
+# contínuo comprime bloco a bloco (o arquivo sai como .gz).
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# um encoder só (json.dumps com opções monta um novo a cada chamada)
+_to_json = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _encode(cols, rows, fmt: str, primeiro: bool) -> str:
+    if fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf, lineterminator="\n")
+        if primeiro:
+            w.writerow(cols)
+        w.writerows(rows)
+        return buf.getvalue()
+    objs = (_to_json(dict(zip(cols, r))) for r in rows)
+    if fmt == "ndjson":
+        return "".join(o + "\n" for o in objs)
+    # json: um array só, montado em pedaços
+    return ("[" if primeiro else ",") + ",".join(objs)
+
+
+def stream_export(sql: str, params, fmt: str, gzip: bool = False, fetch_rows: int = EXPORT_FETCH_ROWS) -> Iterator[bytes]:
+    """Gera o arquivo em pedaços de até fetch_rows linhas."""
+    z = zlib.compressobj(wbits=31) if gzip else None  # wbits=31: formato gzip
+
+    def out(texto: str) -> bytes:
+        data = texto.encode("utf-8")
+        return z.compress(data) if z else data
+
+    conn = connect_readonly()
+    try:
+        cur = conn.execute(sql, params)
+        cols = [c[0] for c in cur.description]
+        primeiro = True
+        while True:
+            rows = cur.fetchmany(fetch_rows)
+            if not rows:
+                break
+            chunk = out(_encode(cols, rows, fmt, primeiro))
+            primeiro = False
+            if chunk:
+                yield chunk
+        fim = ""
+        if fmt == "csv" and primeiro:
+            fim = _encode(cols, [], fmt, True)   # sem linhas: só o cabeçalho
+        elif fmt == "json":
+            fim = "[]" if primeiro else "]"
+        tail = out(fim) + (z.flush() if z else b"")
+        if tail:
+            yield tail
+    finally:
+        conn.close()
@@ -1,44 +1,294 @@
-from typing import Iterable, Dict
-from .db import init_db, get_conn, insert_transaction, upsert_daily_balance
-from .utils import norm_text, money_to_float
-from .rules import classify, make_unique_hash
-from .parsers.itau_pdf import parse_itau_pdf
+import os
+import threading
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Dict, Optional, List, Tuple, Callable
+from .settings import PDF_PARSE_WORKERS, INGEST_COMMIT_ROWS, INGEST_BATCH_SIZE
+from .db import (
+    init_db, get_conn, configure_bulk_session, checkpoint_after_ingest,
+    insert_transactions_bulk, upsert_daily_balances_bulk,
+)
+from . import dataversion
+from .utils import money_to_float
+from .descriptions import DescriptionCache
+from .summary import refresh_days, refresh_months
+from .rules import classify, make_unique_hash, load_rules
+from .parse_cache import cached_parse, file_sha256
+from .ledger import Coverage, load_coverage, record_import, is_imported
+
+# Um escritor por vez neste processo (ex.: uploads simultâneos na web app);
+# o parsing fica fora do lock.
+WRITER_LOCK = threading.Lock()
+
+
+@dataclass
+class IngestReport:
+    """Resumo da ingestão de um PDF (contagens + tempo por etapa)."""
+    arquivo: str
+    linhas: int = 0        # linhas lidas do PDF
+    inseridas: int = 0     # novas em transactions
+    segundos: float = 0.0
+    cache: bool = False    # linhas vieram do cache de parsing
+    paginas_puladas: int = 0   # páginas de períodos já importados
+    ja_importado: bool = False # mesmo conteúdo (sha256) já ingerido: nada a fazer
+    t_parse: float = 0.0       # extração/parsing (ou leitura do cache)
+    t_normalize: float = 0.0   # norm_text, classify, hash
+    t_write: float = 0.0       # executemany + commit
+
+    @property
+    def duplicadas(self) -> int:
+        return self.linhas - self.inseridas
+
+
+def _normalize(rows: Iterable[Dict], descs: DescriptionCache) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Converte as linhas do parser em tuplas prontas para executemany:
+      - transações, na ordem de SQL_INSERT_TRANSACTION
+      - snapshots (data_iso, saldo_dia) das linhas SALDO DO DIA
+    descs resolve descricao_id/lancamentos_norm (norm_text e a
+    classificação memoizada rodam uma vez por descrição distinta).
+    """
+    txs = []
+    saldos = []
+    for r in rows:
+        data_iso = r["data_iso"]
+        desc = r["descricao"]
+        descricao_id, lanc_norm = descs.intern(desc)
+
+        valor = r["valor"]
+        valor_f = money_to_float(valor) if valor is not None else 0.0
+        saldo_f = money_to_float(r["saldo_dia"]) if r.get("saldo_dia") else None
+
+        # tipo/categorias
+        categoria, detalhe, tipo = classify(lanc_norm, valor_f)
+
+        # hash_unico: mesmo PDF reimportado não duplica
+        h = make_unique_hash(data_iso, lanc_norm, valor_f)
+
+        # Se a linha for realmente um SALDO DO DIA (snapshot), normalmente valor None
+        if desc == "SALDO DO DIA" and saldo_f is not None:
+            saldos.append((data_iso, saldo_f))
+
+        txs.append((
+            data_iso, descricao_id, valor_f, saldo_f,
+            tipo, categoria, detalhe,
+            r.get("pagina"), r.get("linha"), h,
+        ))
+    return txs, saldos
+
+
+class _ChunkedCommit:
+    """
+    COMMIT a cada `every` linhas gravadas. Em WAL os leitores nunca esperam
+    o escritor; com transações curtas o -wal não cresce sem limite. Para que
+    cada COMMIT publique um snapshot consistente, quem grava passa em
+    before_commit o que deixa as derivadas (resumos) em dia com as linhas
+    já gravadas; roda na mesma transação, logo antes do COMMIT, junto com
+    o dataversion.bump (uma vez por transação, não por linha).
+    """
+
+    def __init__(self, conn, every: int):
+        self.conn = conn
+        self.every = every
+        self.pending = 0
+
+    def add(self, n: int, before_commit: Optional[Callable[[], None]] = None):
+        self.pending += n
+        if self.pending >= self.every:
+            self.commit(before_commit)
+
+    def commit(self, before_commit: Optional[Callable[[], None]] = None):
+        if self.conn.in_transaction:
+            if before_commit is not None:
+                before_commit()
+            dataversion.bump(self.conn)
+        self.conn.commit()
+        self.pending = 0
+
+
+def _write_rows(
+    conn,
+    rows: Iterable[Dict],
+    report: IngestReport,
+    batch_size: int = INGEST_BATCH_SIZE,
+    committer: Optional[_ChunkedCommit] = None,
+    descs: Optional[DescriptionCache] = None,
+):
+    t0 = time.perf_counter()
+    txs, saldos = _normalize(rows, descs or DescriptionCache(conn))
+    t1 = time.perf_counter()
+
+    # resumos: recalcula só os dias/meses tocados, antes de cada COMMIT
+    # intermediário (ver _ChunkedCommit) e ao final do arquivo
+    days: set = set()
+
+    def refresh_summaries():
+        refresh_days(conn, days)
+        refresh_months(conn, {d[:7] for d in days})
+        days.clear()
+
+    upsert_daily_balances_bulk(conn, saldos)
+    # Insere os lançamentos em lotes (INSERT OR IGNORE por causa do índice único)
+    for i in range(0, len(txs), batch_size):
+        batch = txs[i:i + batch_size]
+        report.inseridas += insert_transactions_bulk(conn, batch)
+        days.update(t[0] for t in batch)
+        if committer is not None:
+            committer.add(len(batch), refresh_summaries)
+    report.linhas += len(txs)
+    refresh_summaries()
+
+    report.t_normalize += t1 - t0
+    report.t_write += time.perf_counter() - t1
+
+
+def _record(conn, report: IngestReport, sha256: str, cov: Coverage):
+    report.paginas_puladas = cov.puladas
+    record_import(conn, report.arquivo, sha256, cov, report.linhas, report.inseridas)
+
+
+def ingest_itau_pdf(
+    pdf_path: str,
+    workers: Optional[int] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    skip_covered: bool = True,
+    commit_rows: int = INGEST_COMMIT_ROWS,
+    sha256: Optional[str] = None,
+) -> IngestReport:
+    """
+    skip_covered: pula páginas cujo intervalo de datas já está coberto por
+    importações anteriores (tabela imports) e arquivos idênticos a um já
+    ingerido (mesmo sha256).
+    sha256: hash do conteúdo, se já calculado (ex.: durante o upload);
+    evita reler o arquivo só para isso.
+    """
+    init_db()
+    if workers is None:
+        workers = PDF_PARSE_WORKERS
+    t0 = time.perf_counter()
+    report = IngestReport(arquivo=str(pdf_path))
+    sha256 = sha256 or file_sha256(pdf_path)
+    with get_conn() as conn:
+        if skip_covered and is_imported(conn, sha256):
+            report.ja_importado = True
+            report.segundos = time.perf_counter() - t0
+            return report
+        cov = load_coverage(conn) if skip_covered else Coverage()
+        load_rules(conn)
+    rows, report.cache = cached_parse(
+        pdf_path, sha256=sha256, workers=workers, skip_page=cov, probe=bool(cov.intervals)
+    )
+    report.t_parse = time.perf_counter() - t0
+    with WRITER_LOCK, get_conn() as conn:
+        configure_bulk_session(conn)
+        committer = _ChunkedCommit(conn, commit_rows)
+        _write_rows(conn, rows, report, batch_size, committer)
+        _record(conn, report, sha256, cov)
+        t_commit = time.perf_counter()
+        committer.commit()
+        checkpoint_after_ingest(conn)
+    report.t_write += time.perf_counter() - t_commit
+    report.segundos = time.perf_counter() - t0
+    return report
+
+
+# ---------------------------
+# Ingestão em lote (diretório)
+# ---------------------------
+
+def _parse_file(job: Tuple[str, str, List[Tuple[str, str]]]) -> Tuple[List[Dict], bool, Coverage, float]:
+    """Executa no processo do pool: só o parsing, sem tocar no banco."""
+    pdf_path, sha256, intervals = job
+    t0 = time.perf_counter()
+    cov = Coverage(intervals)
+    rows, hit = cached_parse(pdf_path, sha256=sha256, skip_page=cov, probe=bool(cov.intervals))
+    return rows, hit, cov, time.perf_counter() - t0
+
+
+def ingest_dir(
+    folder: str,
+    workers: Optional[int] = None,
+    commit_rows: int = INGEST_COMMIT_ROWS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    on_file: Optional[Callable[[IngestReport, int, int], None]] = None,
+    skip_covered: bool = True,
+) -> List[IngestReport]:
+    """
+    Ingere todos os PDFs de uma pasta (ordem alfabética).
+    - o hash de cada arquivo é calculado antes: arquivos já importados (ou
+      repetidos dentro da pasta) nem chegam ao parser
+    - o parsing roda em paralelo num pool de processos (workers, padrão: nº
+      de CPUs), com no máximo 2 × workers arquivos parseados à frente da
+      gravação: a memória não cresce com o tamanho da pasta
+    - um único escritor (este processo) grava na ordem dos arquivos, numa só
+      conexão, com COMMIT a cada ~commit_rows linhas e checkpoint ao final
+    - on_file(report, feitos, total) é chamado após cada arquivo
+    - skip_covered: cada processo recebe os intervalos já importados no
+      início do lote e pula as páginas cobertas por eles
+    """
+    pdfs = sorted(str(p) for p in Path(folder).glob("*.pdf"))
+    if not pdfs:
+        return []
 
-def ingest_itau_pdf(pdf_path: str):
     init_db()
-    rows: Iterable[Dict] = parse_itau_pdf(pdf_path)
+    workers = workers or os.cpu_count() or 1
+    reports: List[IngestReport] = []
+
     with get_conn() as conn:
-        for r in rows:
-            data_iso = r["data_iso"]
-            desc = r["descricao"]
-            lanc_norm = norm_text(desc)
-
-            valor = r["valor"]
-            valor_f = money_to_float(valor) if valor is not None else 0.0
-
-            # tipo/categorias
-            categoria, detalhe, tipo = classify(lanc_norm, valor_f)
-
-            # hash_unico: mesmo PDF reimportado não duplica
-            h = make_unique_hash(data_iso, lanc_norm, valor_f)
-
-            payload = {
-                "data": data_iso,
-                "lancamentos": desc,
-                "lancamentos_norm": lanc_norm,
-                "valor": valor_f,
-                "saldo_dia": money_to_float(r["saldo_dia"]) if r.get("saldo_dia") else None,
-                "tipo_mov": tipo,
-                "categoria": categoria,
-                "detalhe_categoria": detalhe,
-                "pagina": r.get("pagina"),
-                "linha": r.get("linha"),
-                "hash_unico": h,
-            }
-
-            # Se a linha for realmente um SALDO DO DIA (snapshot), normalmente valor None
-            if desc == "SALDO DO DIA" and payload["saldo_dia"] is not None:
-                upsert_daily_balance(conn, data_iso, payload["saldo_dia"])
-
-            # Insere o lançamento (com INSERT OR IGNORE por causa do índice único)
-            insert_transaction(conn, payload)
+        configure_bulk_session(conn)
+        committer = _ChunkedCommit(conn, commit_rows)
+        descs = DescriptionCache(conn)   # compartilhado entre os arquivos do lote
+        load_rules(conn)
+        intervals = load_coverage(conn).intervals if skip_covered else []
+
+        # (caminho, sha256, já importado?) — decidido aqui, sem parsear nada
+        entradas = []
+        vistos = set()
+        for p in pdfs:
+            sha256 = file_sha256(p)
+            entradas.append((p, sha256, skip_covered and (sha256 in vistos or is_imported(conn, sha256))))
+            vistos.add(sha256)
+        a_parsear = [(i, p, sha256) for i, (p, sha256, pular) in enumerate(entradas) if not pular]
+
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(a_parsear))) if a_parsear else None
+        try:
+            janela = 2 * workers
+            pendentes = iter(a_parsear)
+            futuros = {}
+
+            def enfileirar():
+                for i, p, sha256 in islice(pendentes, max(janela - len(futuros), 0)):
+                    futuros[i] = pool.submit(_parse_file, (p, sha256, intervals))
+
+            if pool:
+                enfileirar()
+            # grava na ordem dos arquivos: o resultado fica determinístico
+            for done, (path, sha256, pular) in enumerate(entradas, start=1):
+                t0 = time.perf_counter()
+                report = IngestReport(arquivo=path)
+                parse_s = 0.0
+                if pular:
+                    report.ja_importado = True
+                else:
+                    rows, report.cache, cov, parse_s = futuros.pop(done - 1).result()
+                    enfileirar()
+                    report.t_parse = parse_s
+                    t0 = time.perf_counter()
+                    _write_rows(conn, rows, report, batch_size, committer, descs)
+                    _record(conn, report, sha256, cov)
+                    del rows
+                report.segundos = parse_s + (time.perf_counter() - t0)
+                reports.append(report)
+                if on_file:
+                    on_file(report, done, len(pdfs))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        committer.commit()
+        checkpoint_after_ingest(conn)
+
+    return reports
@@ -0,0 +1,111 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from .settings import INGEST_JOB_WORKERS, INGEST_JOBS_KEEP
+from .ingest import ingest_itau_pdf, IngestReport
+
+# ---------------------------
+# Fila de ingestão em segundo plano (uploads do /input)
+# ---------------------------
+# O POST só enfileira e devolve o id; um pool limitado de threads executa
+# ingest_itau_pdf. O parsing de jobs diferentes pode correr em paralelo, mas a
+# gravação é serializada em ingest.WRITER_LOCK (um escritor por vez no banco).
+#
+# Operações que trocam o banco inteiro (POST /admin/wipe) rodam dentro de
+# exclusive(): só começam com a fila vazia e, enquanto duram, submit_ingest
+# recusa jobs novos (QueueBusy).
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    arquivo: str
+    status: str = QUEUED
+    criado_em: float = field(default_factory=time.time)
+    iniciado_em: Optional[float] = None
+    terminado_em: Optional[float] = None
+    erro: Optional[str] = None
+    report: Optional[IngestReport] = None
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["espera_s"] = round((self.iniciado_em or time.time()) - self.criado_em, 3)
+        if self.iniciado_em:
+            d["execucao_s"] = round((self.terminado_em or time.time()) - self.iniciado_em, 3)
+        if self.report is not None:
+            d["report"]["duplicadas"] = self.report.duplicadas
+        return d
+
+
+class QueueBusy(RuntimeError):
+    """Fila ocupada: há jobs pendentes, ou a fila está fechada por exclusive()."""
+
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_JOB_WORKERS, thread_name_prefix="ingest")
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_lock = threading.Lock()
+_fechada = False
+
+
+def _run(job: Job, kwargs: dict):
+    job.status = RUNNING
+    job.iniciado_em = time.time()
+    try:
+        job.report = ingest_itau_pdf(job.arquivo, **kwargs)
+        job.status = DONE
+    except Exception as e:
+        job.erro = f"{type(e).__name__}: {e}"
+        job.status = FAILED
+    finally:
+        job.terminado_em = time.time()
+
+
+def submit_ingest(pdf_path: str, **kwargs) -> Job:
+    """Enfileira a ingestão de pdf_path; kwargs vão para ingest_itau_pdf."""
+    job = Job(id=uuid.uuid4().hex, arquivo=str(pdf_path))
+    with _lock:
+        if _fechada:
+            raise QueueBusy("fila de ingestão fechada (limpeza do banco em andamento)")
+        _jobs[job.id] = job
+        # guarda só os INGEST_JOBS_KEEP mais recentes já finalizados
+        while len(_jobs) > INGEST_JOBS_KEEP:
+            oldest = next(iter(_jobs.values()))
+            if oldest.status not in (DONE, FAILED):
+                break
+            _jobs.popitem(last=False)
+    _executor.submit(_run, job, kwargs)
+    return job
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+@contextmanager
+def exclusive():
+    """
+    Fecha a fila durante o bloco. QueueBusy se já houver job pendente (quem
+    chama decide: esperar ou desistir) ou se outro exclusive() estiver aberto.
+    """
+    global _fechada
+    with _lock:
+        if _fechada:
+            raise QueueBusy("fila de ingestão fechada (limpeza do banco em andamento)")
+        n = sum(1 for j in _jobs.values() if j.status in (QUEUED, RUNNING))
+        if n:
+            raise QueueBusy(f"{n} ingestão(ões) pendente(s) na fila")
+        _fechada = True
+    try:
+        yield
+    finally:
+        with _lock:
+            _fechada = False
@@ -0,0 +1,99 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .parsers.itau_pdf import page_date_range
+
+# ---------------------------
+# Livro de importações (tabela imports)
+# ---------------------------
+# Cada PDF ingerido registra o intervalo de datas que cobre. Num PDF novo,
+# páginas cujas datas já estão inteiramente dentro de um intervalo coberto
+# são puladas antes da tokenização/classificação/INSERT.
+#
+# As pontas de cada intervalo são tratadas como NÃO cobertas: o último dia de
+# um extrato pode ter sido exportado pela metade (e o primeiro, idem), então
+# páginas que tocam essas datas são sempre processadas (a deduplicação por
+# hash_unico cuida do resto). Linhas SALDO DO DIA nunca são puladas.
+
+
+def _merge(intervals: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Une intervalos que se sobrepõem (compartilham pelo menos um dia)."""
+    merged: List[Tuple[str, str]] = []
+    for ini, fim in sorted(intervals):
+        if merged and ini <= merged[-1][1]:
+            if fim > merged[-1][1]:
+                merged[-1] = (merged[-1][0], fim)
+        else:
+            merged.append((ini, fim))
+    return merged
+
+
+class Coverage:
+    """
+    Decide se uma página pode ser pulada e acumula o intervalo de datas do
+    arquivo. É chamável como skip_page(pagina, data_ini, data_fim) -> bool.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[str, str]] = ()):
+        self.intervals = _merge(intervals)
+        self.data_ini: Optional[str] = None
+        self.data_fim: Optional[str] = None
+        self.paginas = 0
+        self.puladas = 0
+
+    def covers(self, ini: str, fim: str) -> bool:
+        return any(a < ini and fim < b for a, b in self.intervals)
+
+    def __call__(self, p_idx: int, ini: Optional[str], fim: Optional[str]) -> bool:
+        self.paginas += 1
+        if ini is None:
+            return False
+        if self.data_ini is None or ini < self.data_ini:
+            self.data_ini = ini
+        if self.data_fim is None or fim > self.data_fim:
+            self.data_fim = fim
+        if self.covers(ini, fim):
+            self.puladas += 1
+            return True
+        return False
+
+
+def load_coverage(conn) -> Coverage:
+    cur = conn.execute(
+        "SELECT data_ini, data_fim FROM imports WHERE data_ini IS NOT NULL AND data_fim IS NOT NULL"
+    )
+    return Coverage(cur.fetchall())
+
+
+def is_imported(conn, sha256: str) -> bool:
+    """Um arquivo com este conteúdo já foi ingerido?"""
+    return conn.execute("SELECT 1 FROM imports WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is not None
+
+
+def filter_rows(rows: List[Dict], skip_page) -> Iterator[Dict]:
+    """
+    Aplica skip_page sobre linhas já parseadas (ex.: vindas do cache), com o
+    mesmo intervalo por página do parser (page_date_range). Como no parser,
+    páginas puladas ainda entregam suas linhas SALDO DO DIA.
+    """
+    i = 0
+    n = len(rows)
+    while i < n:
+        pagina = rows[i]["pagina"]
+        j = i
+        while j < n and rows[j]["pagina"] == pagina:
+            j += 1
+        if not skip_page(pagina, *page_date_range(rows[i:j])):
+            yield from rows[i:j]
+        else:
+            yield from (r for r in rows[i:j] if r["descricao"] == "SALDO DO DIA")
+        i = j
+
+
+def record_import(conn, arquivo: str, sha256: str, cov: Coverage, linhas: int, inseridas: int):
+    conn.execute(
+        """
+        INSERT INTO imports (arquivo, sha256, data_ini, data_fim, paginas, paginas_puladas, linhas, inseridas)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (arquivo, sha256, cov.data_ini, cov.data_fim, cov.paginas, cov.puladas, linhas, inseridas),
+    )
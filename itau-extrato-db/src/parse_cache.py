@@ -0,0 +1,148 @@
+import hashlib
+import marshal
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .settings import DATA_PROCESSED_DIR, PARSE_CACHE_MAX_MB
+from .parsers.itau_pdf import parse_itau_pdf, PARSER_VERSION, SkipPage
+from .ledger import filter_rows
+
+# Cache das linhas parseadas em data/processed, endereçado pelo conteúdo:
+#   <sha256 do PDF>.v<PARSER_VERSION>.rows
+# Formato: MAGIC + zlib(marshal(tupla de tuplas)). Mudou o parser? Sobe
+# PARSER_VERSION e as entradas antigas deixam de ser usadas (e são podadas).
+# A "idade" LRU de cada entrada é o mtime, renovado a cada acerto.
+
+MAGIC = b"ITAUROWS1"
+SUFFIX = ".rows"
+_FIELDS = ("data_iso", "descricao", "valor", "saldo_dia", "pagina", "linha")
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _entry_path(sha256: str) -> Path:
+    return DATA_PROCESSED_DIR / f"{sha256}.v{PARSER_VERSION}{SUFFIX}"
+
+def load(sha256: str) -> Optional[List[Dict]]:
+    p = _entry_path(sha256)
+    try:
+        blob = p.read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        if not blob.startswith(MAGIC):
+            raise ValueError("cabeçalho inválido")
+        packed = marshal.loads(zlib.decompress(blob[len(MAGIC):]))
+    except Exception:
+        # entrada corrompida (ou de outra versão do Python): descarta
+        p.unlink(missing_ok=True)
+        return None
+    os.utime(p)  # marca como usada recentemente (LRU)
+    return [dict(zip(_FIELDS, t)) for t in packed]
+
+def store(sha256: str, rows: List[Dict]):
+    DATA_PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    packed = tuple(tuple(r.get(k) for k in _FIELDS) for r in rows)
+    blob = MAGIC + zlib.compress(marshal.dumps(packed), 6)
+    p = _entry_path(sha256)
+    tmp = p.with_name(p.name + f".{os.getpid()}.tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, p)  # escrita atômica
+    prune()
+
+def cached_parse(
+    pdf_path: str,
+    sha256: Optional[str] = None,
+    workers: Optional[int] = None,
+    skip_page: Optional[SkipPage] = None,
+    probe: bool = True,
+) -> Tuple[List[Dict], bool]:
+    """
+    Retorna (linhas, acerto_no_cache). Em caso de acerto o PdfReader nem é aberto.
+    sha256 pode ser informado por quem já calculou o hash do arquivo.
+    skip_page é repassado ao parser (ou aplicado às linhas do cache); só
+    gravamos no cache quando nenhuma página foi pulada. probe: ver
+    parse_itau_pdf.
+    """
+    sha256 = sha256 or file_sha256(pdf_path)
+    rows = load(sha256)
+    if rows is not None:
+        if skip_page is not None:
+            rows = list(filter_rows(rows, skip_page))
+        return rows, True
+
+    skipped = []
+    def _skip(p_idx, ini, fim):
+        if skip_page is not None and skip_page(p_idx, ini, fim):
+            skipped.append(p_idx)
+            return True
+        return False
+
+    rows = list(parse_itau_pdf(pdf_path, workers=workers, skip_page=_skip, probe=probe))
+    if not skipped:
+        store(sha256, rows)
+    return rows, False
+
+# ---------------------------
+# Inspeção / poda
+# ---------------------------
+
+def _entries() -> List[Path]:
+    if not DATA_PROCESSED_DIR.exists():
+        return []
+    return [p for p in DATA_PROCESSED_DIR.glob(f"*{SUFFIX}") if p.is_file()]
+
+def stats() -> Dict:
+    entries = _entries()
+    current = [p for p in entries if p.name.endswith(f".v{PARSER_VERSION}{SUFFIX}")]
+    return {
+        "dir": str(DATA_PROCESSED_DIR),
+        "entradas": len(entries),
+        "entradas_versao_atual": len(current),
+        "bytes": sum(p.stat().st_size for p in entries),
+        "limite_bytes": PARSE_CACHE_MAX_MB * 1024 * 1024,
+        "parser_version": PARSER_VERSION,
+    }
+
+def prune(max_bytes: Optional[int] = None) -> int:
+    """
+    Remove entradas de outras versões do parser e, se o total passar de
+    max_bytes (padrão: PARSE_CACHE_MAX_MB), as menos usadas recentemente.
+    Retorna quantas entradas foram removidas.
+    """
+    if max_bytes is None:
+        max_bytes = PARSE_CACHE_MAX_MB * 1024 * 1024
+    removed = 0
+    keep = []
+    for p in _entries():
+        if not p.name.endswith(f".v{PARSER_VERSION}{SUFFIX}"):
+            p.unlink(missing_ok=True)
+            removed += 1
+        else:
+            try:
+                st = p.stat()
+            except FileNotFoundError:  # podada por outro processo
+                continue
+            keep.append((st.st_mtime, st.st_size, p))
+
+    total = sum(size for _, size, _ in keep)
+    for _, size, p in sorted(keep, key=lambda t: t[0]):
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+def clear() -> int:
+    n = 0
+    for p in _entries():
+        p.unlink(missing_ok=True)
+        n += 1
+    return n
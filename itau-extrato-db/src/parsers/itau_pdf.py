@@ -1,44 +1,267 @@
-# src/itau_pdf.py
+# src/parsers/itau_pdf.py
 import re
-from typing import Iterator, Dict, Optional
-from dateutil.parser import parse as parse_date
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Collection, Iterator, Dict, List, Optional, Tuple
 from pypdf import PdfReader
+try:
+    # API privada do pypdf (versão fixada em requirements.txt); se sumir ou
+    # mudar, a sondagem desiste e toda página vai pelo extract_text
+    from pypdf._cmap import build_char_map
+except ImportError:
+    build_char_map = None
+
+from ..settings import PDF_PARALLEL_MIN_PAGES
+# Padrões (DATE_RE, PAT_MONEY) e o tokenizador de linha ficam em tokenizer.py
+from .tokenizer import tokenize_line
+
+# skip_page(pagina, primeira_data, ultima_data) -> True para pular a página
+SkipPage = Callable[[int, Optional[str], Optional[str]], bool]
+
+# Versão da saída do parser. Qualquer mudança que altere as linhas geradas
+# deve incrementar este número (invalida o cache em data/processed).
+PARSER_VERSION = 1
+
+# ---------------------------
+# Extração de texto (serial ou em pool de processos)
+# ---------------------------
+
+# Cada processo do pool abre o PDF uma única vez (no initializer) e
+# reaproveita o leitor para todas as páginas que receber.
+_worker_reader: Optional[PdfReader] = None
+
+def _init_worker(path: str) -> None:
+    global _worker_reader
+    _worker_reader = PdfReader(path)
+
+def _extract_page(p_idx: int) -> Tuple[int, str]:
+    """Extrai o texto da página p_idx (1-based) no processo do pool."""
+    text = _worker_reader.pages[p_idx - 1].extract_text() or ""
+    return p_idx, text
+
+def extract_pages(
+    path: str,
+    workers: Optional[int] = None,
+    skip: Collection[int] = (),
+) -> Iterator[Tuple[int, str]]:
+    """
+    Gera (pagina, texto) na ordem do PDF, exceto as páginas em `skip`.
+    - workers None/0/1: extração serial (comportamento padrão)
+    - workers > 1: distribui as páginas num pool de processos, desde que
+      haja pelo menos PDF_PARALLEL_MIN_PAGES páginas a extrair; abaixo disso
+      o custo de subir o pool é maior que o ganho e caímos no modo serial.
+    """
+    reader = PdfReader(path)
+    pages = [p for p in range(1, len(reader.pages) + 1) if p not in skip]
+    n_pages = len(pages)
+
+    if not workers or workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        for p_idx in pages:
+            yield p_idx, reader.pages[p_idx - 1].extract_text() or ""
+        return
+
+    workers = min(workers, n_pages)
+    chunksize = max(1, n_pages // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(str(path),)
+    ) as pool:
+        # map() preserva a ordem das páginas, mesmo terminando fora de ordem
+        yield from pool.map(_extract_page, pages, chunksize=chunksize)
 
 # ---------------------------
-# Padrões e utilitários
+# Sondagem barata de uma página
 # ---------------------------
+# extract_text interpreta o content stream operador a operador (ContentStream
+# do pypdf) e é o que domina o custo da ingestão. Para decidir se uma página
+# já está coberta por outra importação basta bem menos: nos extratos do Itaú
+# cada trecho de texto é um "x y Tm" absoluto seguido de um Tj, então uma
+# regex sobre os bytes do stream + o ToUnicode das fontes remontam as linhas
+# (agrupadas pela altura, ordenadas por x).
+#
+# Qualquer coisa fora desse formato (TJ, Td, ', ", cm ou Do fora de uma
+# imagem, fonte que o build_char_map não entende, erro inesperado...) faz a
+# sondagem desistir (None) e a página segue pela extração completa; o mesmo
+# vale para página sem nenhuma linha datada na sondagem.
+# As linhas datadas saem iguais às do extract_text; só a numeração das
+# linhas de cabeçalho pode mudar (o campo linha não entra no hash_unico).
+
+_PROBE_OPS = re.compile(
+    rb"/([^\s/\[\]()<>{}%]+)\s+[-\d.]+\s+Tf"                      # 1: fonte
+    rb"|(?:[-\d.]+\s+){4}([-\d.]+)\s+([-\d.]+)\s+Tm"              # 2, 3: x, y
+    rb"|\(((?:\\.|[^\\)])*)\)\s*Tj"                               # 4: (literal) Tj
+    rb"|<([0-9A-Fa-f\s]*)>\s*Tj"                                    # 5: <hex> Tj
+    rb"|(\bT[dD*J]|\bcm\b|[\'\"])",                                # 6: fora do formato
+    re.S,
+)
+# "q <matriz> cm /Im1 Do Q": imagem (logo), não mexe nas coordenadas do texto
+_PROBE_IMAGEM = re.compile(rb"\bq\s+(?:[-\d.]+\s+){6}cm\s+/[^\s/]+\s+Do\s+Q\b")
+_PROBE_CM = re.compile(rb"\bcm\b|\bDo\b")   # Do: form XObject pode ter texto
+# só o miolo dos objetos de texto interessa (o resto do stream é desenho)
+_PROBE_BT = re.compile(rb"\bBT\b(.*?)\bET\b", re.S)
+_PROBE_ESC = re.compile(rb"\\([0-7]{1,3}|.)", re.S)
+_PROBE_ESC_CHARS = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+# distância máxima (pontos) entre alturas de trechos da mesma linha: fontes
+# diferentes na mesma linha saem com baselines ligeiramente diferentes
+_PROBE_LINE_TOL = 2.0
 
-# Data no início da linha: DD/MM/AAAA
-DATE_RE = re.compile(r"^(\d{2}/\d{2}/\d{4})\s+")
 
-# Dinheiro pt-BR com possível sinal negativo:
-# exemplos: -61,20 | 1.749,47 | 0,00 | -2.314,88
-PAT_MONEY = re.compile(r'(?<!\d)(-?\d{1,3}(?:\.\d{3})*,\d{2})(?!\d)')
+def _unescape(s: bytes) -> bytes:
+    def _sub(m):
+        c = m.group(1)
+        if c[:1].isdigit():
+            return bytes((int(c, 8) & 0xFF,))
+        return _PROBE_ESC_CHARS.get(c, c)
+    return _PROBE_ESC.sub(_sub, s)
 
-def _to_iso(date_str: str) -> str:
-    """dd/mm/aaaa -> yyyy-mm-dd"""
-    dt = parse_date(date_str, dayfirst=True)
-    return dt.date().isoformat()
 
-def _extract_last_money(txt: str) -> Optional[str]:
-    """Captura o ÚLTIMO valor monetário na linha (padrão dos extratos Itaú)."""
-    matches = PAT_MONEY.findall(txt)
-    if not matches:
+def _char_map(page, nome: str, fontes: Dict) -> tuple:
+    """build_char_map memoizado pelo objeto da fonte (as páginas compartilham)."""
+    try:
+        ref = page["/Resources"]["/Font"].raw_get(nome)
+        chave = (ref.idnum, ref.generation)
+    except (AttributeError, KeyError):
+        return build_char_map(nome, 200.0, page)
+    if chave not in fontes:
+        fontes[chave] = build_char_map(nome, 200.0, page)
+    return fontes[chave]
+
+
+def probe_page_text(page, fontes: Optional[Dict] = None) -> Optional[str]:
+    """
+    Texto da página remontado direto do content stream (ver acima), ou None
+    se a página não segue o formato esperado. `fontes` guarda os mapas de
+    caracteres entre páginas do mesmo PDF.
+    """
+    if build_char_map is None:
+        return None
+    if fontes is None:
+        fontes = {}
+    contents = page.get_contents()
+    if contents is None:
+        return None
+    data = _PROBE_IMAGEM.sub(b"", contents.get_data())
+    if _PROBE_CM.search(data):
         return None
-    return matches[-1]
 
-_SPACES_RE = re.compile(r"\s+")
-def _clean_desc(txt: str) -> str:
-    """Limpa espaços extras na descrição."""
-    txt = txt.strip()
-    txt = _SPACES_RE.sub(" ", txt)
-    return txt
+    font = None
+    partes = []
+    for bloco in _PROBE_BT.findall(data):
+        x = y = None  # BT zera a matriz de texto
+        for m in _PROBE_OPS.finditer(bloco):
+            if m.group(6):
+                return None
+            if m.group(1):
+                try:
+                    font = _char_map(page, "/" + m.group(1).decode("latin-1"), fontes)
+                except Exception:
+                    return None
+            elif m.group(2):
+                x, y = float(m.group(2)), float(m.group(3))
+            else:
+                if font is None or y is None:
+                    return None
+                _, _, encoding, cmap, _ = font
+                try:
+                    if m.group(4) is not None:
+                        raw = _unescape(m.group(4))
+                    else:
+                        raw = bytes.fromhex(m.group(5).decode("ascii"))
+                    if isinstance(encoding, str):
+                        t = raw.decode(encoding, "surrogatepass")
+                    else:
+                        t = "".join(encoding.get(b, chr(b)) for b in raw)
+                except ValueError:  # hex ímpar, bytes fora da codificação
+                    return None
+                partes.append((-y, x, "".join(cmap.get(c, c) for c in t)))
+
+    # de cima para baixo; trechos a até _PROBE_LINE_TOL da primeira altura
+    # da linha fazem parte dela
+    partes.sort()
+    linhas: List[List[Tuple[float, str]]] = []
+    topo = None
+    for neg_y, px, t in partes:
+        if topo is None or neg_y - topo > _PROBE_LINE_TOL:
+            linhas.append([])
+            topo = neg_y
+        linhas[-1].append((px, t))
+    return "\n".join(" ".join(t for _, t in sorted(l)) for l in linhas)
 
 # ---------------------------
 # Parser
 # ---------------------------
 
-def parse_itau_pdf(path: str) -> Iterator[Dict]:
+def page_date_range(rows: List[Dict]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Menor e maior data_iso das linhas parseadas de uma página (None, None se
+    não houver). É o intervalo que vai para skip_page, tanto no parser
+    quanto sobre linhas do cache (ledger.filter_rows).
+    """
+    if not rows:
+        return None, None
+    datas = [r["data_iso"] for r in rows]
+    return min(datas), max(datas)
+
+
+def _saldos(rows: List[Dict]) -> List[Dict]:
+    """O que sai de uma página pulada: só as linhas SALDO DO DIA."""
+    return [r for r in rows if r["descricao"] == "SALDO DO DIA"]
+
+def parse_page(p_idx: int, text: str, only_saldo: bool = False) -> Iterator[Dict]:
+    """
+    Gera as linhas de uma página (ver parse_itau_pdf).
+    only_saldo: só as linhas "SALDO DO DIA" (usado em páginas puladas).
+    """
+    for l_idx, raw in enumerate(text.splitlines(), start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        if only_saldo and "SALDO DO DIA" not in line.upper():
+            continue
+
+        # 1) Data no início da linha? (linhas de cabeçalho/rodapé/aviso são ignoradas)
+        tk = tokenize_line(line)
+        if tk is None:
+            continue
+
+        # 2) Snapshot "SALDO DO DIA"? Ex.: "SALDO DO DIA 91,24"
+        #    O saldo vem como último número na linha; se faltar (não deveria),
+        #    emite registro mínimo com saldo_dia None.
+        if tk.saldo_do_dia:
+            yield {
+                "data_iso": tk.data_iso,
+                "descricao": "SALDO DO DIA",
+                "valor": None,                                     # snapshot, não é lançamento
+                "saldo_dia": tk.valores[-1] if tk.valores else None,  # string pt-BR
+                "pagina": p_idx,
+                "linha": l_idx,
+            }
+            continue
+
+        # 3) Linha de lançamento "normal":
+        #    Padrão Itaú: ... <DESCRIÇÃO LIVRE> ... <VALOR> [<SALDO>]
+        #    Tomamos SEMPRE o último valor como "valor da transação".
+        if not tk.valores:
+            # Linha sem dinheiro (raro) — ignora ou poderia logar
+            continue
+
+        # A descrição já vem sem TODOS os tokens monetários.
+        # Em alguns PDFs aparecem números "códigos" no meio (ex.: "0609")
+        # Isso é parte da descrição; não tentamos interpretar como saldo.
+        yield {
+            "data_iso": tk.data_iso,
+            "descricao": tk.descricao,
+            "valor": tk.valores[-1],   # string pt-BR, ex.: "-61,20"
+            "saldo_dia": None,         # nunca preenche em lançamentos comuns
+            "pagina": p_idx,
+            "linha": l_idx,
+        }
+
+def parse_itau_pdf(
+    path: str,
+    workers: Optional[int] = None,
+    skip_page: Optional[SkipPage] = None,
+    probe: bool = True,
+) -> Iterator[Dict]:
     """
     Gera dicionários com:
       - data_iso: 'YYYY-MM-DD'
@@ -47,71 +270,47 @@ def parse_itau_pdf(path: str) -> Iterator[Dict]:
       - saldo_dia: string pt-BR do saldo (apenas em SALDO DO DIA), senão None
       - pagina: número da página (1-based)
       - linha: número da linha (1-based)
-    """
-    reader = PdfReader(path)
-    for p_idx, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
-        for l_idx, raw in enumerate(text.splitlines(), start=1):
-            line = raw.strip()
-            if not line:
-                continue
 
-            # 1) Data no início da linha?
-            m_date = DATE_RE.match(line)
-            if not m_date:
-                continue  # linhas de cabeçalho/rodapé/aviso são ignoradas
-
-            date_str = m_date.group(1)                 # DD/MM/AAAA
-            rest = line[m_date.end():].strip()         # após a data
-            data_iso = _to_iso(date_str)
-
-            # 2) Snapshot "SALDO DO DIA"?
-            #    Ex.: "SALDO DO DIA 91,24"
-            upper = rest.upper()
-            if "SALDO DO DIA" in upper:
-                # O saldo vem como último número na linha
-                saldo_txt = _extract_last_money(rest)
-                if saldo_txt is None:
-                    # Não deveria acontecer; se acontecer, emite registro mínimo
-                    yield {
-                        "data_iso": data_iso,
-                        "descricao": "SALDO DO DIA",
-                        "valor": None,
-                        "saldo_dia": None,
-                        "pagina": p_idx,
-                        "linha": l_idx,
-                    }
-                else:
-                    yield {
-                        "data_iso": data_iso,
-                        "descricao": "SALDO DO DIA",
-                        "valor": None,           # snapshot, não é lançamento
-                        "saldo_dia": saldo_txt,  # string pt-BR
-                        "pagina": p_idx,
-                        "linha": l_idx,
-                    }
-                continue
+    workers > 1 ativa a extração de texto em paralelo (ver extract_pages);
+    a sequência de linhas gerada é idêntica à do modo serial.
 
-            # 3) Linha de lançamento "normal":
-            #    Padrão Itaú: ... <DESCRIÇÃO LIVRE> ... <VALOR> [<SALDO>]
-            #    Tomamos SEMPRE o último valor como "valor da transação".
-            valor_txt = _extract_last_money(rest)
-            if valor_txt is None:
-                # Linha sem dinheiro (raro) — ignora ou poderia logar
+    skip_page, se informado, recebe o intervalo de datas de cada página
+    (page_date_range) e pode pulá-la. A decisão vem da sondagem barata
+    (probe_page_text), antes da extração completa: página pulada não passa
+    por extract_text. Páginas que a sondagem não entende são extraídas e
+    decididas depois, como antes. probe=False dispensa a sondagem quando
+    quem chama sabe que nada será pulado (ex.: banco sem importações) e
+    ela seria só custo. Das páginas puladas ainda saem as linhas
+    SALDO DO DIA: o saldo de abertura de um extrato só existe nele, mesmo
+    quando o dia já foi coberto por outra exportação.
+    """
+    # pagina -> linhas a emitir sem extração (páginas puladas)
+    puladas: Dict[int, List[Dict]] = {}
+    # páginas já decididas pela sondagem (skip_page chamado uma vez por página)
+    decididas = set()
+    if skip_page is not None and probe:
+        fontes: Dict = {}
+        for p_idx, page in enumerate(PdfReader(path).pages, start=1):
+            try:
+                text = probe_page_text(page, fontes)
+            except Exception:
+                text = None   # a sondagem é só atalho: na dúvida, extração completa
+            if text is None:
                 continue
+            rows = list(parse_page(p_idx, text))
+            if not rows:
+                continue      # nada datado: não dá para decidir pela sondagem
+            decididas.add(p_idx)
+            if skip_page(p_idx, *page_date_range(rows)):
+                puladas[p_idx] = _saldos(rows)
 
-            # Remove TODOS os tokens monetários da descrição
-            desc = PAT_MONEY.sub("", rest)
-            desc = _clean_desc(desc)
-
-            # Em alguns PDFs aparecem números "códigos" no meio (ex.: "0609")
-            # Isso é parte da descrição; não tentamos interpretar como saldo.
-
-            yield {
-                "data_iso": data_iso,
-                "descricao": desc,
-                "valor": valor_txt,   # string pt-BR, ex.: "-61,20"
-                "saldo_dia": None,    # nunca preenche em lançamentos comuns
-                "pagina": p_idx,
-                "linha": l_idx,
-            }
+    pendentes = sorted(puladas)
+    for p_idx, text in extract_pages(path, workers, skip=puladas):
+        while pendentes and pendentes[0] < p_idx:
+            yield from puladas[pendentes.pop(0)]
+        rows = list(parse_page(p_idx, text))
+        if p_idx not in decididas and skip_page is not None and skip_page(p_idx, *page_date_range(rows)):
+            rows = _saldos(rows)
+        yield from rows
+    for p_idx in pendentes:
+        yield from puladas[p_idx]
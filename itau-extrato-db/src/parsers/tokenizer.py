@@ -0,0 +1,67 @@
+import re
+from datetime import date
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+from dateutil.parser import parse as parse_date
+
+# ---------------------------
+# Tokenizador do layout fixo do extrato Itaú:
+#   DD/MM/AAAA <descrição livre> <valor> [<saldo>]
+# Uma varredura por linha produz data ISO, descrição limpa e tokens
+# monetários (substitui dateutil + findall + sub + _clean_desc).
+# ---------------------------
+
+# Data no início da linha: DD/MM/AAAA
+DATE_RE = re.compile(r"^(\d{2}/\d{2}/\d{4})\s+")
+
+# Dinheiro pt-BR com possível sinal negativo:
+# exemplos: -61,20 | 1.749,47 | 0,00 | -2.314,88
+PAT_MONEY = re.compile(r'(?<!\d)(-?\d{1,3}(?:\.\d{3})*,\d{2})(?!\d)')
+
+
+class LineTokens(NamedTuple):
+    data_iso: str          # 'YYYY-MM-DD'
+    descricao: str         # sem tokens monetários, espaços colapsados
+    valores: List[str]     # tokens monetários pt-BR, na ordem da linha
+    saldo_do_dia: bool     # linha de snapshot "SALDO DO DIA"
+
+
+@lru_cache(maxsize=4096)
+def iso_date(date_str: str) -> str:
+    """dd/mm/aaaa -> yyyy-mm-dd (memoizado: um extrato tem poucas datas distintas)."""
+    try:
+        return date(int(date_str[6:10]), int(date_str[3:5]), int(date_str[0:2])).isoformat()
+    except ValueError:
+        # Fora do padrão (ex.: "05/13/2025"): mantém a interpretação do dateutil
+        return parse_date(date_str, dayfirst=True).date().isoformat()
+
+
+def tokenize_line(line: str) -> Optional[LineTokens]:
+    """
+    Recebe a linha já sem espaços nas pontas. Retorna None se ela não começa
+    com data (cabeçalho/rodapé/aviso).
+    """
+    m_date = DATE_RE.match(line)
+    if not m_date:
+        return None
+
+    rest = line[m_date.end():].strip()
+    data_iso = iso_date(m_date.group(1))
+
+    # Uma passada: coleta os valores e os trechos entre eles (= descrição)
+    valores = []
+    parts = []
+    pos = 0
+    for m in PAT_MONEY.finditer(rest):
+        parts.append(rest[pos:m.start()])
+        valores.append(m.group(1))
+        pos = m.end()
+    parts.append(rest[pos:])
+
+    if "SALDO DO DIA" in rest.upper():
+        return LineTokens(data_iso, "SALDO DO DIA", valores, True)
+
+    # split()/join colapsa espaços exatamente como strip() + sub(r"\s+", " ")
+    desc = " ".join("".join(parts).split())
+    return LineTokens(data_iso, desc, valores, False)
+
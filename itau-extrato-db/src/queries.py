@@ -0,0 +1,355 @@
+import re
+from typing import List, Optional, Tuple
+
+from .asof import SQL_ASOF, SQL_ASOF_ALL
+
+# ---------------------------
+# SQL das páginas de relatório
+# ---------------------------
+# `data` é gravada sempre como ISO (YYYY-MM-DD, ver migração 0006), então os
+# filtros comparam a coluna nua — date(data) impediria o uso dos índices.
+# date(?) fica só do lado do parâmetro, para normalizar o que vem da URL.
+#
+# REPORT_QUERIES lista cada formato de consulta usado pelas rotas;
+# `python main.py explain` confere o EXPLAIN QUERY PLAN de todos e falha se
+# algum voltar a varrer uma tabela inteira.
+
+# --- /periodos: débitos/créditos por dia + saldo do dia (daily_summary, ver src/summary.py) ---
+SQL_PERIOD_DAILY = """
+SELECT dia, debitos, creditos, saldo AS saldo_dia
+FROM daily_summary
+WHERE dia BETWEEN date(?) AND date(?)
+ORDER BY dia;
+"""
+
+# --- /periodos/detalhe: lançamentos de um dia ---
+SQL_DETAIL_BY_DAY = """
+SELECT data, lancamentos AS descricao, valor, tipo_mov, categoria, detalhe_categoria
+FROM transactions
+WHERE data = date(?)
+ORDER BY data, id;
+"""
+
+# --- /saldos-mes: Débito/Crédito por mês + Saldo do dia 1 (fallback último do mês anterior)
+# (meses a partir de daily_summary: no máximo ~31 linhas por mês do intervalo,
+#  e o intervalo continua podendo começar/terminar no meio do mês)
+SQL_MONTHLY = """
+WITH meses AS (
+  SELECT
+    substr(dia, 1, 7) || '-01' AS mes,
+    SUM(debitos)  AS debitos,
+    SUM(creditos) AS creditos
+  FROM daily_summary
+  WHERE dia BETWEEN date(?) AND date(?)
+  GROUP BY mes
+),
+saldo_mes AS (
+  SELECT
+    m.mes,
+    -- saldo do dia 1 ou, se não houver, o último do mês anterior:
+    -- uma busca por intervalo na PK de saldo_por_dia
+    (SELECT s.saldo
+       FROM saldo_por_dia s
+      WHERE s.data BETWEEN date(m.mes, '-1 month') AND m.mes
+      ORDER BY s.data DESC
+      LIMIT 1) AS saldo_dia
+  FROM meses m
+)
+SELECT
+  m.mes       AS dia,        -- mantemos o nome 'dia' para reaproveitar o JS
+  m.debitos   AS debitos,
+  m.creditos  AS creditos,
+  s.saldo_dia AS saldo_dia
+FROM meses m
+LEFT JOIN saldo_mes s ON s.mes = m.mes
+ORDER BY m.mes;
+"""
+
+# --- /saldo-do-dia ---
+SQL_SALDO_DO_DIA = "SELECT saldo FROM saldo_por_dia WHERE data = date(?);"
+
+# Paginação por chave (keyset) sobre (data, id): a página seguinte começa
+# logo depois da última linha vista, então a página 1000 custa o mesmo que a
+# primeira (OFFSET teria de percorrer tudo o que pula). idx_tx_data e
+# idx_tx_categoria_data já terminam no rowid (= id), ou seja, já são
+# (data, id) e (categoria, data, id): o ORDER BY sai do índice, sem sort.
+SALDO_DIA_LIMITE = 100
+SALDO_DIA_LIMITE_MAX = 5000
+
+Cursor = Tuple[str, int]  # (data, id) da última/primeira linha da página
+
+_CURSOR_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})_(\d+)$")
+
+
+def parse_cursor(v: Optional[str]) -> Optional[Cursor]:
+    """'YYYY-MM-DD_id' -> (data, id); ValueError se mal formado."""
+    if not v:
+        return None
+    m = _CURSOR_RE.match(v)
+    if not m:
+        raise ValueError(f"cursor inválido: {v!r}")
+    return m.group(1), int(m.group(2))
+
+
+def format_cursor(data: str, id_: int) -> str:
+    return f"{data}_{id_}"
+
+
+def saldo_do_dia_query(
+    data: Optional[str],
+    tipo: Optional[str],
+    categoria: Optional[str],
+    antes: Optional[Cursor] = None,
+    depois: Optional[Cursor] = None,
+    limite: int = SALDO_DIA_LIMITE,
+) -> Tuple[str, list]:
+    """
+    Lançamentos de /saldo-do-dia com os filtros da tela, do mais novo para o
+    mais antigo (data DESC, id DESC). antes = página seguinte (linhas depois
+    do cursor na ordem da tela); depois = página anterior, devolvida em ordem
+    crescente (quem chama inverte). Busca limite + 1 linhas para saber se há
+    mais uma página naquela direção.
+    """
+    params = []
+    where = []
+    if data:
+        where.append("data = date(?)")
+        params.append(data)
+    if tipo in ("credito", "debito"):
+        where.append("tipo_mov = ?")
+        params.append(tipo)
+    if categoria in ("aplicacao_investimento", "resgate_investimento"):
+        where.append("categoria = ?")
+        params.append(categoria)
+
+    ordem = "DESC"
+    if depois:
+        where.append("(data, id) > (?, ?)")
+        params.extend(depois)
+        ordem = "ASC"
+    elif antes:
+        where.append("(data, id) < (?, ?)")
+        params.extend(antes)
+
+    wh = "WHERE " + " AND ".join(where) if where else "WHERE 1=1"
+    sql = f"""
+        SELECT id, data, lancamentos, valor, tipo_mov, categoria, detalhe_categoria, saldo_dia
+        FROM transactions
+        {wh}
+        ORDER BY data {ordem}, id {ordem}
+        LIMIT ?;
+    """
+    params.append(min(max(int(limite), 1), SALDO_DIA_LIMITE_MAX) + 1)
+    return sql, params
+
+# --- /investimentos ---
+APLICACAO_EXPR = "COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE')"
+
+INVEST_CATEGORIAS = "('aplicacao_investimento','resgate_investimento')"
+
+def investimentos_totais_query(start: Optional[str], end: Optional[str], app_filter: Optional[str]) -> Tuple[str, list]:
+    """
+    Totais aplicado/resgatado por aplicação respeitando os filtros. Sem
+    filtro de período lê monthly_rollup (custo independente do histórico);
+    com período, agrega transactions_base pelo índice (categoria, data).
+    """
+    if not start and not end:
+        params = []
+        where = [f"categoria IN {INVEST_CATEGORIAS}"]
+        if app_filter:
+            where.append("aplicacao = ?")
+            params.append(app_filter)
+        sql = f"""
+            SELECT
+              aplicacao,
+              SUM(CASE WHEN categoria='aplicacao_investimento' THEN -total ELSE 0 END) AS valor_aplicado,
+              SUM(CASE WHEN categoria='resgate_investimento'   THEN -total ELSE 0 END) AS valor_resgatado
+            FROM monthly_rollup
+            WHERE {" AND ".join(where)}
+            GROUP BY aplicacao
+            ORDER BY aplicacao;
+        """
+        return sql, params
+
+    params = []
+    where = [f"categoria IN {INVEST_CATEGORIAS}"]
+    if start:
+        where.append("data >= date(?)"); params.append(start)
+    if end:
+        where.append("data <= date(?)"); params.append(end)
+    if app_filter:
+        where.append(f"{APLICACAO_EXPR} = ?")
+        params.append(app_filter)
+
+    wh = "WHERE " + " AND ".join(where)
+    sql = f"""
+        WITH base AS (
+          SELECT
+            {APLICACAO_EXPR} AS aplicacao,
+            categoria,
+            valor
+          FROM transactions_base
+          {wh}
+        )
+        SELECT
+          aplicacao,
+          SUM(CASE WHEN categoria='aplicacao_investimento' THEN -valor ELSE 0 END) AS valor_aplicado,
+          SUM(CASE WHEN categoria='resgate_investimento'   THEN -valor ELSE 0 END) AS valor_resgatado
+        FROM base
+        GROUP BY aplicacao
+        ORDER BY aplicacao;
+    """
+    return sql, params
+
+SQL_APLICACOES = f"""
+    SELECT DISTINCT aplicacao
+    FROM monthly_rollup
+    WHERE categoria IN {INVEST_CATEGORIAS}
+    ORDER BY aplicacao;
+"""
+
+# --- /analytics/pivot ---
+PIVOT_DIMENSOES = ("categoria", "aplicacao", "tipo_mov")
+PIVOT_MEDIDAS = ("total", "n_tx")
+
+def pivot_query(
+    linhas: str,
+    medida: str,
+    mes_ini: str,
+    mes_fim: str,
+    categoria: Optional[str] = None,
+    tipo_mov: Optional[str] = None,
+) -> Tuple[str, list]:
+    """
+    (chave da linha, mês, valor) a partir de monthly_rollup. linhas e medida
+    precisam estar em PIVOT_DIMENSOES/PIVOT_MEDIDAS (entram no SQL).
+    """
+    if linhas not in PIVOT_DIMENSOES or medida not in PIVOT_MEDIDAS:
+        raise ValueError(f"pivot inválido: linhas={linhas!r}, medida={medida!r}")
+    params = [mes_ini, mes_fim]
+    where = ["mes BETWEEN ? AND ?"]
+    if categoria is not None:
+        where.append("categoria = ?")
+        params.append(categoria)
+    if tipo_mov is not None:
+        where.append("tipo_mov = ?")
+        params.append(tipo_mov)
+    sql = f"""
+        SELECT {linhas} AS chave, mes, SUM({medida}) AS valor
+        FROM monthly_rollup
+        WHERE {" AND ".join(where)}
+        GROUP BY chave, mes
+        ORDER BY chave, mes;
+    """
+    return sql, params
+
+# --- /export/transactions, /export/saldos (streaming em src/export.py) ---
+EXPORT_TX_COLUNAS = ("data", "lancamentos", "valor", "tipo_mov", "categoria", "detalhe_categoria", "saldo_dia")
+
+def transactions_export_query(
+    start: Optional[str], end: Optional[str], tipo: Optional[str], categoria: Optional[str]
+) -> Tuple[str, list]:
+    """Lançamentos em ordem cronológica, com os filtros de /saldo-do-dia e /periodos."""
+    params = []
+    where = []
+    if start:
+        where.append("data >= date(?)"); params.append(start)
+    if end:
+        where.append("data <= date(?)"); params.append(end)
+    if tipo:
+        where.append("tipo_mov = ?"); params.append(tipo)
+    if categoria:
+        where.append("categoria = ?"); params.append(categoria)
+    wh = "WHERE " + " AND ".join(where) if where else ""
+    sql = f"""
+        SELECT {", ".join(EXPORT_TX_COLUNAS)}
+        FROM transactions
+        {wh}
+        ORDER BY data, id;
+    """
+    return sql, params
+
+def saldos_export_query(start: Optional[str], end: Optional[str]) -> Tuple[str, list]:
+    """Saldo informado por dia (saldo_por_dia) no período."""
+    params = []
+    where = []
+    if start:
+        where.append("data >= date(?)"); params.append(start)
+    if end:
+        where.append("data <= date(?)"); params.append(end)
+    wh = "WHERE " + " AND ".join(where) if where else ""
+    sql = f"SELECT data, saldo FROM saldo_por_dia {wh} ORDER BY data;"
+    return sql, params
+
+# ---------------------------
+# Conferência dos planos (python main.py explain)
+# ---------------------------
+
+# (nome, sql, parâmetros de exemplo, aliases que podem ser varridos:
+#  CTEs/subconsultas já materializadas, nunca tabelas)
+REPORT_QUERIES: List[Tuple[str, str, tuple, frozenset]] = [
+    ("periodos", SQL_PERIOD_DAILY, ("2025-01-01", "2025-12-31"), frozenset()),
+    ("periodos/detalhe", SQL_DETAIL_BY_DAY, ("2025-09-01",), frozenset()),
+    ("saldos-mes", SQL_MONTHLY, ("2025-01-01", "2025-12-31"), frozenset({"m"})),
+    ("saldo-do-dia: saldo", SQL_SALDO_DO_DIA, ("2025-09-01",), frozenset()),
+    ("saldo-do-dia: data", *saldo_do_dia_query("2025-09-01", None, None), frozenset()),
+    ("saldo-do-dia: data+tipo+categoria",
+     *saldo_do_dia_query("2025-09-01", "debito", "aplicacao_investimento"), frozenset()),
+    ("saldo-do-dia: categoria", *saldo_do_dia_query(None, None, "resgate_investimento"), frozenset()),
+    ("saldo-do-dia: sem filtro", *saldo_do_dia_query(None, None, None), frozenset()),
+    ("saldo-do-dia: próxima página",
+     *saldo_do_dia_query(None, None, None, antes=("2025-09-01", 500), limite=5000), frozenset()),
+    ("saldo-do-dia: página anterior",
+     *saldo_do_dia_query(None, "debito", None, depois=("2025-09-01", 500)), frozenset()),
+    ("saldo-do-dia: categoria, próxima página",
+     *saldo_do_dia_query(None, None, "resgate_investimento", antes=("2025-09-01", 500)), frozenset()),
+    ("investimentos: totais", *investimentos_totais_query(None, None, None), frozenset()),
+    ("investimentos: totais+periodo+app",
+     *investimentos_totais_query("2025-01-01", "2025-12-31", "CDB DI"), frozenset({"base"})),
+    ("investimentos: totais+app", *investimentos_totais_query(None, None, "CDB DI"), frozenset()),
+    ("investimentos: aplicacoes", SQL_APLICACOES, (), frozenset()),
+    ("analytics/pivot", *pivot_query("categoria", "total", "2025-01", "2025-12"), frozenset()),
+    ("analytics/pivot: filtros",
+     *pivot_query("aplicacao", "n_tx", "2025-01", "2025-12", "aplicacao_investimento", "debito"), frozenset()),
+    ("investimentos: saldo em (asof)", SQL_ASOF, ("CDB DI", "2025-09-01"), frozenset()),
+    ("investimentos: saldos em (asof_all)", SQL_ASOF_ALL, ("2025-09-01",), frozenset({"u"})),
+    ("export/transactions: período",
+     *transactions_export_query("2025-01-01", "2025-12-31", "debito", None), frozenset()),
+    ("export/transactions: categoria",
+     *transactions_export_query(None, None, None, "aplicacao_investimento"), frozenset()),
+    # exportar tudo é, por definição, ler a tabela inteira
+    ("export/transactions: tudo", *transactions_export_query(None, None, None, None), frozenset({"t"})),
+    ("export/saldos: período", *saldos_export_query("2025-01-01", "2025-12-31"), frozenset()),
+]
+
+_SCAN_RE = re.compile(r"^SCAN (\S+)$")
+_SUBQUERY_RE = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\S+)$")
+
+
+def query_plan(conn, sql: str, params=()) -> List[str]:
+    return [row[3].strip() for row in conn.execute("EXPLAIN QUERY PLAN " + sql, tuple(params))]
+
+
+def full_scans(plan: List[str], allow=frozenset()) -> List[str]:
+    """
+    Linhas 'SCAN x' sem índice. Não contam: CTEs/views que o próprio plano
+    materializa (o custo delas aparece nas linhas de dentro) e os aliases
+    em allow.
+    """
+    allow = set(allow)
+    allow.update(m.group(1) for m in map(_SUBQUERY_RE.match, plan) if m)
+    bad = []
+    for detail in plan:
+        m = _SCAN_RE.match(detail)
+        if m and m.group(1) not in allow:
+            bad.append(detail)
+    return bad
+
+
+def check_plans(conn):
+    """[(nome, plano, varreduras)] para cada consulta de REPORT_QUERIES."""
+    out = []
+    for name, sql, params, allow in REPORT_QUERIES:
+        plan = query_plan(conn, sql, params)
+        out.append((name, plan, full_scans(plan, allow)))
+    return out
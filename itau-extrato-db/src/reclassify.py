@@ -0,0 +1,70 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from . import dataversion
+from .settings import RECLASSIFY_CHUNK_ROWS
+from .rules import classify, load_rules
+from .summary import refresh_months
+
+# ---------------------------
+# Reclassificação em massa de transactions
+# ---------------------------
+# Percorre a tabela em blocos por id (memória limitada ao bloco), roda as
+# regras atuais sobre lancamentos_norm e grava só o que mudou, com UPDATE
+# em lote. O matcher memoiza por descrição: cada descrição distinta é
+# classificada uma única vez, mesmo repetida milhares de vezes. Os meses
+# com linhas alteradas são recalculados em monthly_rollup.
+
+
+@dataclass
+class ReclassifyReport:
+    linhas: int = 0          # linhas lidas
+    alteradas: int = 0       # linhas com categoria/detalhe/tipo diferentes
+    segundos: float = 0.0
+    por_categoria: Counter = field(default_factory=Counter)   # nova categoria -> nº de linhas alteradas
+
+
+SQL_CHUNK = """
+    SELECT id, data, lancamentos_norm, valor, categoria, detalhe_categoria, tipo_mov
+    FROM transactions
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+
+SQL_UPDATE = """
+    UPDATE transactions_base
+    SET categoria = ?, detalhe_categoria = ?, tipo_mov = ?
+    WHERE id = ?
+"""
+
+
+def reclassify(conn, chunk_rows: int = RECLASSIFY_CHUNK_ROWS) -> ReclassifyReport:
+    """Reaplica classify a todas as transações; COMMIT a cada bloco."""
+    t0 = time.perf_counter()
+    load_rules(conn)
+    report = ReclassifyReport()
+    last_id = 0
+    while True:
+        rows = conn.execute(SQL_CHUNK, (last_id, chunk_rows)).fetchall()
+        if not rows:
+            break
+        updates = []
+        months = set()
+        for tx_id, data, lanc_norm, valor, categoria, detalhe, tipo in rows:
+            novo = classify(lanc_norm, valor)
+            if novo != (categoria, detalhe, tipo):
+                updates.append((*novo, tx_id))
+                months.add(data[:7])
+                report.por_categoria[novo[0] or "(sem categoria)"] += 1
+        if updates:
+            conn.executemany(SQL_UPDATE, updates)
+            refresh_months(conn, months)
+            dataversion.bump(conn)
+            conn.commit()
+        report.linhas += len(rows)
+        report.alteradas += len(updates)
+        last_id = rows[-1][0]
+    report.segundos = time.perf_counter() - t0
+    return report
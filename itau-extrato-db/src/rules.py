@@ -1,32 +1,210 @@
-from typing import Tuple, Optional
+import logging
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from hashlib import sha1
+from typing import Tuple, Optional, List, Sequence
+
+from .utils import norm_text
+
+# ---------------------------
+# Regras de classificação (tabela classification_rules)
+# ---------------------------
+# As regras são compiladas num único matcher:
+#   - modo 'contem': autômato Aho-Corasick (uma passada pelo texto, custo
+#     independente do nº de regras)
+#   - modo 'regex' : cada regra é compilada e validada sozinha; padrão que
+#     não compila é descartado (com log) e as demais regras seguem valendo.
+#     As regex sem grupos nem flags globais entram numa regex combinada
+#     usada como pré-filtro; as outras (grupos nomeados repetidos entre
+#     regras, referências \1, flags inline...) não se deixam combinar e
+#     são testadas sempre
+# O resultado é memoizado por descrição normalizada e o matcher só é
+# recompilado quando app_meta.rules_version muda.
+
+# (id, padrao, modo, prioridade, categoria, detalhe)
+Rule = Tuple[int, str, str, int, str, str]
+
+# Mesmas regras semeadas em sql/migrations/0004_classification_rules.sql
+# (usadas enquanto load_rules não foi chamado)
+DEFAULT_RULES: List[Rule] = [
+    (1, "RESGATE", "contem", 10, "resgate_investimento", "apos"),
+    (2, "APLICACAO", "contem", 20, "aplicacao_investimento", "apos"),
+]
+
+_NO_MATCH = (None, None)
+
+log = logging.getLogger(__name__)
+
+
+def compile_rule(padrao: str, modo: str) -> Optional[re.Pattern]:
+    """
+    Regex compilada de uma regra 'regex' (None para 'contem').
+    re.error se o padrão não compila: quem grava regras pode validar antes.
+    """
+    if modo != "regex":
+        return None
+    return re.compile(padrao)
+
+
+class RuleMatcher:
+    def __init__(self, rules: Sequence[Rule]):
+        # posição na lista = rank (menor vence)
+        self.rules = sorted(rules, key=lambda r: (r[3], r[0]))
+        self._build_literals()
+        self._build_regexes()
+        self.match = lru_cache(maxsize=65536)(self._match)
+
+    def _build_literals(self):
+        goto = [{}]
+        best = [len(self.rules)]   # menor rank que termina em cada nó
+        self._literal = {}
+        for rank, (_, padrao, modo, *_rest) in enumerate(self.rules):
+            if modo != "contem":
+                continue
+            pat = norm_text(padrao)
+            if not pat:
+                continue
+            self._literal[rank] = pat
+            node = 0
+            for ch in pat:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    best.append(len(self.rules))
+                node = nxt
+            best[node] = min(best[node], rank)
+
+        # Links de falha (BFS) e tabela de transição completa: na busca,
+        # cada caractere custa um único dict.get
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            f = fail[node]
+            best[node] = min(best[node], best[f])
+            delta[node] = {**delta[f], **goto[node]}
+            for ch, child in goto[node].items():
+                fail[child] = delta[f].get(ch, 0) if node else 0
+                queue.append(child)
+        self._delta = delta
+        self._best = best
+
+    def _build_regexes(self):
+        self._regex = {}
+        for rank, (rid, padrao, modo, *_rest) in enumerate(self.rules):
+            if modo != "regex":
+                continue
+            try:
+                self._regex[rank] = compile_rule(padrao, modo)
+            except re.error as e:
+                log.error("regra #%s ignorada: regex inválida %r (%s)", rid, padrao, e)
+
+        # pré-filtro só com o que se combina sem mudar de sentido: sem grupos
+        # (nomes repetidos, \1 renumerado) e sem flags globais inline
+        combinaveis = {
+            r: rx for r, rx in self._regex.items()
+            if rx.groups == 0 and not (rx.flags & ~re.UNICODE)
+        }
+        self._regex_any = None
+        if combinaveis:
+            try:
+                self._regex_any = re.compile("|".join(f"(?:{rx.pattern})" for rx in combinaveis.values()))
+            except re.error:
+                combinaveis = {}
+        self._prefiltradas = set(combinaveis)
+
+    def _match(self, lanc_norm: str) -> Tuple[Optional[str], Optional[str]]:
+        """(categoria, detalhe) da regra vencedora para a descrição normalizada."""
+        n = len(self.rules)
+        rank = n
+        delta, best = self._delta, self._best
+        node = 0
+        for ch in lanc_norm:
+            node = delta[node].get(ch, 0)
+            if best[node] < rank:
+                rank = best[node]
+                if rank == 0:
+                    break
+
+        m = None
+        if self._regex:
+            # pré-filtro sem match: só as regex fora dele podem casar
+            todas = self._regex_any is not None and self._regex_any.search(lanc_norm) is not None
+            for r, rx in self._regex.items():
+                if r >= rank:
+                    break
+                if not todas and r in self._prefiltradas:
+                    continue
+                m = rx.search(lanc_norm)
+                if m:
+                    rank = r
+                    break
+
+        if rank == n:
+            return _NO_MATCH
+        _, _, modo, _, categoria, detalhe_modo = self.rules[rank]
+        detalhe = None
+        if detalhe_modo == "apos":
+            if modo == "contem":
+                detalhe = lanc_norm.split(self._literal[rank], 1)[1].strip()
+            else:
+                detalhe = lanc_norm[m.end():].strip()
+        elif detalhe_modo == "grupo" and m is not None and "detalhe" in m.re.groupindex:
+            detalhe = (m.group("detalhe") or "").strip()
+        return categoria, detalhe
+
+
+_matcher = RuleMatcher(DEFAULT_RULES)
+_matcher_version: Optional[int] = None
+_matcher_lock = threading.Lock()
+
+
+def load_rules(conn) -> RuleMatcher:
+    """
+    Garante que o matcher reflete classification_rules. Custa uma leitura
+    de app_meta quando nada mudou; recompila só quando rules_version muda.
+    """
+    global _matcher, _matcher_version
+    row = conn.execute("SELECT valor FROM app_meta WHERE chave = 'rules_version'").fetchone()
+    version = row[0] if row else None
+    if version == _matcher_version:
+        return _matcher
+    with _matcher_lock:
+        if version != _matcher_version:
+            rules = conn.execute(
+                """
+                SELECT id, padrao, modo, prioridade, categoria, detalhe
+                FROM classification_rules
+                WHERE ativo = 1
+                """
+            ).fetchall()
+            _matcher = RuleMatcher(rules)
+            _matcher_version = version
+    return _matcher
+
+
+def invalidate():
+    """Volta às regras padrão até o próximo load_rules (ex.: o banco foi recriado)."""
+    global _matcher, _matcher_version
+    with _matcher_lock:
+        _matcher = RuleMatcher(DEFAULT_RULES)
+        _matcher_version = None
+
 
 def classify(lanc_norm: str, valor: float) -> Tuple[str, Optional[str], str]:
     """
     Retorna (categoria, detalhe_categoria, tipo_mov)
     - tipo_mov: 'credito' se valor > 0, 'debito' se valor < 0
-    - regras simples para RESGATE/APLICACAO
+    - categoria/detalhe: regra vencedora de classification_rules (ver load_rules)
     """
     tipo = "credito" if valor > 0 else "debito"
-
-    categoria = None
-    detalhe = None
-
-    if "RESGATE" in lanc_norm:
-        categoria = "resgate_investimento"
-        # detalhe após a palavra RESGATE (se existir)
-        partes = lanc_norm.split("RESGATE", 1)
-        if len(partes) > 1:
-            detalhe = partes[1].strip()
-
-    elif "APLICACAO" in lanc_norm or "APLICAÇÃO" in lanc_norm:
-        categoria = "aplicacao_investimento"
-        partes = lanc_norm.split("APLICACAO", 1)
-        if len(partes) == 1:
-            partes = lanc_norm.split("APLICAÇÃO", 1)
-        if len(partes) > 1:
-            detalhe = partes[1].strip()
-
-    # Outras regras podem ser adicionadas futuramente (PIX, SAQUE, TARIFA...)
+    categoria, detalhe = _matcher.match(lanc_norm)
     return categoria, detalhe, tipo
 
 def make_unique_hash(data_iso: str, lanc_norm: str, valor: float) -> str:
@@ -36,5 +214,4 @@ def make_unique_hash(data_iso: str, lanc_norm: str, valor: float) -> str:
     """
     sign = "C" if valor > 0 else "D"
     base = f"{data_iso}|{lanc_norm}|{abs(valor):.2f}|{sign}"
-    import hashlib
-    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+    return sha1(base.encode("utf-8")).hexdigest()
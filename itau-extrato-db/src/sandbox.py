@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from .dataversion import current as data_version
+from .db import connect_readonly
+from .queries import query_plan
+from .settings import SANDBOX_TIMEOUT_MS, SANDBOX_PAGE_ROWS, SANDBOX_CACHE_ENTRIES
+
+# ---------------------------
+# Execução das consultas do SQL Sandbox
+# ---------------------------
+# Cada consulta roda numa conexão própria, aberta só para ela:
+#   - URI mode=ro + authorizer que só deixa ler (SELECT/leitura/funções):
+#     mesmo o que escapar do filtro de texto (safe_select) não escreve nem
+#     faz ATTACH/PRAGMA
+#   - progress handler a cada SANDBOX_PROGRESS_STEPS instruções da VM:
+#     interrompe a consulta ao passar do prazo ou ao ser cancelada
+#     (POST /sql-sandbox/cancel), liberando a thread do servidor
+#   - só a página pedida é lida (LIMIT/OFFSET + fetchmany), nunca o
+#     resultado inteiro
+# Resultados ficam num LRU por (sql, página, versão dos dados — ver
+# src/dataversion.py): consulta repetida sem escrita no banco no meio não
+# volta ao SQLite.
+
+SANDBOX_PROGRESS_STEPS = 1000
+
+_LEITURA = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# pragma_table_info('x') & cia.: introspecção do schema, continua liberada
+# (ao montar essas tabelas o SQLite pede UPDATE em sqlite_master para reler
+# o schema; a conexão é mode=ro, então nada é gravado de fato)
+_PRAGMAS_LEITURA = {"table_info", "table_xinfo", "index_list", "index_info", "index_xinfo", "foreign_key_list"}
+
+
+def _authorizer(action, arg1, *_):
+    if action in _LEITURA:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 in _PRAGMAS_LEITURA:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+@dataclass
+class SandboxResult:
+    cols: List[str]
+    rows: List[dict]
+    pagina: int
+    mais: bool          # existe página seguinte
+    plano: List[str]    # EXPLAIN QUERY PLAN
+    segundos: float
+    cache: bool = False
+
+
+_cache: "OrderedDict[tuple, SandboxResult]" = OrderedDict()
+_running: Dict[str, threading.Event] = {}
+_lock = threading.Lock()
+
+
+def invalidate():
+    """Descarta os resultados em cache (ex.: o banco foi recriado)."""
+    with _lock:
+        _cache.clear()
+
+
+def cancel(query_id: str) -> bool:
+    """Pede a interrupção de uma consulta em andamento."""
+    with _lock:
+        ev = _running.get(query_id)
+    if ev is None:
+        return False
+    ev.set()
+    return True
+
+
+def run(sql: str, pagina: int = 0, linhas: int = SANDBOX_PAGE_ROWS, query_id: Optional[str] = None,
+        timeout_ms: int = SANDBOX_TIMEOUT_MS) -> SandboxResult:
+    """
+    Uma página do resultado de `sql` (SELECT já validado por safe_select).
+    ValueError com mensagem para a tela se passar do prazo ou for cancelada.
+    """
+    pagina = max(pagina, 0)
+    key = (sql, pagina, linhas, data_version())
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return replace(hit, cache=True)
+
+    wrapped = f"SELECT * FROM ({sql}) AS _safe LIMIT ? OFFSET ?"
+    params = (linhas + 1, pagina * linhas)
+    cancelada = threading.Event()
+    if query_id:
+        with _lock:
+            _running[query_id] = cancelada
+    prazo = time.monotonic() + timeout_ms / 1000
+
+    conn = connect_readonly()
+    try:
+        conn.set_authorizer(_authorizer)
+        conn.set_progress_handler(
+            lambda: 1 if cancelada.is_set() or time.monotonic() > prazo else 0,
+            SANDBOX_PROGRESS_STEPS,
+        )
+        t0 = time.perf_counter()
+        try:
+            plano = query_plan(conn, wrapped, params)
+            cur = conn.execute(wrapped, params)
+            rows = cur.fetchmany(linhas + 1)
+        except sqlite3.OperationalError as e:
+            if cancelada.is_set():
+                raise ValueError("Consulta cancelada.") from e
+            if time.monotonic() > prazo:
+                raise ValueError(f"Consulta interrompida: passou de {timeout_ms} ms.") from e
+            raise
+        segundos = time.perf_counter() - t0
+        cols = [c[0] for c in cur.description]
+    finally:
+        conn.close()
+        if query_id:
+            with _lock:
+                _running.pop(query_id, None)
+
+    res = SandboxResult(
+        cols=cols,
+        rows=[dict(zip(cols, r)) for r in rows[:linhas]],
+        pagina=pagina,
+        mais=len(rows) > linhas,
+        plano=plano,
+        segundos=segundos,
+    )
+    with _lock:
+        _cache[key] = res
+        while len(_cache) > SANDBOX_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return res
@@ -0,0 +1,150 @@
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .asof import load_index
+from .queries import APLICACAO_EXPR, INVEST_CATEGORIAS
+from .settings import SERIES_MAX_DAYS
+from .utils import parse_iso_date
+
+# ---------------------------
+# Séries diárias por aplicação (investimentos)
+# ---------------------------
+# Matriz aplicações × dias montada com NumPy:
+#   - saldo: último lançamento de investment_balances em ou antes do dia
+#     (searchsorted sobre as datas de cada aplicação; NaN antes do primeiro)
+#   - fluxo: aportes líquidos do dia = -(soma de valor) de
+#     aplicacao_investimento/resgate_investimento (aplicação entra +, resgate sai -)
+#   - rendimento do dia = saldo[t] - saldo[t-1] - fluxo[t]
+# Retorno do período pelo método de Dietz modificado:
+#   (saldo_final - saldo_inicial - Σ fluxos) / (saldo_inicial + Σ w·fluxo),
+#   w = fração do período em que o fluxo ficou aplicado.
+
+SQL_FLUXOS = f"""
+    SELECT {APLICACAO_EXPR} AS aplicacao, data, SUM(-valor) AS fluxo
+    FROM transactions_base
+    WHERE categoria IN {INVEST_CATEGORIAS}
+      AND data BETWEEN ? AND ?
+    GROUP BY 1, 2
+"""
+
+
+def _json(a: np.ndarray) -> List[Optional[float]]:
+    """Array -> lista para JSON (NaN vira None)."""
+    return [None if v != v else v for v in np.round(a, 2).tolist()]
+
+
+def _retorno(saldo0: float, saldo1: float, fluxo: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    saldo0/saldo1 são os saldos no fim do primeiro/último dia: os fluxos do
+    primeiro dia já estão em saldo0 e ficam fora do cálculo.
+    """
+    n = len(fluxo)
+    f = fluxo[1:]
+    aportes = float(f.sum())
+    rendimento = saldo1 - saldo0 - aportes
+    # fluxo do dia t fica aplicado do fim do dia t ao fim do período
+    pesos = (n - 1 - np.arange(1, n)) / max(n - 1, 1)
+    base = saldo0 + float(pesos @ f)
+    return {
+        "saldo_inicial": round(saldo0, 2),
+        "saldo_final": round(saldo1, 2),
+        "aportes_liquidos": round(aportes, 2),
+        "rendimento": round(rendimento, 2),
+        "retorno": round(rendimento / base, 6) if base > 0 else None,
+    }
+
+
+def investment_series(conn, start: str, end: str, aplicacoes: Optional[Sequence[str]] = None) -> dict:
+    """
+    Séries diárias de saldo/fluxo/rendimento de cada aplicação entre start e
+    end (ISO, inclusive) + retorno do período por aplicação e no total.
+    """
+    dias = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    n = len(dias)
+
+    idx = load_index(conn)
+    fluxos = conn.execute(SQL_FLUXOS, (start, end)).fetchall()
+    nomes = sorted(set(idx.datas) | {a for a, _, _ in fluxos})
+    if aplicacoes:
+        filtro = set(aplicacoes)
+        nomes = [a for a in nomes if a in filtro]
+    pos = {a: i for i, a in enumerate(nomes)}
+
+    # saldo carregado para a frente: para cada dia, o último lançamento <= dia
+    saldo = np.full((len(nomes), n), np.nan)
+    for a, i in pos.items():
+        datas = idx.datas.get(a)
+        if not datas:
+            continue
+        k = np.searchsorted(np.array(datas, dtype="datetime64[D]"), dias, side="right") - 1
+        valores = np.asarray(idx.saldos[a])
+        saldo[i] = np.where(k >= 0, valores[np.maximum(k, 0)], np.nan)
+
+    fluxo = np.zeros((len(nomes), n))
+    linhas = [(pos[a], d, f) for a, d, f in fluxos if a in pos]
+    if linhas:
+        ii, dd, ff = zip(*linhas)
+        cols = (np.array(dd, dtype="datetime64[D]") - dias[0]).astype(np.int64)
+        np.add.at(fluxo, (np.array(ii), cols), np.array(ff, dtype=float))
+
+    # saldo antes do primeiro lançamento conta como 0 (aplicação ainda vazia)
+    conhecido = np.nan_to_num(saldo)
+    # rendimento diário só onde os saldos de ontem e de hoje são conhecidos
+    rend = np.zeros_like(saldo)
+    if n > 1:
+        ok = ~np.isnan(saldo[:, 1:]) & ~np.isnan(saldo[:, :-1])
+        rend[:, 1:] = np.where(ok, saldo[:, 1:] - saldo[:, :-1] - fluxo[:, 1:], 0.0)
+
+    # sem nenhum saldo lançado não há como medir rendimento: só os fluxos
+    com_saldo = ~np.isnan(saldo).all(axis=1)
+    sem_retorno = dict.fromkeys(("saldo_inicial", "saldo_final", "aportes_liquidos", "rendimento", "retorno"))
+
+    series = []
+    for a, i in pos.items():
+        series.append({
+            "aplicacao": a,
+            "saldo": _json(saldo[i]),
+            "fluxo": _json(fluxo[i]),
+            "rendimento_acumulado": _json(np.cumsum(rend[i])),
+            **(_retorno(float(conhecido[i, 0]), float(conhecido[i, -1]), fluxo[i]) if com_saldo[i] else sem_retorno),
+        })
+
+    # total: soma das aplicações que têm saldo
+    total_saldo = conhecido[com_saldo].sum(axis=0)
+    total_fluxo = fluxo[com_saldo].sum(axis=0)
+    return {
+        "inicio": start,
+        "fim": end,
+        "dias": np.datetime_as_string(dias).tolist(),
+        "aplicacoes": series,
+        "total": {
+            "saldo": _json(total_saldo),
+            "fluxo": _json(total_fluxo),
+            "rendimento_acumulado": _json(np.cumsum(rend.sum(axis=0))),
+            **_retorno(float(total_saldo[0]), float(total_saldo[-1]), total_fluxo),
+        },
+    }
+
+
+def _data(iso: str) -> date:
+    try:
+        return parse_iso_date(iso)
+    except ValueError:
+        raise ValueError("start/end no formato YYYY-MM-DD.") from None
+
+
+def default_range(start: Optional[str], end: Optional[str], max_dias: int = SERIES_MAX_DAYS) -> tuple:
+    """
+    Valida/normaliza o intervalo (padrão: últimos 365 dias até hoje).
+    ValueError (mensagem para a resposta 400) se a data for inválida ou o
+    intervalo passar de max_dias.
+    """
+    d1 = _data(end) if end else date.today()
+    d0 = _data(start) if start else date.fromordinal(d1.toordinal() - 364)
+    if d0 > d1:
+        d0, d1 = d1, d0
+    if (d1 - d0).days + 1 > max_dias:
+        raise ValueError(f"intervalo de no máximo {max_dias} dias.")
+    return d0.isoformat(), d1.isoformat()
@@ -1,14 +1,65 @@
+import os
 from pathlib import Path
 
 # Raiz do projeto
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 
-# Banco de dados
-DB_PATH = PROJECT_ROOT / "bank.db"
+# Banco de dados (DB_PATH no ambiente: outro arquivo, ex.: banco descartável dos testes)
+DB_PATH = Path(os.environ.get("DB_PATH", PROJECT_ROOT / "bank.db"))
+
+# Pool de conexões da web app (por tipo: leitura / escrita)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "40"))        # = threadpool padrão do FastAPI
+DB_STATEMENT_CACHE = int(os.environ.get("DB_STATEMENT_CACHE", "256"))
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "16384"))
+
+# WAL: leitores não esperam o escritor (ingestões longas)
+DB_WAL = os.environ.get("DB_WAL", "1") not in ("0", "false", "no")
+WAL_AUTOCHECKPOINT_PAGES = int(os.environ.get("WAL_AUTOCHECKPOINT_PAGES", "1000"))
+# Acima deste tamanho o checkpoint pós-ingestão é TRUNCATE (zera o -wal)
+WAL_CHECKPOINT_MAX_MB = int(os.environ.get("WAL_CHECKPOINT_MAX_MB", "64"))
 
 # Pastas de dados
 DATA_RAW_DIR = PROJECT_ROOT / "data" / "raw"
 DATA_PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
 
-# DDL
-MODELS_SQL = PROJECT_ROOT / "sql" / "models.sql"
+# DDL: migrações numeradas (sql/migrations/NNNN_*.sql)
+MIGRATIONS_DIR = PROJECT_ROOT / "sql" / "migrations"
+
+# Parser de PDF
+# Nº de processos para extrair páginas em paralelo (0/1 = serial)
+PDF_PARSE_WORKERS = int(os.environ.get("PDF_PARSE_WORKERS", "0"))
+# Abaixo deste nº de páginas a extração é sempre serial
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "16"))
+
+# Ingestão: COMMIT a cada N linhas gravadas (transações curtas = WAL enxuto
+# e escritores concorrentes, como add-saldo, esperam pouco)
+INGEST_COMMIT_ROWS = int(os.environ.get("INGEST_COMMIT_ROWS", "20000"))
+# Fila de ingestão da web app: threads executando uploads e nº de jobs
+# finalizados mantidos para consulta em /jobs/{id}
+INGEST_JOB_WORKERS = int(os.environ.get("INGEST_JOB_WORKERS", "2"))
+INGEST_JOBS_KEEP = int(os.environ.get("INGEST_JOBS_KEEP", "200"))
+# Uploads: tamanho do bloco na cópia para data/raw
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Linhas por chamada de executemany na gravação
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "5000"))
+
+# Cache de parsing em data/processed (tamanho máximo, LRU)
+PARSE_CACHE_MAX_MB = int(os.environ.get("PARSE_CACHE_MAX_MB", "256"))
+
+# Reclassificação: linhas lidas/gravadas por bloco
+RECLASSIFY_CHUNK_ROWS = int(os.environ.get("RECLASSIFY_CHUNK_ROWS", "50000"))
+
+# Cache analítico em memória (colunas NumPy de transactions) para /periodos,
+# /saldos-mes e /investimentos; desligado = as rotas usam o SQL de src/queries.py
+ANALYTICS_CACHE = os.environ.get("ANALYTICS_CACHE", "0") not in ("0", "false", "no")
+
+# /investimentos/series: maior intervalo aceito (a matriz é aplicações × dias)
+SERIES_MAX_DAYS = int(os.environ.get("SERIES_MAX_DAYS", str(20 * 366)))
+
+# Exportações (/export/*): linhas lidas por fetchmany a cada pedaço da resposta
+EXPORT_FETCH_ROWS = int(os.environ.get("EXPORT_FETCH_ROWS", "5000"))
+
+# SQL Sandbox: tempo máximo por consulta, linhas por página e resultados em cache
+SANDBOX_TIMEOUT_MS = int(os.environ.get("SANDBOX_TIMEOUT_MS", "3000"))
+SANDBOX_PAGE_ROWS = int(os.environ.get("SANDBOX_PAGE_ROWS", "100"))
+SANDBOX_CACHE_ENTRIES = int(os.environ.get("SANDBOX_CACHE_ENTRIES", "64"))
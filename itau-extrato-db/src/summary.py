@@ -0,0 +1,111 @@
+from typing import Iterable
+
+from . import dataversion
+
+# ---------------------------
+# Resumos pré-calculados (daily_summary e monthly_rollup)
+# ---------------------------
+# /periodos lê daily_summary em vez de agregar transactions_base a cada
+# acesso; /investimentos e /analytics/pivot leem monthly_rollup. A ingestão
+# chama refresh_days/refresh_months com o que gravou e a reclassificação
+# chama refresh_months com os meses das linhas alteradas. Cada dia/mês é
+# recalculado inteiro a partir das tabelas-base, então refazer é sempre seguro.
+
+SQL_REFRESH_DAY = """
+    INSERT OR REPLACE INTO daily_summary (dia, debitos, creditos, n_tx, saldo)
+    SELECT
+      t.data,
+      SUM(CASE WHEN t.valor < 0 THEN -t.valor ELSE 0 END),
+      SUM(CASE WHEN t.valor > 0 THEN  t.valor ELSE 0 END),
+      COUNT(*),
+      (SELECT saldo FROM saldo_por_dia WHERE data = t.data)
+    FROM transactions_base t
+    WHERE t.data = ?
+    GROUP BY t.data
+"""
+
+SQL_REBUILD = """
+    INSERT INTO daily_summary (dia, debitos, creditos, n_tx, saldo)
+    SELECT
+      t.data,
+      SUM(CASE WHEN t.valor < 0 THEN -t.valor ELSE 0 END),
+      SUM(CASE WHEN t.valor > 0 THEN  t.valor ELSE 0 END),
+      COUNT(*),
+      s.saldo
+    FROM transactions_base t
+    LEFT JOIN saldo_por_dia s ON s.data = t.data
+    GROUP BY t.data
+"""
+
+# saldo_por_dia é mantida por triggers (migração 0008); isto é só recuperação
+SQL_REBUILD_SALDOS = """
+    INSERT INTO saldo_por_dia (data, saldo)
+    SELECT data, MAX(saldo)
+    FROM (
+      SELECT data, saldo_dia AS saldo FROM daily_balances
+      UNION ALL
+      SELECT data, saldo_dia FROM transactions_base WHERE saldo_dia IS NOT NULL
+    )
+    GROUP BY data
+"""
+
+
+SQL_ROLLUP_SELECT = """
+    SELECT
+      substr(data, 1, 7),
+      COALESCE(categoria, ''),
+      CASE WHEN categoria IN ('aplicacao_investimento', 'resgate_investimento')
+           THEN COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE')
+           ELSE '' END,
+      COALESCE(tipo_mov, ''),
+      SUM(valor),
+      COUNT(*)
+    FROM transactions_base
+    {where}
+    GROUP BY 1, 2, 3, 4
+"""
+
+SQL_ROLLUP_INSERT = "INSERT INTO monthly_rollup (mes, categoria, aplicacao, tipo_mov, total, n_tx)"
+
+SQL_REFRESH_MONTH = SQL_ROLLUP_INSERT + SQL_ROLLUP_SELECT.format(
+    where="WHERE data >= ?1 || '-01' AND data < date(?1 || '-01', '+1 month')"
+)
+
+
+def refresh_days(conn, days: Iterable[str]) -> int:
+    """Recalcula os dias informados (sem COMMIT). Retorna quantos."""
+    days = sorted(set(days))
+    if days:
+        conn.executemany(SQL_REFRESH_DAY, [(d,) for d in days])
+        # dia que ficou sem lançamentos não tem mais linha no resumo
+        conn.executemany(
+            "DELETE FROM daily_summary WHERE dia = ?1 "
+            "AND NOT EXISTS (SELECT 1 FROM transactions_base WHERE data = ?1)",
+            [(d,) for d in days],
+        )
+    return len(days)
+
+
+def refresh_months(conn, months: Iterable[str]) -> int:
+    """Recalcula monthly_rollup dos meses (YYYY-MM) informados (sem COMMIT)."""
+    months = sorted(set(months))
+    for mes in months:
+        conn.execute("DELETE FROM monthly_rollup WHERE mes = ?", (mes,))
+        conn.execute(SQL_REFRESH_MONTH, (mes,))
+    return len(months)
+
+
+def rebuild(conn) -> int:
+    """
+    Refaz saldo_por_dia, daily_summary e monthly_rollup do zero
+    (recuperação). Retorna o nº de dias.
+    """
+    conn.execute("DELETE FROM saldo_por_dia")
+    conn.execute(SQL_REBUILD_SALDOS)
+    conn.execute("DELETE FROM daily_summary")
+    conn.execute(SQL_REBUILD)
+    conn.execute("DELETE FROM monthly_rollup")
+    conn.execute(SQL_ROLLUP_INSERT + SQL_ROLLUP_SELECT.format(where=""))
+    dataversion.bump(conn)   # invalida os ETags
+    conn.commit()
+    return conn.execute("SELECT COUNT(*) FROM daily_summary").fetchone()[0]
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from .settings import DATA_RAW_DIR, UPLOAD_CHUNK_SIZE
+
+_UNSAFE_RE = re.compile(r"[^\w.\- ()]+")
+
+
+def _safe_stem(filename: str) -> str:
+    stem = Path(filename or "extrato.pdf").stem
+    return _UNSAFE_RE.sub("_", stem).strip() or "extrato"
+
+
+async def save_upload(upload: UploadFile, dest_dir: Path = DATA_RAW_DIR) -> Tuple[Path, str, int]:
+    """
+    Copia o upload para dest_dir em blocos de UPLOAD_CHUNK_SIZE (memória
+    constante), calculando o SHA-256 durante a cópia. Grava num arquivo
+    temporário da mesma pasta e renomeia atomicamente para
+    <nome>_<sha256[:12]>.pdf: uploads diferentes com o mesmo nome não se
+    sobrescrevem, e o mesmo conteúdo sempre cai no mesmo arquivo.
+    Retorna (caminho, sha256, bytes).
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+                size += len(chunk)
+                await run_in_threadpool(f.write, chunk)
+        sha256 = h.hexdigest()
+        out = dest_dir / f"{_safe_stem(upload.filename)}_{sha256[:12]}.pdf"
+        os.replace(tmp_name, out)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return out, sha256, size
@@ -1,9 +1,13 @@
 import hashlib
 import re
+from datetime import date
+from functools import lru_cache
 from unidecode import unidecode
 
 _SPACES_RE = re.compile(r"\s+")
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
 
+@lru_cache(maxsize=16384)
 def norm_text(s: str) -> str:
     """
     Normaliza descrições:
@@ -11,6 +15,7 @@ def norm_text(s: str) -> str:
     - upper
     - colapsa espaços
     - strip
+    Memoizada: o histórico repete as mesmas descrições milhares de vezes.
     """
     if s is None:
         return ""
@@ -39,3 +44,23 @@ def validate_row(r: dict) -> dict:
         r["valor"] = None
     return r
 
+
+def parse_iso_date(s: str) -> date:
+    """
+    'YYYY-MM-DD' de um dia que existe -> date; ValueError em qualquer outra
+    coisa (fromisoformat sozinho aceita também 20250601, 2025-W23-1...).
+    """
+    if not isinstance(s, str) or not _ISO_DATE_RE.fullmatch(s):
+        raise ValueError(f"data fora do formato YYYY-MM-DD: {s!r}")
+    return date.fromisoformat(s)
+
+def valid_iso_dates(*datas) -> bool:
+    """Todas vazias/None ou aceitas por parse_iso_date?"""
+    for d in datas:
+        if not d:
+            continue
+        try:
+            parse_iso_date(d)
+        except ValueError:
+            return False
+    return True
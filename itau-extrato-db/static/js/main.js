@@ -9,3 +9,27 @@ function toggleClass(id, cls){
   if(!el) return;
   el.classList.toggle(cls);
 }
+
+// Acompanha um job de ingestão (/jobs/{id}) até terminar
+function pollJob(id, elId, fileName){
+  const el = document.getElementById(elId);
+  if(!el || !id) return;
+  const labels = {queued: 'na fila', running: 'em processamento'};
+  fetch('/jobs/' + id)
+    .then(r => r.json())
+    .then(job => {
+      if(job.status === 'done' && job.report.ja_importado){
+        el.textContent = `Arquivo ${fileName} já havia sido ingerido (mesmo conteúdo) — nada a fazer.`;
+      } else if(job.status === 'done'){
+        const r = job.report;
+        el.textContent = `Arquivo ${fileName} ingerido com sucesso: ${r.linhas} linhas, ${r.inseridas} novas, ${r.duplicadas} duplicadas (${job.execucao_s}s).`;
+      } else if(job.status === 'failed'){
+        el.textContent = `Falha ao ingerir ${fileName}: ${job.erro}`;
+        el.style.borderColor = 'var(--danger)'; el.style.color = 'var(--danger)';
+      } else {
+        el.textContent = `Arquivo ${fileName} enviado — ${labels[job.status] || job.status}…`;
+        setTimeout(() => pollJob(id, elId, fileName), 1000);
+      }
+    })
+    .catch(() => setTimeout(() => pollJob(id, elId, fileName), 2000));
+}
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# testes importam src/ e webapp.py a partir da raiz do projeto
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# banco descartável: nenhum teste toca o bank.db do projeto (precisa vir
+# antes de qualquer import de src.settings)
+os.environ["DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="itau-tests-")) / "bank.db")
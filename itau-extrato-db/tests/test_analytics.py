@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import webapp
+from src import ingest
+from src.db import get_conn, init_db
+from src.utils import valid_iso_dates
+
+# /investimentos com ANALYTICS_CACHE=1 e =0: mesma página para qualquer
+# start/end, inclusive os malformados (o cache só responde a datas válidas)
+
+
+@pytest.fixture(scope="module")
+def client():
+    init_db()
+    rows = []
+    for i, dia in enumerate(["2025-05-30", "2025-06-01", "2025-06-15", "2025-07-01", "2025-07-02"]):
+        rows.append({"data_iso": dia, "descricao": f"APLICACAO CDB TESTE{i % 2}", "valor": f"-{100 + i},50",
+                     "saldo_dia": None, "pagina": 1, "linha": 1})
+        rows.append({"data_iso": dia, "descricao": f"RESGATE CDB TESTE{i % 2}", "valor": f"{10 + i},00",
+                     "saldo_dia": None, "pagina": 1, "linha": 2})
+    with get_conn() as conn:
+        ingest._write_rows(conn, rows, ingest.IngestReport(arquivo="analytics.pdf"))
+    with TestClient(webapp.app) as c:
+        yield c
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"start": "2025-06-01", "end": "2025-07-01"},
+    {"start": "2025-06-01"},
+    {"end": "2025-06-15", "app_filter": "CDB TESTE1"},
+    {"start": "abc"},
+    {"start": "2025-6-1"},
+    {"end": "01/07/2025"},
+    {"start": "2025-06-01", "end": "2025-7-1"},
+    {"start": "2025-02-30"},
+    {"start": "2025"},
+])
+def test_cache_e_sql_dao_a_mesma_pagina(client, monkeypatch, params):
+    monkeypatch.setattr(webapp, "ANALYTICS_CACHE", False)
+    sql = client.get("/investimentos", params=params)
+    monkeypatch.setattr(webapp, "ANALYTICS_CACHE", True)
+    cache = client.get("/investimentos", params=params)
+
+    assert sql.status_code == cache.status_code == 200
+    assert cache.text == sql.text
+
+
+def test_valid_iso_dates():
+    assert valid_iso_dates(None, "", "2025-06-01")
+    for iso in ("abc", "2025-6-1", "01/07/2025", "2025-02-30", "20250601", "2025", "2025-06-01\n"):
+        assert not valid_iso_dates(iso)
+
+
+def test_pagina_tem_os_totais(client, monkeypatch):
+    monkeypatch.setattr(webapp, "ANALYTICS_CACHE", True)
+    texto = client.get("/investimentos", params={"start": "2025-06-01"}).text
+    assert "CDB TESTE0" in texto and "CDB TESTE1" in texto
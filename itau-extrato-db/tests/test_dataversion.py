@@ -0,0 +1,89 @@
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.db as db
+import webapp
+from src import dataversion, ingest, rules
+from src.db import init_db, migrate
+from src.reclassify import reclassify
+
+RAIZ = Path(__file__).resolve().parents[1]
+_ETAG_EM_OUTRO_PROCESSO = "from src import dataversion; print(dataversion.etag('/periodos', [('start', '2025-06-01')]))"
+
+
+def test_etag_igual_em_outro_processo():
+    # outro worker / o mesmo servidor depois de um restart: mesma ETag
+    init_db()
+    aqui = dataversion.etag("/periodos", [("start", "2025-06-01")])
+    out = subprocess.run([sys.executable, "-c", _ETAG_EM_OUTRO_PROCESSO], cwd=RAIZ,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == aqui
+
+
+def test_304_sobrevive_a_recarga_e_muda_com_os_dados():
+    init_db()
+    with TestClient(webapp.app) as c:
+        tag = c.get("/periodos").headers["etag"]
+        dataversion.invalidate()   # como um processo novo: relê app_meta
+        assert c.get("/periodos", headers={"If-None-Match": tag}).status_code == 304
+
+        r = c.post("/investimentos/add-saldo", data={"aplicacao": "CDB ETAG", "data": "2025-08-01", "saldo": "1"},
+                   follow_redirects=False)
+        assert r.status_code == 303
+        assert c.get("/periodos", headers={"If-None-Match": tag}).status_code == 200
+
+
+def _versao(conn) -> int:
+    return conn.execute("SELECT valor FROM app_meta WHERE chave = 'data_version'").fetchone()[0]
+
+
+def test_versao_sobe_uma_vez_por_commit(tmp_path):
+    # sem trigger por linha: a ingestão inteira (3 COMMITs) sobe 3, não 1 por linha
+    conn = sqlite3.connect(tmp_path / "dv.db")
+    migrate(conn)
+    conn.commit()
+    v0 = _versao(conn)
+    rows = [
+        {"data_iso": f"2025-06-{d:02d}", "descricao": f"PIX TESTE {d} {k}", "valor": f"-{k + 1},00",
+         "saldo_dia": None, "pagina": 1, "linha": k}
+        for d in range(1, 31) for k in range(10)
+    ]
+    committer = ingest._ChunkedCommit(conn, 100)
+    ingest._write_rows(conn, rows, ingest.IngestReport(arquivo="dv.pdf"), batch_size=50, committer=committer)
+    committer.commit()
+    assert _versao(conn) == v0 + 3
+
+    # nada pendente: COMMIT sem nova versão (ETags continuam valendo)
+    committer.commit()
+    assert _versao(conn) == v0 + 3
+
+    reclassify(conn, chunk_rows=100)   # nada muda de categoria: nenhum COMMIT
+    assert _versao(conn) == v0 + 3
+    conn.execute("INSERT INTO classification_rules (padrao, modo, prioridade, categoria) VALUES ('PIX', 'contem', 1, 'pix')")
+    conn.commit()
+    reclassify(conn, chunk_rows=100)   # 3 blocos alterados
+    assert _versao(conn) == v0 + 6
+    conn.close()
+    rules.invalidate()   # matcher compilado deste banco de teste
+
+
+@pytest.mark.parametrize("url", ["/periodos", "/saldos-mes", "/investimentos?start=2025-06-01", "/sql-tabelas"])
+def test_304_nao_ocupa_o_pool(monkeypatch, url):
+    init_db()
+    pool = db.ConnectionPool(read_only=True, max_size=1)
+    monkeypatch.setattr(db, "read_pool", pool)
+    with TestClient(webapp.app) as c:
+        tag = c.get(url).headers["etag"]
+        antes = pool.stats()
+        r = c.get(url, headers={"If-None-Match": tag})
+        assert r.status_code == 304
+        assert r.headers["etag"] == tag
+        assert r.content == b""
+        # nenhuma conexão pedida ao pool para responder o 304
+        assert pool.stats()["hits"] + pool.stats()["opens"] == antes["hits"] + antes["opens"]
+    pool.close_all()
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import src.db as db
+import webapp
+
+# As dependências db_read/db_write são geradores síncronos: o FastAPI roda a
+# entrada, a rota e a saída em threads diferentes do threadpool. O pool tem
+# que devolver a conexão certa e respeitar max_size mesmo assim.
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    db.init_db()
+    read = db.ConnectionPool(read_only=True, max_size=4)
+    write = db.ConnectionPool(max_size=2)
+    monkeypatch.setattr(db, "read_pool", read)
+    monkeypatch.setattr(db, "write_pool", write)
+
+    # nenhuma conexão entregue a dois requests ao mesmo tempo
+    emprestadas = set()
+    compartilhadas = []
+    for pool in (read, write):
+        acquire, release = pool.acquire, pool.release
+
+        def _acquire(acquire=acquire):
+            conn = acquire()
+            if conn in emprestadas:
+                compartilhadas.append(conn)
+            emprestadas.add(conn)
+            return conn
+
+        def _release(conn, error=False, release=release):
+            emprestadas.discard(conn)
+            release(conn, error)
+
+        monkeypatch.setattr(pool, "acquire", _acquire)
+        monkeypatch.setattr(pool, "release", _release)
+
+    yield read, write, compartilhadas
+    read.close_all()
+    write.close_all()
+
+
+async def _requisicoes(n_leituras: int, n_escritas: int):
+    transport = httpx.ASGITransport(app=webapp.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+        leituras = [client.get("/periodos/detalhe", params={"dia": "2025-08-01"}) for _ in range(n_leituras)]
+        escritas = [
+            client.post(
+                "/investimentos/add-saldo",
+                data={"aplicacao": f"CDB TESTE {i}", "data": "2025-08-01", "saldo": str(i)},
+            )
+            for i in range(n_escritas)
+        ]
+        return await asyncio.gather(*leituras, *escritas)
+
+
+def _rodar(n_leituras: int, n_escritas: int, timeout: float = 30):
+    # numa thread à parte (daemon, como as threads do anyio criadas por ela):
+    # com o pool travado os requests nunca voltam, e o teste falha em vez
+    # de pendurar
+    out = {}
+    t = threading.Thread(
+        target=lambda: out.setdefault("resps", asyncio.run(_requisicoes(n_leituras, n_escritas))),
+        daemon=True,
+    )
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), "requests travados esperando conexão do pool"
+    return out["resps"]
+
+
+def test_requisicoes_concorrentes_pelo_app(pools):
+    read, write, compartilhadas = pools
+    resps = _rodar(120, 30)
+
+    assert [r.status_code for r in resps[:120]] == [200] * 120
+    assert [r.status_code for r in resps[120:]] == [303] * 30
+    assert compartilhadas == []
+    for pool in (read, write):
+        st = pool.stats()
+        assert st["em_uso"] == 0
+        assert st["abertas"] <= pool.max_size
+        assert st["opens"] <= pool.max_size
+
+    with db.get_conn() as conn:
+        n = conn.execute("SELECT COUNT(*) FROM investment_balances WHERE aplicacao LIKE 'CDB TESTE %'").fetchone()[0]
+    assert n == 30
+
+
+def test_release_de_outra_thread():
+    pool = db.ConnectionPool(read_only=True, max_size=1)
+    conn = pool.acquire()
+    t = threading.Thread(target=pool.release, args=(conn,))
+    t.start()
+    t.join()
+    # o slot voltou: a próxima aquisição não espera e reaproveita a conexão
+    assert pool.acquire() is conn
+    assert pool.stats()["waits"] == 0
+    pool.close_all()
+
+
+def test_cli_nao_carrega_a_pilha_web():
+    # o pool fica em src/db.py; as dependências FastAPI/anyio, em src/deps.py
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    codigo = "import sys, main; print(sorted(m for m in ('fastapi', 'anyio', 'starlette') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", codigo], cwd=Path(__file__).resolve().parents[1],
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
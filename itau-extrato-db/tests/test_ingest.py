@@ -0,0 +1,64 @@
+import sqlite3
+from datetime import date, timedelta
+
+from src import ingest
+from src.db import migrate
+from src.summary import SQL_ROLLUP_SELECT
+
+
+def _linhas(n_dias: int, por_dia: int):
+    """Linhas no formato do parser: n_dias a partir de 2025-01-20 (atravessa meses)."""
+    rows = []
+    for d in range(n_dias):
+        dia = (date(2025, 1, 20) + timedelta(days=d)).isoformat()
+        for k in range(por_dia):
+            valor = f"-{k + 1},{d % 100:02d}" if k % 2 else f"{k + 1},50"
+            rows.append({"data_iso": dia, "descricao": f"PIX TRANSF TESTE {d} {k}", "valor": valor,
+                         "saldo_dia": None, "pagina": 1, "linha": k + 1})
+        rows.append({"data_iso": dia, "descricao": "SALDO DO DIA", "valor": None,
+                     "saldo_dia": f"{d},00", "pagina": 1, "linha": por_dia + 1})
+    return rows
+
+
+def _divergencias(path) -> list:
+    """Resumos x transactions_base no que já foi COMMITado (conexão separada)."""
+    c = sqlite3.connect(path)
+    try:
+        resumo = set(c.execute("SELECT dia, round(debitos, 2), round(creditos, 2), n_tx FROM daily_summary"))
+        esperado = set(c.execute(
+            "SELECT data, round(SUM(CASE WHEN valor < 0 THEN -valor ELSE 0 END), 2), "
+            "round(SUM(CASE WHEN valor > 0 THEN valor ELSE 0 END), 2), COUNT(*) "
+            "FROM transactions_base GROUP BY data"
+        ))
+        rollup = set(c.execute("SELECT mes, categoria, aplicacao, tipo_mov, round(total, 2), n_tx FROM monthly_rollup"))
+        rollup_esperado = {
+            (*r[:4], round(r[4], 2), r[5]) for r in c.execute(SQL_ROLLUP_SELECT.format(where=""))
+        }
+        return sorted(resumo ^ esperado) + sorted(rollup ^ rollup_esperado)
+    finally:
+        c.close()
+
+
+def test_commits_intermediarios_publicam_resumos_em_dia(tmp_path):
+    path = tmp_path / "ingest.db"
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.commit()
+
+    conferencias = []
+
+    class _Conferido(ingest._ChunkedCommit):
+        def add(self, n, before_commit=None):
+            super().add(n, before_commit)
+            if self.pending == 0:   # acabou de fazer COMMIT
+                conferencias.append(_divergencias(path))
+
+    report = ingest.IngestReport(arquivo="teste.pdf")
+    ingest._write_rows(conn, _linhas(40, 5), report, batch_size=25, committer=_Conferido(conn, 50))
+    conn.commit()
+
+    assert len(conferencias) > 3
+    assert conferencias == [[]] * len(conferencias)
+    assert _divergencias(path) == []
+    assert report.inseridas == 40 * 6
+    conn.close()
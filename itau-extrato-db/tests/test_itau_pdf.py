@@ -0,0 +1,104 @@
+import pytest
+from pypdf import PdfReader
+
+from src.ledger import Coverage, filter_rows
+from src.parsers.itau_pdf import page_date_range, parse_itau_pdf, parse_page, probe_page_text
+from src.settings import DATA_RAW_DIR
+
+# Sondagem barata (probe_page_text) x extract_text, e o mesmo intervalo de
+# datas por página no parser e nas linhas do cache (ledger.filter_rows).
+
+PDFS = sorted(DATA_RAW_DIR.glob("*.pdf"))
+pytestmark = pytest.mark.skipif(not PDFS, reason="sem PDFs em data/raw")
+
+
+def _sem_linha(rows):
+    return [{k: v for k, v in r.items() if k != "linha"} for r in rows]
+
+
+@pytest.mark.parametrize("pdf", PDFS, ids=lambda p: p.name)
+def test_sondagem_gera_as_mesmas_linhas(pdf):
+    fontes = {}
+    sondadas = 0
+    for p_idx, page in enumerate(PdfReader(str(pdf)).pages, start=1):
+        text = probe_page_text(page, fontes)
+        if text is None:
+            continue  # fora do formato: vai pela extração completa
+        sondadas += 1
+        assert _sem_linha(parse_page(p_idx, text)) == _sem_linha(parse_page(p_idx, page.extract_text() or ""))
+    assert sondadas > 0
+
+
+@pytest.mark.parametrize("pdf", PDFS, ids=lambda p: p.name)
+def test_pular_no_parser_igual_a_pular_no_cache(pdf):
+    todas = list(parse_itau_pdf(str(pdf)))
+    # cobre tudo menos as pontas do próprio arquivo: pula as páginas do meio
+    ini, fim = page_date_range(todas)
+    cov_parser = Coverage([(ini, fim)])
+    cov_cache = Coverage([(ini, fim)])
+
+    puladas = list(parse_itau_pdf(str(pdf), skip_page=cov_parser))
+    filtradas = list(filter_rows(todas, cov_cache))
+
+    assert cov_parser.puladas == cov_cache.puladas > 0
+    assert (cov_parser.data_ini, cov_parser.data_fim) == (cov_cache.data_ini, cov_cache.data_fim)
+    assert _sem_linha(puladas) == _sem_linha(filtradas)
+
+
+class _PaginaFalsa:
+    """Só o content stream: o suficiente para a sondagem."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def get_contents(self):
+        return self
+
+    def get_data(self):
+        return self.data
+
+
+@pytest.mark.parametrize("data", [
+    b"BT 1 0 0 1 10 700 Tm [(01/06/2025 PIX)] TJ ET",          # TJ
+    b"BT 1 0 0 1 10 700 Tm (01/06/2025) Tj 0 -12 Td (PIX) Tj ET",  # Td
+    b"q /Fm1 Do Q BT ET",                                      # form XObject
+    b"1 0 0 1 0 0 cm BT ET",                                   # cm fora de imagem
+])
+def test_sondagem_desiste_fora_do_formato(data):
+    assert probe_page_text(_PaginaFalsa(data)) is None
+
+
+@pytest.mark.parametrize("falha", ["sem_build_char_map", "excecao", "none"])
+def test_sondagem_falha_cai_na_extracao_completa(monkeypatch, falha):
+    from src.parsers import itau_pdf
+
+    pdf_falha = PDFS[0]
+
+    cov_ref = Coverage([("2000-01-01", "2100-01-01")])
+    esperado = list(parse_itau_pdf(str(pdf_falha), skip_page=cov_ref, probe=False))
+
+    if falha == "sem_build_char_map":
+        monkeypatch.setattr(itau_pdf, "build_char_map", None)
+    else:
+        def sonda(page, fontes=None):
+            if falha == "excecao":
+                raise RuntimeError("operador desconhecido")
+            return None
+        monkeypatch.setattr(itau_pdf, "probe_page_text", sonda)
+
+    extraidas = []
+    original = itau_pdf.extract_pages
+
+    def extract_pages(path, workers=None, skip=()):
+        for p_idx, text in original(path, workers, skip):
+            extraidas.append(p_idx)
+            yield p_idx, text
+
+    monkeypatch.setattr(itau_pdf, "extract_pages", extract_pages)
+    cov = Coverage([("2000-01-01", "2100-01-01")])
+    obtido = list(parse_itau_pdf(str(pdf_falha), skip_page=cov))
+
+    # nenhuma página decidida às cegas: todas extraídas e conferidas depois
+    assert extraidas == list(range(1, len(PdfReader(str(pdf_falha)).pages) + 1))
+    assert obtido == esperado
+    assert cov.puladas == cov_ref.puladas > 0
@@ -0,0 +1,35 @@
+import sqlite3
+import threading
+
+from src.db import list_migrations, migrate, schema_version
+
+
+def test_migracoes_concorrentes_aplicam_cada_versao_uma_vez(tmp_path):
+    # webapp (lifespan) e main.py initdb migrando o mesmo arquivo ao mesmo tempo
+    path = tmp_path / "concorrente.db"
+    sqlite3.connect(path).close()
+    n = 4
+    largada = threading.Barrier(n)
+    aplicadas, erros = [], []
+
+    def migrar():
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            largada.wait()
+            aplicadas.extend(migrate(conn))
+        except Exception as e:
+            erros.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=migrar) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+
+    assert erros == []
+    assert sorted(aplicadas) == [v for v, _ in list_migrations()]
+    conn = sqlite3.connect(path)
+    assert schema_version(conn) == list_migrations()[-1][0]
+    conn.close()
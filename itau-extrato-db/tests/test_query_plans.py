@@ -0,0 +1,64 @@
+import re
+import sqlite3
+
+import pytest
+
+from src.db import migrate
+from src.queries import REPORT_QUERIES, check_plans
+
+# Mesma conferência do `python main.py explain`, num banco novo migrado:
+# nenhuma consulta de relatório pode varrer transactions_base sem índice.
+
+_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+(transactions(?:_base)?)\b(?:\s+(?:AS\s+)?(?!WHERE|JOIN|ON|LEFT|INNER|ORDER|GROUP)(\w+))?", re.I)
+
+
+def _nomes_transactions(conn, sql: str) -> set:
+    """Nomes/aliases pelos quais a consulta (ou a view transactions) lê transactions_base."""
+    views = [v for (v,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view'")]
+    nomes = {"transactions_base", "transactions"}
+    for texto in [sql, *views]:
+        nomes.update(alias for _, alias in _ALIAS_RE.findall(texto) if alias)
+    return nomes
+
+
+def _scans_de_transactions(conn, sql: str, plan) -> list:
+    nomes = _nomes_transactions(conn, sql)
+    return [d for d in plan if (m := re.match(r"^SCAN (\S+)$", d)) and m.group(1) in nomes]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    c = sqlite3.connect(tmp_path / "plans.db")
+    migrate(c)
+    yield c
+    c.close()
+
+
+def test_consultas_de_relatorio_sem_varredura_completa(conn):
+    results = check_plans(conn)
+    assert len(results) == len(REPORT_QUERIES)
+
+    falhas = {name: scans for name, _, scans in results if scans}
+    assert falhas == {}
+
+    # nem o allow de uma consulta libera varrer transactions_base
+    sqls = {name: sql for name, sql, _, _ in REPORT_QUERIES}
+    em_transactions = {
+        name: s for name, plan, _ in results if (s := _scans_de_transactions(conn, sqls[name], plan))
+    }
+    assert em_transactions == {}
+
+
+def test_conferencia_pega_indice_faltando(conn):
+    # sem os índices de transactions_base, as consultas por período viram SCAN
+    indices = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions_base' AND sql IS NOT NULL"
+    ).fetchall()
+    for (nome,) in indices:
+        conn.execute(f"DROP INDEX {nome}")
+    results = check_plans(conn)
+    assert "periodos/detalhe" in [name for name, _, scans in results if scans]
+    # a exportação completa tem allow {"t"}, mas a varredura sem índice é pega
+    sql, plan = next((s, p) for (n, s, _, _), (_, p, _) in zip(REPORT_QUERIES, results)
+                     if n == "export/transactions: tudo")
+    assert _scans_de_transactions(conn, sql, plan) == ["SCAN t"]
@@ -0,0 +1,58 @@
+import logging
+
+import pytest
+
+from src import rules
+from src.db import get_conn, init_db
+from src.rules import RuleMatcher, load_rules
+
+
+def _regra(rid, padrao, prioridade, categoria, detalhe="grupo", modo="regex"):
+    return (rid, padrao, modo, prioridade, categoria, detalhe)
+
+
+def test_regex_que_nao_combinam_continuam_valendo():
+    m = RuleMatcher([
+        # mesmo grupo nomeado em duas regras
+        _regra(1, r"PIX TRANSF (?P<detalhe>\w+)", 10, "pix"),
+        _regra(2, r"TED (?P<detalhe>\w+)", 20, "ted"),
+        # flag inline (só vale no início do padrão) e referência numerada
+        _regra(3, r"(?i)boleto", 30, "boleto", "nenhum"),
+        _regra(4, r"(\d{2})/\1", 40, "data_repetida", "nenhum"),
+        _regra(5, r"RSCSS", 50, "rscss", "apos"),
+        _regra(6, "APLICACAO", 60, "aplicacao", "apos", modo="contem"),
+    ])
+    assert m._regex_any is not None            # RSCSS ainda usa o pré-filtro
+    assert m.match("PIX TRANSF JOAO 04/09") == ("pix", "JOAO")
+    assert m.match("TED MARIA") == ("ted", "MARIA")
+    assert m.match("PAGTO BOLETO LUZ") == ("boleto", None)
+    assert m.match("COMPRA 12/12") == ("data_repetida", None)
+    assert m.match("RSCSS BANCA SAO LU") == ("rscss", "BANCA SAO LU")
+    assert m.match("APLICACAO CDB DI") == ("aplicacao", "CDB DI")
+    assert m.match("OUTRA COISA") == (None, None)
+
+
+def test_regex_invalida_e_ignorada_com_log(caplog):
+    with caplog.at_level(logging.ERROR, logger="src.rules"):
+        m = RuleMatcher([
+            _regra(1, r"RESGATE (", 10, "quebrada"),
+            _regra(2, r"RESGATE (?P<detalhe>.+)", 20, "resgate"),
+        ])
+    assert "regra #1 ignorada" in caplog.text
+    assert m.match("RESGATE CDB") == ("resgate", "CDB")
+
+
+def test_load_rules_com_linha_invalida_no_banco(monkeypatch):
+    init_db()
+    monkeypatch.setattr(rules, "_matcher_version", None)
+    monkeypatch.setattr(rules, "_matcher", rules._matcher)
+    with get_conn() as conn:
+        conn.execute(
+            "INSERT INTO classification_rules (padrao, modo, prioridade, categoria, detalhe) "
+            "VALUES ('[ruim', 'regex', 1, 'quebrada', 'nenhum')"
+        )
+        try:
+            m = load_rules(conn)
+            assert m.match("RESGATE CDB") == ("resgate_investimento", "CDB")
+        finally:
+            conn.execute("DELETE FROM classification_rules WHERE categoria = 'quebrada'")
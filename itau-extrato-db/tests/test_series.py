@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import webapp
+from src.db import init_db
+from src.series import default_range
+
+
+@pytest.fixture(scope="module")
+def client():
+    init_db()
+    with TestClient(webapp.app) as c:
+        yield c
+
+
+@pytest.mark.parametrize("params", [
+    {"start": "abc"},
+    {"start": "2025-6-1"},
+    {"end": "01/07/2025"},
+    {"start": "20250601"},          # fromisoformat aceitaria
+    {"start": "2025-02-30"},
+    {"start": "1900-01-01", "end": "2025-01-01"},
+    {"start": "0001-01-01", "end": "9999-12-31"},
+])
+def test_series_recusa_datas_invalidas_e_intervalo_longo(client, params):
+    r = client.get("/investimentos/series", params=params)
+    assert r.status_code == 400
+    assert r.json()["detail"]
+
+
+def test_series_aceita_ate_o_limite(client):
+    r = client.get("/investimentos/series", params={"start": "2010-01-01", "end": "2025-12-31"})
+    assert r.status_code == 200
+
+
+def test_default_range_limite():
+    assert default_range("2025-01-10", "2025-01-01", max_dias=10) == ("2025-01-01", "2025-01-10")
+    with pytest.raises(ValueError):
+        default_range("2025-01-01", "2025-01-11", max_dias=10)
+
+
+@pytest.mark.parametrize("start", ["2025-6-1", "2025-02-30", "20250601"])
+def test_export_usa_a_mesma_validacao(client, start):
+    # utils.parse_iso_date: mesma regra de /investimentos/series e do cache analítico
+    assert client.get("/export/saldos", params={"start": start}).status_code == 400
+    assert client.get("/export/saldos", params={"start": "2025-06-01"}).status_code == 200
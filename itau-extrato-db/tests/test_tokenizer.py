@@ -0,0 +1,92 @@
+import re
+from typing import Optional, Tuple
+
+import pytest
+from dateutil.parser import parse as parse_date
+
+from src.parsers.tokenizer import DATE_RE, PAT_MONEY, tokenize_line
+from src.settings import DATA_RAW_DIR
+
+# ---------------------------
+# tokenize_line contra a implementação anterior (dateutil + 3 regex)
+# ---------------------------
+
+# Linhas-limite que não aparecem nos PDFs de exemplo
+CORPUS = (
+    "08/09/2025 RSCSS BAR GARNIZE 0609 -61,20",
+    "08/09/2025 SALDO DO DIA 91,24",
+    "08/09/2025 saldo do dia -1.234,56",
+    "08/09/2025 SALDO DO DIA",
+    "01/09/2025 RESGATE CDB Cofrinhos 150,01 2.314,88",
+    "01/09/2025 PIX TRANSF   JOAO   30/08   -20,00   -2.314,88",
+    "01/09/2025 APLICACAO CDB DI -1.000,00",
+    "01/09/2025 COMPRA 1234,56",
+    "01/09/2025 COMPRA 12.345,678",
+    "01/09/2025 COMPRA 5-1,00",
+    "01/09/2025 COMPRA --1,00",
+    "01/09/2025 COMPRA\t\tTAB 1,00",
+    "05/13/2025 DATA FORA DO PADRAO 1,00",
+    "29/02/2024 BISSEXTO 0,01",
+    "01/09/2025 SEM VALOR",
+    "01/09/2025",
+    "TOTAL 1,00",
+)
+
+
+def _legacy_tokenize(line: str) -> Optional[Tuple]:
+    """Reprodução fiel do caminho antigo."""
+    m_date = DATE_RE.match(line)
+    if not m_date:
+        return None
+    rest = line[m_date.end():].strip()
+    data_iso = parse_date(m_date.group(1), dayfirst=True).date().isoformat()
+    matches = PAT_MONEY.findall(rest)
+    last = matches[-1] if matches else None
+    if "SALDO DO DIA" in rest.upper():
+        return data_iso, "SALDO DO DIA", last
+    desc = re.sub(r"\s+", " ", PAT_MONEY.sub("", rest).strip())
+    return data_iso, desc, last
+
+
+def _new_tokenize(line: str) -> Optional[Tuple]:
+    tk = tokenize_line(line)
+    return None if tk is None else (tk.data_iso, tk.descricao, tk.valores[-1] if tk.valores else None)
+
+
+def _outcome(fn, line):
+    try:
+        return fn(line)
+    except Exception as e:
+        return f"erro: {type(e).__name__}"
+
+
+def _pdf_lines():
+    pdfs = sorted(DATA_RAW_DIR.glob("*.pdf"))
+    if not pdfs:
+        return []
+    from src.parsers.itau_pdf import extract_pages
+    return [
+        line.strip()
+        for pdf in pdfs
+        for _, text in extract_pages(str(pdf), workers=1)
+        for line in text.splitlines()
+        if line.strip()
+    ]
+
+
+@pytest.mark.parametrize("line", CORPUS)
+def test_corpus_igual_ao_antigo(line):
+    line = line.strip()
+    assert _outcome(_new_tokenize, line) == _outcome(_legacy_tokenize, line)
+
+
+def test_pdfs_de_exemplo_iguais_ao_antigo():
+    lines = _pdf_lines()
+    if not lines:
+        pytest.skip("sem PDFs em data/raw")
+    diffs = [
+        (line, old, new)
+        for line in lines
+        if (old := _outcome(_legacy_tokenize, line)) != (new := _outcome(_new_tokenize, line))
+    ]
+    assert diffs == []
@@ -0,0 +1,22 @@
+import json
+import re
+
+from fastapi.testclient import TestClient
+
+import webapp
+from src import jobs
+
+
+def test_nome_do_arquivo_vai_para_o_script_como_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(webapp, "DATA_RAW_DIR", tmp_path)
+    monkeypatch.setattr(webapp, "submit_ingest", lambda path, sha256=None: jobs.Job(id="j1", arquivo=path))
+    nome = "extrato d'o \\banco </script>.pdf"
+
+    with TestClient(webapp.app) as c:
+        r = c.post("/input", files={"pdf": (nome, b"%PDF-teste", "application/pdf")})
+
+    assert r.status_code == 200
+    m = re.search(r"pollJob\((.*), 'job-status', (.*)\)\);</script>", r.text)
+    assert m is not None
+    assert json.loads(m.group(1)) == "j1"
+    assert json.loads(m.group(2)) == nome
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import webapp
+from src import jobs
+from src.db import get_conn, init_db, upsert_investment_balance
+from src.ingest import WRITER_LOCK
+from src.rules import classify, load_rules
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # a limpeza apaga data/raw e data/processed: aqui, pastas temporárias
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    raw.mkdir()
+    processed.mkdir()
+    (raw / "extrato.pdf").write_bytes(b"%PDF-teste")
+    monkeypatch.setattr(webapp, "DATA_RAW_DIR", raw)
+    monkeypatch.setattr(webapp, "DATA_PROCESSED_DIR", processed)
+
+    init_db()
+    with get_conn() as conn:
+        upsert_investment_balance(conn, "CDB WIPE", "2025-08-01", 10.0)
+    with TestClient(webapp.app, follow_redirects=False) as c:
+        c.raw = raw
+        yield c
+
+
+def _saldos_wipe() -> int:
+    with get_conn() as conn:
+        return conn.execute("SELECT COUNT(*) FROM investment_balances WHERE aplicacao = 'CDB WIPE'").fetchone()[0]
+
+
+def test_wipe_recusa_com_ingestao_pendente(client, monkeypatch):
+    job = jobs.Job(id="pendente", arquivo="x.pdf", status=jobs.RUNNING)
+    monkeypatch.setitem(jobs._jobs, job.id, job)
+
+    r = client.post("/admin/wipe")
+
+    assert r.status_code == 409
+    assert _saldos_wipe() == 1
+    assert (client.raw / "extrato.pdf").exists()
+
+
+def test_fila_fechada_durante_a_limpeza():
+    with jobs.exclusive():
+        with pytest.raises(jobs.QueueBusy):
+            jobs.submit_ingest("x.pdf")
+        with pytest.raises(jobs.QueueBusy):
+            with jobs.exclusive():
+                pass
+    # reaberta ao sair
+    with jobs.exclusive():
+        pass
+
+
+def test_wipe_espera_o_writer_lock(client):
+    resultado = {}
+    with WRITER_LOCK:
+        t = threading.Thread(target=lambda: resultado.setdefault("r", client.post("/admin/wipe")))
+        t.start()
+        time.sleep(0.3)
+        # gravação em lote em andamento: a limpeza não começou
+        assert "r" not in resultado
+        assert _saldos_wipe() == 1
+    t.join(10)
+
+    assert resultado["r"].status_code == 303
+    assert _saldos_wipe() == 0
+    assert not (client.raw / "extrato.pdf").exists()
+
+
+def _nova_regra(padrao: str, categoria: str):
+    with get_conn() as conn:
+        conn.execute(
+            "INSERT INTO classification_rules (padrao, modo, prioridade, categoria) VALUES (?, 'contem', 1, ?)",
+            (padrao, categoria),
+        )
+        load_rules(conn)
+
+
+def test_wipe_descarta_as_regras_compiladas(client):
+    _nova_regra("PIX ANTIGO", "regra_apagada")
+    assert classify("PIX ANTIGO LOJA", -1.0)[0] == "regra_apagada"
+
+    assert client.post("/admin/wipe").status_code == 303
+
+    # banco novo: outra regra deixa rules_version igual ao do banco apagado
+    _nova_regra("PIX NOVO", "regra_nova")
+    assert classify("PIX ANTIGO LOJA", -1.0)[0] is None
+    assert classify("PIX NOVO LOJA", -1.0)[0] == "regra_nova"
@@ -1,22 +1,46 @@
-from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
+from fastapi import FastAPI, Request, UploadFile, File, Form, Depends, HTTPException, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 import sqlite3
 import re
+import uuid
 from datetime import date
+from urllib.parse import urlencode
 import os  # <-- ADICIONE
 
 from src.settings import PROJECT_ROOT, DB_PATH, DATA_RAW_DIR, DATA_PROCESSED_DIR  # já existem
 
-from src.settings import PROJECT_ROOT, DB_PATH, DATA_RAW_DIR
-from src.db import get_conn, init_db
-from src.ingest import ingest_itau_pdf
+from src.settings import PROJECT_ROOT, DB_PATH, DATA_RAW_DIR, ANALYTICS_CACHE, SANDBOX_TIMEOUT_MS, SANDBOX_PAGE_ROWS
+from src.db import init_db, close_pools, read_pool, write_pool, db_files
+from src.deps import db_read, db_write
+from src.jobs import submit_ingest, get_job
+from src.uploads import save_upload
+from src.ingest import WRITER_LOCK
+from src.reclassify import reclassify
+from src.queries import (
+    SQL_PERIOD_DAILY, SQL_DETAIL_BY_DAY, SQL_MONTHLY, SQL_SALDO_DO_DIA, saldo_do_dia_query,
+    SALDO_DIA_LIMITE, SALDO_DIA_LIMITE_MAX, parse_cursor, format_cursor,
+    investimentos_totais_query, SQL_APLICACOES, transactions_export_query, saldos_export_query,
+    PIVOT_DIMENSOES, PIVOT_MEDIDAS, pivot_query,
+)
 from src.db import upsert_investment_balance  # já existe no seu projeto
+from src import asof, analytics, sandbox, dataversion, jobs, rules
+from src.series import investment_series, default_range
+from src.export import EXPORT_FORMATS, stream_export
+from src.utils import valid_iso_dates
 
 from markupsafe import Markup, escape  # topo do arquivo, junto dos imports
-app = FastAPI(title="Extrato Itaú • UI", version="1.0")
+from contextlib import asynccontextmanager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migrações rodam uma vez na subida do processo; as rotas não tocam em DDL.
+    init_db()
+    yield
+
+app = FastAPI(title="Extrato Itaú • UI", version="1.0", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=PROJECT_ROOT / "static"), name="static")
 templates = Jinja2Templates(directory=str(PROJECT_ROOT / "templates"))
 
@@ -85,6 +109,24 @@ def safe_select(sql: str) -> tuple[bool, str]:
         return False, "Comando não permitido no Sandbox."
     return True, s
 
+# ---------- ETag / 304 (src/dataversion.py) ----------
+def _cache_headers(tag: str) -> dict:
+    # no-cache: o navegador guarda a página, mas revalida (If-None-Match) a cada uso
+    return {"ETag": tag, "Cache-Control": "no-cache"}
+
+def page_etag(request: Request) -> str:
+    """
+    Dependência: ETag da página (versão dos dados + parâmetros). Se o
+    navegador já tem essa versão, responde 304 aqui mesmo. Nas rotas vem
+    declarada ANTES de conn=Depends(db_read): o FastAPI resolve as
+    dependências na ordem dos parâmetros, então o 304 sai sem reservar vaga
+    no pool nem consultar o banco.
+    """
+    tag = dataversion.etag(request.url.path, request.query_params.multi_items())
+    if dataversion.not_modified(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=304, headers=_cache_headers(tag))
+    return tag
+
 # ---------- rotas existentes (home/input/saldo/sql) ----------
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
@@ -96,56 +138,69 @@ def input_form(request: Request):
 
 @app.post("/input", response_class=HTMLResponse)
 async def upload_pdf(request: Request, pdf: UploadFile = File(...)):
-    init_db()
-    DATA_RAW_DIR.mkdir(parents=True, exist_ok=True)
-    out = DATA_RAW_DIR / pdf.filename
-    with out.open("wb") as f:
-        f.write(await pdf.read())
-    ingest_itau_pdf(str(out))
+    # cópia em blocos (memória constante) com SHA-256 calculado no caminho
+    out, sha256, _ = await save_upload(pdf, DATA_RAW_DIR)
+    # ingestão roda em segundo plano; a página acompanha via /jobs/{id}
+    try:
+        job = submit_ingest(str(out), sha256=sha256)
+    except jobs.QueueBusy as e:
+        out.unlink(missing_ok=True)   # a limpeza em andamento apagaria de qualquer jeito
+        raise HTTPException(status_code=409, detail=f"{e}; tente de novo.")
     return templates.TemplateResponse(
         "input.html",
-        {"request": request, "ok": True, "file_name": pdf.filename},
+        {"request": request, "ok": True, "file_name": pdf.filename, "job_id": job.id},
     )
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job.to_dict()
+
 @app.get("/saldo-do-dia", response_class=HTMLResponse)
 def saldo_do_dia(
     request: Request,
     data: str | None = None,
     tipo: str | None = None,
     categoria: str | None = None,
+    antes: str | None = None,          # cursor 'YYYY-MM-DD_id': página seguinte
+    depois: str | None = None,         # cursor 'YYYY-MM-DD_id': página anterior
+    limite: int = Query(SALDO_DIA_LIMITE, ge=1, le=SALDO_DIA_LIMITE_MAX),
+    conn: sqlite3.Connection = Depends(db_read),
 ):
-    init_db()
-    with get_conn() as conn:
-        saldo = None
-        if data:
-            c1 = conn.execute(
-                "SELECT saldo FROM v_saldo_por_dia WHERE data = ?;",
-                (data,),
-            ).fetchone()
-            saldo = c1[0] if c1 else None
-
-        params = []
-        where = []
-        if data:
-            where.append("date(data) = date(?)")
-            params.append(data)
-        if tipo in ("credito", "debito"):
-            where.append("tipo_mov = ?")
-            params.append(tipo)
-        if categoria in ("aplicacao_investimento", "resgate_investimento"):
-            where.append("categoria = ?")
-            params.append(categoria)
-
-        wh = "WHERE " + " AND ".join(where) if where else "WHERE 1=1"
-        sql_tx = f"""
-            SELECT date(data) AS data, lancamentos, valor, tipo_mov, categoria, detalhe_categoria, saldo_dia
-            FROM transactions
-            {wh}
-            ORDER BY data DESC, saldo_dia desc,id
-            LIMIT 100;
-        """
-        cur = conn.execute(sql_tx, params)
-        cols, rows = rows_to_dicts(cur, cur.fetchall())
+    try:
+        cur_antes, cur_depois = parse_cursor(antes), parse_cursor(depois)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor no formato YYYY-MM-DD_id.")
+
+    saldo = None
+    if data:
+        c1 = conn.execute(SQL_SALDO_DO_DIA, (data,)).fetchone()
+        saldo = c1[0] if c1 else None
+
+    sql_tx, params = saldo_do_dia_query(data, tipo, categoria, cur_antes, cur_depois, limite)
+    cur = conn.execute(sql_tx, params)
+    cols, rows = rows_to_dicts(cur, cur.fetchall())
+
+    # limite + 1 linhas: a sobra só indica que existe mais uma página
+    mais = len(rows) > limite
+    rows = rows[:limite]
+    if cur_depois:
+        rows.reverse()
+        tem_anterior, tem_proxima = mais, True
+    else:
+        tem_anterior, tem_proxima = cur_antes is not None, mais
+
+    filtros = {k: v for k, v in (("data", data), ("tipo", tipo), ("categoria", categoria)) if v}
+    if limite != SALDO_DIA_LIMITE:
+        filtros["limite"] = limite
+
+    def pagina(**cursor) -> str:
+        return "/saldo-do-dia?" + urlencode({**filtros, **cursor})
+
+    url_anterior = pagina(depois=format_cursor(rows[0]["data"], rows[0]["id"])) if rows and tem_anterior else None
+    url_proxima = pagina(antes=format_cursor(rows[-1]["data"], rows[-1]["id"])) if rows and tem_proxima else None
 
     return templates.TemplateResponse(
         "saldo_dia.html",
@@ -155,31 +210,40 @@ def saldo_do_dia(
             "sel_tipo": tipo,
             "sel_categoria": categoria,
             "saldo": saldo,
-            "cols": cols,
+            "cols": [c for c in cols if c != "id"],
             "rows": rows,
+            "limite": limite,
+            "limite_max": SALDO_DIA_LIMITE_MAX,
+            "url_anterior": url_anterior,
+            "url_proxima": url_proxima,
+            "url_inicio": pagina() if tem_anterior else None,
         },
     )
 
 @app.get("/sql-tabelas", response_class=HTMLResponse)
-def sql_tabelas(request: Request, name: str | None = None):
-    init_db()
-    with get_conn() as conn:
-        items = list_tables_and_views(conn)
-        ddl = None
-        preview_cols, preview_rows = [], []
-        chosen = name
-
-        if name:
-            row = conn.execute(
-                "SELECT sql FROM sqlite_master WHERE name = ?;",
-                (name,),
-            ).fetchone()
-            ddl = row[0] if row else "-- (sem DDL registrada)"
-            try:
-                cur = conn.execute(f'SELECT * FROM "{name}" LIMIT 10;')
-                preview_cols, preview_rows = rows_to_dicts(cur, cur.fetchall())
-            except Exception as e:
-                ddl = (ddl or "") + f"\n-- Preview indisponível: {e}"
+def sql_tabelas(
+    request: Request,
+    name: str | None = None,
+    tag: str = Depends(page_etag),     # antes de conn: o 304 não ocupa o pool
+    conn: sqlite3.Connection = Depends(db_read),
+):
+
+    items = list_tables_and_views(conn)
+    ddl = None
+    preview_cols, preview_rows = [], []
+    chosen = name
+
+    if name:
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = ?;",
+            (name,),
+        ).fetchone()
+        ddl = row[0] if row else "-- (sem DDL registrada)"
+        try:
+            cur = conn.execute(f'SELECT * FROM "{name}" LIMIT 10;')
+            preview_cols, preview_rows = rows_to_dicts(cur, cur.fetchall())
+        except Exception as e:
+            ddl = (ddl or "") + f"\n-- Preview indisponível: {e}"
 
     return templates.TemplateResponse(
         "sql_browser.html",
@@ -191,39 +255,41 @@ def sql_tabelas(request: Request, name: str | None = None):
             "preview_cols": preview_cols,
             "preview_rows": preview_rows,
         },
+        headers=_cache_headers(tag),
     )
 
 @app.get("/sql-sandbox", response_class=HTMLResponse)
 def sql_sandbox_form(request: Request):
     return templates.TemplateResponse(
         "sql_sandbox.html",
-        {"request": request, "sql": "SELECT * FROM transactions"}
+        {"request": request, "sql": "SELECT * FROM transactions", "query_id": uuid.uuid4().hex},
     )
 
 @app.post("/sql-sandbox", response_class=HTMLResponse)
-def sql_sandbox_run(request: Request, sql: str = Form(...)):
+def sql_sandbox_run(
+    request: Request,
+    sql: str = Form(...),
+    pagina: int = Form(0),
+    query_id: str | None = Form(None),
+):
+    ctx = {"request": request, "sql": sql, "query_id": uuid.uuid4().hex, "timeout_ms": SANDBOX_TIMEOUT_MS}
     ok, s = safe_select(sql)
     if not ok:
-        return templates.TemplateResponse(
-            "sql_sandbox.html",
-            {"request": request, "sql": sql, "error": s},
-        )
+        return templates.TemplateResponse("sql_sandbox.html", {**ctx, "error": s})
 
-    init_db()
-    wrapped = f"SELECT * FROM ({s}) AS _safe LIMIT 100"
-    with get_conn() as conn:
-        try:
-            cur = conn.execute(wrapped)
-            cols, rows = rows_to_dicts(cur, cur.fetchall())
-            return templates.TemplateResponse(
-                "sql_sandbox.html",
-                {"request": request, "sql": s, "cols": cols, "rows": rows},
-            )
-        except Exception as e:
-            return templates.TemplateResponse(
-                "sql_sandbox.html",
-                {"request": request, "sql": s, "error": str(e)},
-            )
+    # conexão própria, só leitura e com prazo (src/sandbox.py)
+    try:
+        res = sandbox.run(s, pagina, query_id=query_id)
+    except Exception as e:
+        return templates.TemplateResponse("sql_sandbox.html", {**ctx, "sql": s, "error": str(e)})
+    return templates.TemplateResponse(
+        "sql_sandbox.html",
+        {**ctx, "sql": s, "cols": res.cols, "rows": res.rows, "res": res, "linhas": SANDBOX_PAGE_ROWS},
+    )
+
+@app.post("/sql-sandbox/cancel")
+def sql_sandbox_cancel(query_id: str = Form(...)):
+    return {"cancelada": sandbox.cancel(query_id)}
 
 
 # ---------- INVESTIMENTOS (atualizado com filtros e UX) ----------
@@ -237,108 +303,55 @@ def investimentos(
     # painel de saldo:
     aplicacao: str | None = None,      # aplicação para consulta/lançamento
     data: str | None = None,           # data do saldo consultado
-    show_form: int | None = None       # 1 para abrir o painel ao carregar (apenas via botão do card)
+    show_form: int | None = None,      # 1 para abrir o painel ao carregar (apenas via botão do card)
+    tag: str = Depends(page_etag),     # antes de conn: o 304 não ocupa o pool
+    conn: sqlite3.Connection = Depends(db_read),
 ):
-    init_db()
+
     today = date.today().isoformat()
 
-    with get_conn() as conn:
-        # WHERE dinâmico para transações de investimento (mesma lógica de antes)
-        params = []
-        where = ["categoria IN ('aplicacao_investimento','resgate_investimento')"]
-        if start:
-            where.append("date(data) >= date(?)"); params.append(start)
-        if end:
-            where.append("date(data) <= date(?)"); params.append(end)
-        if app_filter:
-            where.append("""COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE') = ?""")
-            params.append(app_filter)
-
-        wh = "WHERE " + " AND ".join(where)
-
-        # Totais por aplicação respeitando os filtros
-        sql_totais = f"""
-            WITH base AS (
-              SELECT
-                COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE') AS aplicacao,
-                categoria,
-                valor
-              FROM transactions
-              {wh}
-            )
-            SELECT
-              aplicacao,
-              SUM(CASE WHEN categoria='aplicacao_investimento' THEN -valor ELSE 0 END) AS valor_aplicado,
-              SUM(CASE WHEN categoria='resgate_investimento'   THEN -valor ELSE 0 END) AS valor_resgatado
-            FROM base
-            GROUP BY aplicacao
-            ORDER BY aplicacao;
-        """
+    # Totais por aplicação respeitando os filtros
+    # o cache só entende datas válidas; o resto (2025-6-1, abc) vai pelo SQL,
+    # que compara via date(?) e define o resultado
+    if ANALYTICS_CACHE and valid_iso_dates(start, end):
+        apps_rows = analytics.cache.investimentos_totais(start, end, app_filter)
+        apps_cols = ["aplicacao", "valor_aplicado", "valor_resgatado"]
+    else:
+        sql_totais, params = investimentos_totais_query(start, end, app_filter)
         cur = conn.execute(sql_totais, params)
         apps_cols, apps_rows = rows_to_dicts(cur, cur.fetchall())
 
-        # Lista completa de aplicações para dropdowns
-        cur_all = conn.execute("""
-            SELECT DISTINCT COALESCE(NULLIF(TRIM(detalhe_categoria), ''), 'SEM_DETALHE') AS aplicacao
-            FROM transactions
-            WHERE categoria IN ('aplicacao_investimento','resgate_investimento')
-            ORDER BY aplicacao;
-        """)
-        opcoes = [r[0] for r in cur_all.fetchall()]
-
-        # NOVO: "saldo atual" por aplicação (último saldo conhecido <= hoje)
-        cur_bal = conn.execute("""
-            WITH ult AS (
-              SELECT aplicacao, MAX(date(data)) AS dref
-              FROM investment_balances
-              WHERE date(data) <= date(?)
-              GROUP BY aplicacao
-            )
-            SELECT ib.aplicacao, ib.data, ib.saldo
-            FROM investment_balances ib
-            JOIN ult u
-              ON u.aplicacao = ib.aplicacao AND date(ib.data) = date(u.dref);
-        """, (today,))
-        latest_balances = { row[0]: {"data": row[1], "saldo": row[2]} for row in cur_bal.fetchall() }
-
-        # Área de saldo (abre apenas se veio do botão do card)
-        saldo_info = None
-        aviso_replicado = None
-        needs_attention_today = False
-        has_exact_for_selected = False  # <-- NOVO
-
-        if aplicacao and data:
-            exact = conn.execute(
-                "SELECT saldo FROM investment_balances WHERE aplicacao = ? AND date(data) = date(?)",
-                (aplicacao, data),
-            ).fetchone()
-            if exact:
-                has_exact_for_selected = True  # <-- NOVO
-                saldo_info = {"aplicacao": aplicacao, "data": data, "saldo": exact[0], "replicado": False}
-            else:
-                prev = conn.execute(
-                    """
-                    SELECT saldo, data
-                    FROM investment_balances
-                    WHERE aplicacao = ?
-                      AND date(data) <= date(?)
-                    ORDER BY date(data) DESC
-                    LIMIT 1
-                    """,
-                    (aplicacao, data),
-                ).fetchone()
-                if prev:
-                    saldo_info = {"aplicacao": aplicacao, "data": data, "saldo": prev[0], "replicado": True}
-                    aviso_replicado = f"Saldo replicado do dia {prev[1]} — insira o saldo de {data}."
-                else:
-                    saldo_info = {"aplicacao": aplicacao, "data": data, "saldo": None, "replicado": None}
-
-        if aplicacao:
-            has_today = conn.execute(
-                "SELECT 1 FROM investment_balances WHERE aplicacao = ? AND date(data) = date(?)",
-                (aplicacao, today),
-            ).fetchone()
-            needs_attention_today = (has_today is None)
+    # Lista completa de aplicações para dropdowns
+    cur_all = conn.execute(SQL_APLICACOES)
+    opcoes = [r[0] for r in cur_all.fetchall()]
+
+    # NOVO: "saldo atual" por aplicação (último saldo conhecido <= hoje)
+    hoje = asof.load_index(conn).asof_many(None, [today])
+    latest_balances = {
+        app: {"data": serie[0][0], "saldo": serie[0][1]}
+        for app, serie in hoje.items() if serie[0] is not None
+    }
+
+    # Área de saldo (abre apenas se veio do botão do card)
+    saldo_info = None
+    aviso_replicado = None
+    needs_attention_today = False
+    has_exact_for_selected = False  # <-- NOVO
+
+    if aplicacao and data:
+        ref = asof.asof(conn, aplicacao, data)
+        if ref and ref[0] == data:
+            has_exact_for_selected = True  # <-- NOVO
+            saldo_info = {"aplicacao": aplicacao, "data": data, "saldo": ref[1], "replicado": False}
+        elif ref:
+            saldo_info = {"aplicacao": aplicacao, "data": data, "saldo": ref[1], "replicado": True}
+            aviso_replicado = f"Saldo replicado do dia {ref[0]} — insira o saldo de {data}."
+        else:
+            saldo_info = {"aplicacao": aplicacao, "data": data, "saldo": None, "replicado": None}
+
+    if aplicacao:
+        ref_hoje = latest_balances.get(aplicacao)
+        needs_attention_today = ref_hoje is None or ref_hoje["data"] != today
 
     return templates.TemplateResponse(
         "investimentos.html",
@@ -355,22 +368,37 @@ def investimentos(
             "show_form": show_form == 1,
             "today": today,
         },
+        headers=_cache_headers(tag),
     )
 
+# --- séries diárias (saldo, fluxo, rendimento) por aplicação, prontas para gráfico ---
+@app.get("/investimentos/series")
+def investimentos_series(
+    start: str | None = None,              # YYYY-MM-DD (padrão: 365 dias antes de end)
+    end: str | None = None,                # YYYY-MM-DD (padrão: hoje)
+    aplicacao: list[str] | None = Query(None),
+    conn: sqlite3.Connection = Depends(db_read),
+):
+    try:
+        dt_ini, dt_fim = default_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return investment_series(conn, dt_ini, dt_fim, aplicacao)
+
 # --- NOVO: remover saldo do dia ---
 @app.post("/investimentos/remove-saldo", response_class=HTMLResponse)
 def investimentos_remove_saldo(
     request: Request,
     aplicacao: str = Form(...),
     data: str = Form(...),  # YYYY-MM-DD
+    conn: sqlite3.Connection = Depends(db_write),
 ):
-    init_db()
-    with get_conn() as conn:
-        conn.execute(
-            "DELETE FROM investment_balances WHERE aplicacao = ? AND date(data) = date(?)",
-            (aplicacao, data),
-        )
-        conn.commit()
+    conn.execute(
+        "DELETE FROM investment_balances WHERE aplicacao = ? AND data = date(?)",
+        (aplicacao, data),
+    )
+    dataversion.bump(conn)
+    conn.commit()
     # volta mantendo o painel aberto, para o usuário relançar se quiser
     return RedirectResponse(
         url=f"/investimentos?aplicacao={aplicacao}&data={data}&show_form=1",
@@ -381,18 +409,25 @@ def investimentos_remove_saldo(
 def health():
     return PlainTextResponse("ok")
 
+@app.get("/admin/pool-stats")
+def pool_stats():
+    out = {"leitura": read_pool.stats(), "escrita": write_pool.stats()}
+    if ANALYTICS_CACHE:
+        out["analytics"] = analytics.cache.stats()
+    return out
+
 @app.post("/investimentos/add-saldo", response_class=HTMLResponse)
 def investimentos_add_saldo(
     request: Request,
     aplicacao: str = Form(...),
     data: str = Form(...),   # YYYY-MM-DD
     saldo: float = Form(...),
+    conn: sqlite3.Connection = Depends(db_write),
 ):
-    init_db()
-    with get_conn() as conn:
-        from src.db import upsert_investment_balance
-        upsert_investment_balance(conn, aplicacao, data, saldo)
-        conn.commit()
+    from src.db import upsert_investment_balance
+    upsert_investment_balance(conn, aplicacao, data, saldo)
+    dataversion.bump(conn)
+    conn.commit()
 
     # Redireciona de volta mantendo o painel aberto
     return RedirectResponse(
@@ -401,22 +436,138 @@ def investimentos_add_saldo(
     )
 
 
+# --- pivot mês × (categoria | aplicacao | tipo_mov) sobre monthly_rollup ---
+_YM_RE = re.compile(r"^\d{4}-\d{2}$")
+
+@app.get("/analytics/pivot")
+def analytics_pivot(
+    linhas: str = "categoria",          # categoria | aplicacao | tipo_mov
+    medida: str = "total",             # total (soma de valor) | n_tx
+    inicio: str | None = None,         # YYYY-MM (padrão: primeiro mês com dados)
+    fim: str | None = None,            # YYYY-MM (padrão: último mês com dados)
+    categoria: str | None = None,
+    tipo: str | None = None,
+    conn: sqlite3.Connection = Depends(db_read),
+):
+    if linhas not in PIVOT_DIMENSOES or medida not in PIVOT_MEDIDAS:
+        raise HTTPException(status_code=400, detail=f"linhas: {PIVOT_DIMENSOES}; medida: {PIVOT_MEDIDAS}.")
+    for v in (inicio, fim):
+        if v is not None and not _YM_RE.match(v):
+            raise HTTPException(status_code=400, detail="inicio/fim no formato YYYY-MM.")
+    if inicio is None or fim is None:
+        lo, hi = conn.execute("SELECT MIN(mes), MAX(mes) FROM monthly_rollup").fetchone()
+        inicio, fim = inicio or lo or "", fim or hi or ""
+
+    sql, params = pivot_query(linhas, medida, inicio, fim, categoria, tipo)
+    cells = conn.execute(sql, params).fetchall()
+
+    meses = sorted({mes for _, mes, _ in cells})
+    col = {mes: i for i, mes in enumerate(meses)}
+    series = {}
+    for chave, mes, valor in cells:
+        valores = series.setdefault(chave, [0] * len(meses))
+        valores[col[mes]] = round(valor, 2) if medida == "total" else valor
+    return {
+        "linhas": linhas,
+        "medida": medida,
+        "inicio": inicio,
+        "fim": fim,
+        "meses": meses,
+        "series": [
+            {"chave": chave, "valores": valores, "total": round(sum(valores), 2)}
+            for chave, valores in series.items()
+        ],
+    }
+
+# --- exportação em streaming (CSV / JSON / NDJSON, opcionalmente .gz) ---
+def _export_response(sql: str, params: list, nome: str, formato: str, gzip: bool, start, end):
+    if formato not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"formato: {tuple(EXPORT_FORMATS)}.")
+    if not valid_iso_dates(start, end):
+        raise HTTPException(status_code=400, detail="start/end no formato YYYY-MM-DD.")
+    media_type, ext = EXPORT_FORMATS[formato]
+    filename = "_".join([nome] + [v for v in (start, end) if v]) + "." + ext
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+    return StreamingResponse(
+        stream_export(sql, params, formato, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/export/transactions")
+def export_transactions(
+    start: str | None = None,          # YYYY-MM-DD
+    end: str | None = None,            # YYYY-MM-DD
+    tipo: str | None = None,           # credito | debito
+    categoria: str | None = None,
+    formato: str = "csv",              # csv | json | ndjson
+    gzip: bool = False,
+):
+    if tipo not in (None, "credito", "debito"):
+        raise HTTPException(status_code=400, detail="tipo: credito | debito.")
+    sql, params = transactions_export_query(start, end, tipo, categoria)
+    return _export_response(sql, params, "transacoes", formato, gzip, start, end)
+
+@app.get("/export/saldos")
+def export_saldos(
+    start: str | None = None,          # YYYY-MM-DD
+    end: str | None = None,            # YYYY-MM-DD
+    formato: str = "csv",              # csv | json | ndjson
+    gzip: bool = False,
+):
+    sql, params = saldos_export_query(start, end)
+    return _export_response(sql, params, "saldos", formato, gzip, start, end)
+
+# --- reaplica as regras de classificação às transações já gravadas ---
+@app.post("/admin/reclassify")
+def admin_reclassify(conn: sqlite3.Connection = Depends(db_write)):
+    with WRITER_LOCK:
+        rep = reclassify(conn)
+    return {
+        "linhas": rep.linhas,
+        "alteradas": rep.alteradas,
+        "segundos": round(rep.segundos, 3),
+        "por_categoria": dict(rep.por_categoria),
+    }
+
 # --- NOVA ROTA: limpar banco e arquivos raw ---
 @app.post("/admin/wipe")
 def wipe_all():
     """
     Apaga o banco (bank.db) e recria o schema.
     Remove todos os PDFs em data/raw (e opcionalmente arquivos processados).
+    409 se houver ingestão na fila: o job gravaria no banco apagado (ou no
+    novo, com o PDF já removido). Durante a limpeza a fila não aceita jobs
+    e WRITER_LOCK barra reclassificação e outras gravações em lote.
     """
-    # 1) Remover o .db
     try:
-        if DB_PATH.exists():
-            DB_PATH.unlink()
-    except Exception as e:
-        # se não conseguir apagar, ainda assim tentamos recriar por cima
-        pass
+        with jobs.exclusive(), WRITER_LOCK:
+            _wipe()
+    except jobs.QueueBusy as e:
+        raise HTTPException(status_code=409, detail=f"{e}; aguarde terminar e tente de novo.")
+
+    # Redireciona de volta para a tela de input com um flag de sucesso
+    resp = RedirectResponse(url="/input?wipe_ok=1", status_code=303)
+    return resp
+
+def _wipe():
+    # 1) Remover o .db (antes, fecha as conexões do pool que apontam para ele)
+    close_pools()
+    for p in db_files(DB_PATH):  # bank.db + -wal/-shm (um -wal órfão corromperia o banco novo)
+        try:
+            if p.exists():
+                p.unlink()
+        except Exception as e:
+            # se não conseguir apagar, ainda assim tentamos recriar por cima
+            pass
 
-    # 2) Recriar estrutura vazia
+    # 2) Recriar estrutura vazia (e descartar índices em memória do banco antigo)
+    asof.invalidate()
+    analytics.cache.close()
+    sandbox.invalidate()
+    dataversion.invalidate()
+    rules.invalidate()
     init_db()
 
     # 3) Apagar PDFs em data/raw
@@ -436,10 +587,6 @@ def wipe_all():
         except Exception:
             pass
 
-    # Redireciona de volta para a tela de input com um flag de sucesso
-    resp = RedirectResponse(url="/input?wipe_ok=1", status_code=303)
-    return resp
-
 # --- IMPORTS necessários no topo (alguns você já tem) ---
 from datetime import date
 import calendar
@@ -472,32 +619,6 @@ def _month_range_bounds(start_ym: str | None, end_ym: str | None) -> tuple[str,
 
 
 
-# --- SQLs para o período (agregação por dia + saldo do dia via view) ---
-SQL_PERIOD_DAILY = """
-WITH days AS (
-  SELECT date(data) AS dia,
-         SUM(CASE WHEN valor < 0 THEN -valor ELSE 0 END) AS debitos,
-         SUM(CASE WHEN valor > 0 THEN  valor ELSE 0 END) AS creditos
-  FROM transactions
-  WHERE date(data) BETWEEN date(?) AND date(?)
-  GROUP BY date(data)
-)
-SELECT d.dia,
-       d.debitos,
-       d.creditos,
-       s.saldo AS saldo_dia
-FROM days d
-LEFT JOIN v_saldo_por_dia s ON s.data = d.dia
-ORDER BY d.dia;
-"""
-
-SQL_DETAIL_BY_DAY = """
-SELECT date(data) AS data, lancamentos AS descricao, valor, tipo_mov, categoria, detalhe_categoria
-FROM transactions
-WHERE date(data) = date(?)
-ORDER BY data, id;
-"""
-
 from datetime import date, datetime, timedelta
 from fastapi import Query
 
@@ -536,8 +657,10 @@ def periodos(
     request: Request,
     start: str | None = Query(None, description="YYYY-MM-DD"),
     end: str | None = Query(None, description="YYYY-MM-DD"),
+    tag: str = Depends(page_etag),     # antes de conn: o 304 não ocupa o pool
+    conn: sqlite3.Connection = Depends(db_read),
 ):
-    init_db()
+
     dt_ini, dt_fim = _date_range_bounds(start, end)
 
     # flags (hidden 0 + checkbox 1)
@@ -550,14 +673,16 @@ def periodos(
     show_creditos = flag("show_creditos", True)
     show_saldo    = flag("show_saldo",    True)
 
-    with get_conn() as conn:
+    if ANALYTICS_CACHE:
+        labels, debitos, creditos, saldo_dia = analytics.cache.periodo_diario(dt_ini, dt_fim)
+    else:
         cur = conn.execute(SQL_PERIOD_DAILY, (dt_ini, dt_fim))
         cols, rows = rows_to_dicts(cur, cur.fetchall())
 
-    labels    = [r["dia"] for r in rows]
-    debitos   = [float(r["debitos"]  or 0.0) for r in rows]
-    creditos  = [float(r["creditos"] or 0.0) for r in rows]
-    saldo_dia = [(r["saldo_dia"] if r["saldo_dia"] is not None else None) for r in rows]
+        labels    = [r["dia"] for r in rows]
+        debitos   = [float(r["debitos"]  or 0.0) for r in rows]
+        creditos  = [float(r["creditos"] or 0.0) for r in rows]
+        saldo_dia = [(r["saldo_dia"] if r["saldo_dia"] is not None else None) for r in rows]
     
 
     return templates.TemplateResponse(
@@ -576,16 +701,15 @@ def periodos(
             "show_creditos": show_creditos,
             "show_saldo": show_saldo,
         },
+        headers=_cache_headers(tag),
     )
 
 
 # --- NOVA ROTA: detalhe de um dia (retorna um fragmento HTML) ---
 @app.get("/periodos/detalhe", response_class=HTMLResponse)
-def periodos_detalhe(request: Request, dia: str):
-    init_db()
-    with get_conn() as conn:
-        cur = conn.execute(SQL_DETAIL_BY_DAY, (dia,))
-        cols, rows = rows_to_dicts(cur, cur.fetchall())
+def periodos_detalhe(request: Request, dia: str, conn: sqlite3.Connection = Depends(db_read)):
+    cur = conn.execute(SQL_DETAIL_BY_DAY, (dia,))
+    cols, rows = rows_to_dicts(cur, cur.fetchall())
 
     return templates.TemplateResponse(
         "periodos_detalhe.html",
@@ -601,45 +725,6 @@ def add_month(dt: date) -> date:
         return date(y+1, 1, 1)
     return date(y, m+1, 1)
 
-# --- SQL mensal: Débito/Crédito por mês + Saldo do dia 1 (fallback último do mês anterior)
-SQL_MONTHLY = """
-WITH meses AS (
-  SELECT
-    strftime('%Y-%m-01', date("data")) AS mes,
-    SUM(CASE WHEN valor < 0 THEN -valor ELSE 0 END) AS debitos,
-    SUM(CASE WHEN valor > 0 THEN  valor ELSE 0 END) AS creditos
-  FROM transactions
-  WHERE date("data") BETWEEN date(?) AND date(?)
-  GROUP BY mes
-),
-saldo_mes AS (
-  SELECT
-    m.mes,
-    COALESCE(
-      -- saldo exatamente no dia 1 do mês
-      (SELECT s.saldo
-         FROM v_saldo_por_dia s
-        WHERE date(s."data") = date(m.mes)
-        LIMIT 1),
-      -- senão, o último saldo do mês anterior
-      (SELECT s2.saldo
-         FROM v_saldo_por_dia s2
-        WHERE strftime('%Y-%m', s2."data") = strftime('%Y-%m', date(m.mes, '-1 day'))
-        ORDER BY date(s2."data") DESC
-        LIMIT 1)
-    ) AS saldo_dia
-  FROM meses m
-)
-SELECT
-  m.mes       AS dia,        -- mantemos o nome 'dia' para reaproveitar o JS
-  m.debitos   AS debitos,
-  m.creditos  AS creditos,
-  s.saldo_dia AS saldo_dia
-FROM meses m
-LEFT JOIN saldo_mes s ON s.mes = m.mes
-ORDER BY m.mes;
-"""
-
 # --- NOVA ROTA: /saldos-mes (inspirada em /periodos, mas por mês)
 from fastapi import Query
 from datetime import datetime, timedelta
@@ -649,8 +734,10 @@ def saldos_mes(
     request: Request,
     start: str | None = Query(None, description="YYYY-MM-DD"),
     end:   str | None = Query(None, description="YYYY-MM-DD"),
+    tag: str = Depends(page_etag),     # antes de conn: o 304 não ocupa o pool
+    conn: sqlite3.Connection = Depends(db_read),
 ):
-    init_db()
+
     # Reaproveita o helper já existente para normalizar o range
     dt_ini, dt_fim = _date_range_bounds(start, end)
 
@@ -664,15 +751,17 @@ def saldos_mes(
     show_creditos = flag("show_creditos", True)
     show_saldo    = flag("show_saldo",    True)
 
-    with get_conn() as conn:
+    if ANALYTICS_CACHE:
+        labels, debitos, creditos, saldo_dia = analytics.cache.mensal(dt_ini, dt_fim)
+    else:
         cur = conn.execute(SQL_MONTHLY, (dt_ini, dt_fim))
         cols, rows = rows_to_dicts(cur, cur.fetchall())
 
-    # labels serão 'YYYY-MM-01' para ficar igual ao eixo X do periodos
-    labels    = [r["dia"] for r in rows]  # 'YYYY-MM-01'
-    debitos   = [float(r["debitos"]  or 0.0) for r in rows]
-    creditos  = [float(r["creditos"] or 0.0) for r in rows]
-    saldo_dia = [ (r["saldo_dia"] if r["saldo_dia"] is not None else None) for r in rows ]
+        # labels serão 'YYYY-MM-01' para ficar igual ao eixo X do periodos
+        labels    = [r["dia"] for r in rows]  # 'YYYY-MM-01'
+        debitos   = [float(r["debitos"]  or 0.0) for r in rows]
+        creditos  = [float(r["creditos"] or 0.0) for r in rows]
+        saldo_dia = [ (r["saldo_dia"] if r["saldo_dia"] is not None else None) for r in rows ]
 
     return templates.TemplateResponse(
         "saldos_mes.html",
@@ -690,4 +779,5 @@ def saldos_mes(
             "show_creditos": show_creditos,
             "show_saldo": show_saldo,
         },
+        headers=_cache_headers(tag),
     )